@@ -0,0 +1,25 @@
+#!/bin/bash
+
+# The catalog has fewer files than convert_md_to_html.py's MIN_FILES_PER_POOL,
+# so the process pool never runs in a normal regeneration. Force it with
+# --min-files-per-pool 1 and check it renders the same pages as in-process rendering.
+
+REPO_ROOT=$(git rev-parse --show-toplevel)
+SCRIPT="$REPO_ROOT/utils/transforms/metadata/convert_md_to_html.py"
+WORK_DIR=$(mktemp -d)
+trap 'rm -rf "$WORK_DIR"' EXIT
+
+for mode in in_process pool; do
+  mkdir -p "$WORK_DIR/$mode/metadata"
+  cp -r "$REPO_ROOT/metadata/markdown" "$WORK_DIR/$mode/metadata/"
+done
+
+python "$SCRIPT" "$WORK_DIR/in_process" --jobs 1 > /dev/null || exit 1
+python "$SCRIPT" "$WORK_DIR/pool" --jobs 2 --min-files-per-pool 1 > /dev/null || exit 1
+
+if ! diff -r "$WORK_DIR/in_process/metadata/transforms/html" "$WORK_DIR/pool/metadata/transforms/html"; then
+  echo "Error: metadata HTML rendered across worker processes differs from in-process rendering."
+  exit 1
+fi
+
+echo "Metadata HTML rendered across worker processes matches in-process rendering."
@@ -14,15 +14,11 @@ echo "VALIDATION_SCRIPT: $VALIDATION_SCRIPT"
 
 echo "Running validation script with -s structure option"
 
-for file in "$TEXT_DATA_DIR"/*.txt; do
-    python "$VALIDATION_SCRIPT" -i "$file" -s
-done
+python "$VALIDATION_SCRIPT" --corpus "$TEXT_DATA_DIR" -s
 
 echo "Running validation script with -c content option (allow fail)"
 
-for file in "$TEXT_DATA_DIR"/*.txt; do
-    python "$VALIDATION_SCRIPT" -i "$file" -c --allow-content-fail
-done
+python "$VALIDATION_SCRIPT" --corpus "$TEXT_DATA_DIR" -c --allow-content-fail
 
 echo "Checking that generated files all exist..."
 errors=()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Writes precompressed siblings and a content-hash manifest for generated outputs.
+
+For every file under the output roots (texts/transforms/html and
+metadata/transforms), a maximally compressed <name>.gz is written next to it,
+and a <name>.zst as well when the optional zstandard package is installed.
+Each root gets a static_manifest.json listing, per file path relative to the
+root, its SHA-256, an ETag, and the raw and compressed sizes, so a server can
+send precompressed bytes and answer conditional requests without hashing or
+compressing anything at request time.
+
+Files whose hash matches the existing manifest entry (and whose siblings are
+still present) are not recompressed. Siblings of deleted files are removed.
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import os
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+OUTPUT_ROOTS = [
+    PROJECT_ROOT / 'texts' / 'transforms' / 'html',
+    PROJECT_ROOT / 'metadata' / 'transforms',
+]
+MANIFEST_NAME = 'static_manifest.json'
+COMPRESSED_SUFFIXES = ('.gz', '.zst')
+
+
+def _zstd_compressor():
+    """Return a max-level zstandard compressor, or None if zstandard is not installed."""
+    try:
+        import zstandard
+    except ImportError:
+        return None
+    return zstandard.ZstdCompressor(level=zstandard.MAX_COMPRESSION_LEVEL)
+
+
+def _load_manifest(manifest_path):
+    if not manifest_path.exists():
+        return {}
+    with open(manifest_path, encoding='utf-8') as f:
+        return json.load(f).get('files', {})
+
+
+def _write_atomic(path, data):
+    tmp_path = path.with_name(path.name + '.tmp')
+    tmp_path.write_bytes(data)
+    os.replace(tmp_path, path)
+
+
+def compress_root(root, use_zstd=True):
+    """Compress every output file under root and rewrite root/static_manifest.json.
+
+    Returns:
+        (number of files compressed, number of files unchanged).
+    """
+    root = Path(root)
+    manifest_path = root / MANIFEST_NAME
+    previous = _load_manifest(manifest_path)
+    zstd = _zstd_compressor() if use_zstd else None
+
+    files = {}
+    compressed = unchanged = 0
+    for path in sorted(root.rglob('*')):
+        if not path.is_file() or path.suffix in COMPRESSED_SUFFIXES or path == manifest_path or path.name.endswith('.tmp'):
+            continue
+        rel_path = path.relative_to(root).as_posix()
+        data = path.read_bytes()
+        sha256 = hashlib.sha256(data).hexdigest()
+        gz_path = path.with_name(path.name + '.gz')
+        zst_path = path.with_name(path.name + '.zst')
+
+        entry = previous.get(rel_path)
+        if (entry is not None and entry['sha256'] == sha256 and gz_path.exists()
+                and ('zst_bytes' in entry) == (zstd is not None)
+                and (zstd is None or zst_path.exists())):
+            files[rel_path] = entry
+            unchanged += 1
+            continue
+
+        entry = {
+            'sha256': sha256,
+            'etag': f'"{sha256[:32]}"',
+            'bytes': len(data),
+        }
+        # mtime=0 keeps the .gz bytes (and so its size) reproducible across runs.
+        gz_data = gzip.compress(data, compresslevel=9, mtime=0)
+        _write_atomic(gz_path, gz_data)
+        entry['gz_bytes'] = len(gz_data)
+        if zstd is not None:
+            zst_data = zstd.compress(data)
+            _write_atomic(zst_path, zst_data)
+            entry['zst_bytes'] = len(zst_data)
+        elif zst_path.exists():
+            zst_path.unlink()
+        files[rel_path] = entry
+        compressed += 1
+
+    # Drop siblings whose source file no longer exists.
+    for suffix in COMPRESSED_SUFFIXES:
+        for sibling in root.rglob(f'*{suffix}'):
+            if not sibling.with_suffix('').exists():
+                sibling.unlink()
+
+    manifest = {
+        'algorithms': ['gzip', 'zstd'] if zstd is not None else ['gzip'],
+        'files': files,
+    }
+    with open(manifest_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    return compressed, unchanged
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write .gz/.zst siblings and a content-hash manifest for generated outputs.")
+    parser.add_argument("roots", nargs="*", type=Path, default=OUTPUT_ROOTS, help="Output directories to process (default: HTML and metadata transforms).")
+    parser.add_argument("--no-zstd", action="store_true", help="Only write .gz siblings, even if zstandard is installed.")
+    args = parser.parse_args()
+
+    if not args.no_zstd and _zstd_compressor() is None:
+        print("zstandard not installed; writing .gz siblings only.")
+    for root in args.roots:
+        compressed, unchanged = compress_root(root, use_zstd=not args.no_zstd)
+        print(f"{root}: compressed {compressed} file(s), {unchanged} unchanged; wrote {Path(root) / MANIFEST_NAME}")
+
+
+if __name__ == '__main__':
+    main()
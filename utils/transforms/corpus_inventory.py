@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Inventory of the corpus files belonging to each text.
+
+Each corpus directory is listed once, and every file in it is recorded under its
+text stem, by kind, as its path relative to the project root and its size in
+bytes. The stem is the file name up to the first dot, or up to the extension in
+a directory that takes any file (the original submissions); suffixes match
+regardless of case:
+
+    {"bhagavadajjuka": {"original_submission": ("texts/original_submissions/bhagavadajjuka.txt", 30489),
+                        "txt": (...), "xml": (...), "chaya": (...),
+                        "plain_html": (...), "rich_html": (...), "sidecar": (...), ...}}
+
+The metadata and regeneration scripts look files up here (see text_files_for)
+instead of listing or probing the directories once per text. A script working
+on other directories passes its own root and directory map, e.g.
+load_inventory(in_dir, {'.': {'.txt': 'txt'}, 'chaya': {'.txt': 'chaya'}}).
+
+Run as a script to print the inventory as JSON.
+"""
+
+import functools
+import json
+import os
+import sys
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+
+# directory (relative to the project root) -> {file name after the stem -> kind};
+# a None key takes any remaining suffix.
+CORPUS_DIRS = {
+    'texts/original_submissions': {None: 'original_submission'},
+    'texts/project_editions/txt': {'.txt': 'txt'},
+    'texts/project_editions/xml': {'.xml': 'xml'},
+    'texts/project_editions/txt/chaya': {'.txt': 'chaya'},
+    'texts/transforms/html/plain': {'.html': 'plain_html'},
+    'texts/transforms/html/rich': {
+        '.html': 'rich_html',
+        '.json': 'sidecar',
+        '.metadata.json': 'sidecar_metadata',
+        '.corrections.json': 'sidecar_corrections',
+    },
+    'metadata/transforms/html': {'.html': 'metadata_html'},
+}
+
+# Precompressed siblings and in-progress writes are not corpus files.
+_IGNORED_SUFFIXES = ('.gz', '.zst', '.tmp')
+
+
+def build_inventory(project_root=PROJECT_ROOT, corpus_dirs=None):
+    """Return {stem: {kind: (relative path, size in bytes)}} for the files in corpus_dirs (default CORPUS_DIRS)."""
+    project_root = Path(project_root)
+    inventory = {}
+    for rel_dir, kinds in (corpus_dirs or CORPUS_DIRS).items():
+        try:
+            entries = list(os.scandir(project_root / rel_dir))
+        except FileNotFoundError:
+            continue
+        for entry in sorted(entries, key=lambda e: e.name):
+            if not entry.is_file() or entry.name.lower().endswith(_IGNORED_SUFFIXES):
+                continue
+            stem, dot, rest = entry.name.partition('.')
+            kind = kinds.get((dot + rest).lower())
+            if kind is None:
+                kind = kinds.get(None)
+                if kind is None:
+                    continue
+                stem = os.path.splitext(entry.name)[0]
+            inventory.setdefault(stem, {})[kind] = (f'{rel_dir}/{entry.name}', entry.stat().st_size)
+    return inventory
+
+
+def load_inventory(project_root=PROJECT_ROOT, corpus_dirs=None):
+    """build_inventory, computed once per process for each project root and directory map."""
+    frozen_dirs = tuple((rel_dir, tuple(kinds.items())) for rel_dir, kinds in corpus_dirs.items()) if corpus_dirs else None
+    return _cached_inventory(Path(project_root).resolve(), frozen_dirs)
+
+
+@functools.lru_cache(maxsize=None)
+def _cached_inventory(project_root, frozen_dirs):
+    corpus_dirs = {rel_dir: dict(kinds) for rel_dir, kinds in frozen_dirs} if frozen_dirs else None
+    return build_inventory(project_root, corpus_dirs)
+
+
+def text_files_for(inventory, stem):
+    """The inventory entry for stem, plus the files of any stem differing from it only in case."""
+    folded = stem.lower()
+    text_files = {}
+    for other_stem, other_files in inventory.items():
+        if other_stem != stem and other_stem.lower() == folded:
+            text_files.update(other_files)
+    text_files.update(inventory.get(stem, {}))
+    return text_files
+
+
+def file_size_kb(text_files):
+    """The project-edition .txt size of one inventory entry in KB (as metadata's File Size (KB)), or None."""
+    txt = text_files.get('txt')
+    return float(round(txt[1] / 1024)) if txt else None
+
+
+if __name__ == '__main__':
+    root = Path(sys.argv[1]).resolve() if len(sys.argv) > 1 else PROJECT_ROOT
+    json.dump(build_inventory(root), sys.stdout, ensure_ascii=False, indent=2)
+    print()
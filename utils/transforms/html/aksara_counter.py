@@ -0,0 +1,160 @@
+"""
+Table-driven akṣara (syllable) counter for IAST text.
+
+Staggered dialogue verses only need akṣara counts, so rather than running
+skrutable's full Scanner (cleaning, transliteration to SLP, syllabification
+and scansion) on every verse segment, count_aksaras() walks the IAST
+characters once and reproduces the number of syllables skrutable's
+syllabify_text() would produce. Text containing a letter or combining mark
+outside the table (capitals, Vedic or decomposed characters, other scripts)
+is handed to skrutable unchanged, so counts always agree with it.
+
+Run as a script to verify the native counter against skrutable on every
+<l> and <lg> of the project-edition XML corpus.
+"""
+import argparse
+import functools
+import sys
+import unicodedata
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[3]
+XML_DIR = PROJECT_ROOT / 'texts' / 'project_editions' / 'xml'
+
+_VOWEL, _CODA, _CONSONANT = 'V', 'H', 'C'
+
+# IAST letters by scansion role. 'a' followed directly by 'i'/'u' is the
+# diphthong ai/au (one vowel); 'ï'/'ü' mark hiatus and count separately.
+_CHAR_TABLE = {
+    **{c: _VOWEL for c in 'aāiīuūṛṝḷḹeēĕoōŏïü'},
+    **{c: _CODA for c in 'ṃṁḥ'},
+    **{c: _CONSONANT for c in 'bcdghjklmnprstvyñśḍṅṇṣṭḻ'},
+}
+
+# Characters skrutable treats as pāda separators (each ends a scansion line).
+_LINE_BREAKS = set('\n\t;,/|।')
+
+
+def _is_unknown(char):
+    """Letters and combining marks outside the table may matter to skrutable; punctuation never does."""
+    return unicodedata.category(char)[0] in 'LM'
+
+
+def count_aksaras_native(text):
+    """Count akṣaras in IAST text without skrutable.
+
+    Mirrors skrutable's Scanner.syllabify_text(): a syllable closes after each
+    vowel, ṃ/ḥ join the preceding syllable (or open one of their own after a
+    consonant), and consonants trailing a scansion line join its last
+    syllable. Characters skrutable would discard (digits, dandas, hyphens and
+    other punctuation) are skipped.
+
+    Returns:
+        The akṣara count, or None if text contains a character not in the table
+        (or ṃ directly after a consonant, which skrutable's transliterator reorders).
+    """
+    # Keep only the characters skrutable's clean_input() keeps, so that the
+    # ai/au lookahead sees the same neighbours its transliterator does.
+    cleaned = []
+    for char in text:
+        if char in _CHAR_TABLE or char == ' ':
+            if char in 'ṃṁ' and cleaned and _CHAR_TABLE.get(cleaned[-1]) == _CONSONANT:
+                return None  # skrutable reorders e.g. "yṃ" to "ṃy" (nasalized semivowel)
+            cleaned.append(char)
+        elif char in _LINE_BREAKS:
+            cleaned.append('\n')
+        elif _is_unknown(char):
+            return None
+
+    count = 0
+    line_count = 0  # syllables closed on the current scansion line
+    pending = False  # consonants seen since the last syllable boundary
+    previous = None
+    for char in cleaned:
+        if char == '\n':
+            if pending and not line_count:
+                count += 1  # a vowelless line still yields one syllable
+            line_count, pending, previous = 0, False, None
+            continue
+        if char == ' ':
+            previous = None  # skrutable transliterates before dropping spaces: "a i" is no diphthong
+            continue
+        role = _CHAR_TABLE[char]
+        if role == _VOWEL:
+            if previous == 'a' and char in 'iu' and not pending:
+                previous = None  # second half of ai/au
+                continue
+            count += 1
+            line_count += 1
+            pending = False
+        elif role == _CODA:
+            if pending or not line_count:
+                count += 1
+                line_count += 1
+            pending = False
+        else:
+            pending = True
+        previous = char
+    if pending and not line_count:
+        count += 1
+    return count
+
+
+@functools.lru_cache(maxsize=None)
+def _scanner():
+    """skrutable Scanner, imported and constructed on first use and then reused."""
+    from skrutable.scansion import Scanner
+    return Scanner()
+
+
+def count_aksaras_skrutable(text):
+    """Count akṣaras in IAST text via skrutable's scansion."""
+    verse = _scanner().scan(text, from_scheme="IAST")
+    return sum(1 for s in verse.text_syllabified.replace("\n", " ").split(" ") if s)
+
+
+@functools.lru_cache(maxsize=4096)
+def count_aksaras(text):
+    """Count akṣaras in IAST text, deferring to skrutable only for unknown characters."""
+    count = count_aksaras_native(text)
+    if count is None:
+        count = count_aksaras_skrutable(text)
+    return count
+
+
+def verify_corpus(xml_dir=XML_DIR):
+    """Compare native and skrutable counts for every <l> and <lg> in the XML corpus.
+
+    Returns:
+        A list of (file name, text, native count, skrutable count) mismatches.
+        Texts the native counter declines (None) are not mismatches.
+    """
+    from lxml import etree
+
+    mismatches = []
+    for xml_path in sorted(Path(xml_dir).glob('*.xml')):
+        tree = etree.parse(str(xml_path))
+        for element in tree.iter('{*}l', '{*}lg'):
+            text = ''.join(element.itertext())
+            if not text.strip():
+                continue
+            native = count_aksaras_native(text)
+            if native is None:
+                continue
+            expected = count_aksaras_skrutable(text)
+            if native != expected:
+                mismatches.append((xml_path.name, text, native, expected))
+    return mismatches
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Verify the native akṣara counter against skrutable on the XML corpus.")
+    parser.add_argument("--xml-dir", default=XML_DIR, type=Path, help="Directory of TEI XML files to check.")
+    args = parser.parse_args()
+
+    mismatches = verify_corpus(args.xml_dir)
+    for name, text, native, expected in mismatches:
+        print(f"{name}: native {native} != skrutable {expected}: {text!r}")
+    if mismatches:
+        sys.exit(1)
+    print("Native akṣara counts match skrutable on all verses.")
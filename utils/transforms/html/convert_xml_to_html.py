@@ -1,18 +1,38 @@
 from lxml import etree
 import argparse
-import copy
+import hashlib
+import html
 import json
+import os
 import re
+import sys
 from pathlib import Path
-import markdown
-from lxml.html import fromstring
-from skrutable.scansion import Scanner
+
+from aksara_counter import count_aksaras
+
+PROJECT_ROOT = Path(__file__).resolve().parents[3]
+sys.path.append(str(PROJECT_ROOT))
+from utils.transforms.metadata.sidecar_metadata import load_sidecar_metadata
 
 # Width of one akṣara in CSS "ch" units, used to offset staggered dialogue
 # verse fragments (rend="indent(N)") to roughly where the previous fragment
 # ended in print. Tuned by eye against IAST text in the rich viewer.
 STAGGER_CH_PER_AKSARA = 2.75
 
+# On-disk akṣara counts, keyed by segment text and valid only for the skrutable
+# version and aksara_counter.py source recorded in the file. Shared by the plain and rich runs and kept
+# across rebuilds, so only new or edited verse segments are ever scanned.
+AKSARA_CACHE_PATH = PROJECT_ROOT / '.cache' / 'html' / 'aksara_counts.json'
+
+
+def _aksara_cache_key():
+    """What cached akṣara counts depend on: the skrutable version (read without
+    importing skrutable) and a digest of the aksara_counter.py source."""
+    from importlib.metadata import version as package_version
+    with open(Path(__file__).with_name('aksara_counter.py'), 'rb') as f:
+        counter_digest = hashlib.sha256(f.read()).hexdigest()
+    return {'skrutable_version': package_version('skrutable'), 'aksara_counter_sha256': counter_digest}
+
 
 def _is_condensed_lg(lg_element):
     """Check if an <lg> uses condensed verse format (has <l> children with segment n attributes)."""
@@ -39,6 +59,80 @@ def _is_milestone_only_p(p_element):
     return True
 
 
+def _parts_end_with(parts, suffix):
+    """Check whether the concatenation of a list of string parts ends with suffix."""
+    for part in reversed(parts):
+        if part:
+            return part.endswith(suffix)
+    return False
+
+
+# Start tags that can carry an addressable coordinate in rich HTML, with their
+# attributes. lxml escapes "<" in text and ">" in attribute values, so a start
+# tag always ends at the first following ">".
+_START_TAG_RE = re.compile(rb'<(h1|h3|li|a|span|i)\s([^>]*)>')
+_ATTR_RE = re.compile(rb'([\w-]+)="([^"]*)"')
+
+
+class HtmlOffsetIndex:
+    """Map the coordinates of serialized rich HTML to the byte offsets of their start tags.
+
+    The HTML is fed in as it is written, one chunk of whole elements at a
+    time, each with the byte offset in the file at which it starts. With
+    compact line markers, line_rows is the line table: the kth
+    <i class="lb"> marker stands for line_rows[k] = [page, line, breaks].
+
+    offsets(html_bytes) returns a dict with the total size and one {key: offset}
+    map per kind of coordinate, each keeping the first occurrence:
+    - "toc": section <h1> ids (the TOC anchors)
+    - "coords": editorial-coord <h3> ids, e.g. "53_2"
+    - "verses": verse ids, e.g. "v1-1"
+    - "pages": pb-label data-page values, e.g. "53"
+    - "lines": "page_line" keys for lb-labels, paired with the last data-page before them
+    """
+    def __init__(self, line_rows=None):
+        self.line_rows = line_rows
+        self.maps = {"toc": {}, "coords": {}, "verses": {}, "pages": {}, "lines": {}}
+        self.current_page = None
+        self.markers_seen = 0
+
+    def add(self, chunk, base=0):
+        """Index the start tags in chunk, which starts at byte offset base."""
+        maps = self.maps
+        for match in _START_TAG_RE.finditer(chunk):
+            attrs = {name.decode(): html.unescape(value.decode('utf-8')) for name, value in _ATTR_RE.findall(match.group(2))}
+            tag = match.group(1)
+            classes = attrs.get('class', '').split()
+            elem_id = attrs.get('id')
+            offset = base + match.start()
+            if tag == b'h1' and elem_id:
+                maps["toc"].setdefault(elem_id, offset)
+            elif tag == b'h3' and 'editorial-coord' in classes and elem_id:
+                maps["coords"].setdefault(elem_id, offset)
+            elif 'verse' in classes and elem_id:
+                maps["verses"].setdefault(elem_id, offset)
+            if 'data-page' in attrs:
+                self.current_page = attrs['data-page']
+                maps["pages"].setdefault(self.current_page, offset)
+            if 'data-line' in attrs and self.current_page is not None:
+                maps["lines"].setdefault(f"{self.current_page}_{attrs['data-line']}", offset)
+            elif tag == b'i' and classes == ['lb'] and self.line_rows is not None:
+                page, line, _ = self.line_rows[self.markers_seen]
+                self.markers_seen += 1
+                maps["lines"].setdefault(f"{page}_{line}", offset)
+
+    def offsets(self, html_bytes):
+        """The sidecar dict, for an HTML file of html_bytes bytes."""
+        return {"html_bytes": html_bytes, **self.maps}
+
+
+def html_byte_offsets(html_bytes, line_rows=None):
+    """HtmlOffsetIndex.offsets for serialized rich HTML held in memory."""
+    index = HtmlOffsetIndex(line_rows)
+    index.add(html_bytes)
+    return index.offsets(len(html_bytes))
+
+
 class HtmlConverter:
     """Convert TEI XML to HTML.
 
@@ -52,10 +146,39 @@ class HtmlConverter:
       the coordinate system is treated as editorially defined and independent of PDF pages.
     A drama text that uses [page,line] coordinates will have drama=True and default labels.
     """
-    def __init__(self, no_line_numbers=False, only_plain=False, standalone=False, drama=False, page_label="p", line_label="l"):
+    def __init__(self, no_line_numbers=False, only_plain=False, standalone=False, drama=False, page_label="p", line_label="l", stream=False, shard=False, shard_pages=None, compact_lines=False, separate_plain=False, xslt=False, split_sidecar=False, offsets=False):
+        if shard_pages is not None and shard_pages < 1:
+            raise ValueError("shard_pages must be at least 1")
+        if (shard or shard_pages) and standalone:
+            raise ValueError("shard/shard_pages cannot be combined with standalone")
+        if compact_lines and (only_plain or standalone):
+            raise ValueError("compact_lines needs rich output: it cannot be combined with only_plain or standalone")
+        if separate_plain and (only_plain or standalone):
+            raise ValueError("separate_plain needs rich output: it cannot be combined with only_plain or standalone")
+        if xslt and (not only_plain or stream or shard or shard_pages):
+            raise ValueError("xslt requires only_plain and cannot be combined with stream or shard/shard_pages")
+        if split_sidecar and (only_plain or standalone):
+            raise ValueError("split_sidecar needs rich output: it cannot be combined with only_plain or standalone")
+        if offsets and (only_plain or standalone or shard or shard_pages):
+            raise ValueError("offsets needs a single rich HTML file: it cannot be combined with only_plain, standalone or shard/shard_pages")
         self.no_line_numbers = no_line_numbers
         self.only_plain = only_plain
         self.standalone = standalone
+        self.stream = stream
+        self.shard = shard or bool(shard_pages)
+        self.shard_pages = shard_pages
+        self.compact_lines = compact_lines
+        self.line_table = []  # compact_lines: [page, line, breaks] per <i class="lb"> marker, in document order
+        self.separate_plain = separate_plain
+        self.plain_blocks = []  # separate_plain: [block id, plain-text block HTML], in document order
+        self._plain_block_counts = {}  # separate_plain: anchor id -> plain-text blocks keyed to it so far
+        self._plain_anchor = None  # separate_plain: last id seen in the rich layer
+        self._plain_verse_ids = []  # separate_plain: verse ids still awaiting their plain-text blocks
+        self._in_plain_run = False  # separate_plain: the last top-level child seen was a plain-text block
+        self.xslt = xslt  # plain output via templates/plain.xsl (see plain_xslt.py)
+        self.split_sidecar = split_sidecar  # core sidecar plus separate .corrections.json and .metadata.json
+        self.offsets = offsets  # .offsets.json byte-offset sidecar
+        self._offset_index = None  # offsets in streaming mode: HtmlOffsetIndex fed as sections are written
         self.drama = drama
         self.page_label = page_label
         self.line_label = line_label
@@ -76,7 +199,9 @@ class HtmlConverter:
         self.stagger_run_counts = []  # line mode: akṣara counts of prior fragments on the current print line
         self.stagger_since_half = []  # paragraph mode: akṣara counts since the last half-/full-verse boundary
         self.stagger_verse_active = False  # a staggered verse (some fragment carried rend) is in progress
-        self._scanner = None  # lazy skrutable Scanner, created on first staggered verse
+        self._aksara_cache = None  # segment text -> akṣara count, loaded from AKSARA_CACHE_PATH on first use
+        self._aksara_cache_dirty = False
+        self._plain_text_cache = {}  # element -> plain text, see get_plain_text_recursive
 
     # --- Content Processing Functions ---
     def append_text(self, element, text, strip_leading_whitespace=False, treat_as_plain=True):
@@ -125,86 +250,160 @@ class HtmlConverter:
         - <del> content is ignored.
         - <supplied> content is included.
 
+        The result is memoized per element for the duration of one conversion
+        (see _invalidate_plain_text for the places the rich pass mutates the tree).
+
         Args:
             element: The lxml.etree._Element to extract text from.
 
         Returns:
             A string containing the concatenated plain text.
         """
-        text = ''
-        if element.text:
-            text += element.text
-        for child in element:
+        text = self._plain_text_cache.get(element)
+        if text is None:
+            parts = []
+            self._collect_plain_text(element, parts)
+            text = ''.join(parts)
+            self._plain_text_cache[element] = text
+        return text
+
+    def _invalidate_plain_text(self, element):
+        """Drop memoized plain text for element and its ancestors after an in-place edit."""
+        self._plain_text_cache.pop(element, None)
+        for ancestor in element.iterancestors():
+            self._plain_text_cache.pop(ancestor, None)
+
+    def _collect_plain_text(self, element, parts):
+        """Appends the plain text of element to parts in a single walk (see get_plain_text_recursive).
+
+        Subtrees already memoized are reused as-is; everything else is walked inline
+        rather than through get_plain_text_recursive, so intermediate strings are
+        never built and re-concatenated at every level of nesting.
+        """
+        cached = self._plain_text_cache.get(element)
+        if cached is not None:
+            parts.append(cached)
+            return
+        self._collect_plain_run(element.text, list(element), parts)
+
+    def _collect_plain_run(self, text, children, parts, tails=None):
+        """Appends the plain text of a run of sibling children, preceded by text.
+
+        A run is either all children of one element (text being its .text) or one
+        half of an <l> split at its <caesura/>. Next-sibling lookups stay within
+        the run, and tails maps children whose .tail should be read differently.
+        """
+        tails = tails or {}
+        if text:
+            parts.append(text)
+        for i, child in enumerate(children):
+            child_tail = tails[child] if child in tails else child.tail
             if child.tag == 'choice':
                 corr = child.find('corr')
                 if corr is not None:
-                    text += self.get_plain_text_recursive(corr)
+                    self._collect_plain_text(corr, parts)
             elif child.tag == 'del':
                 pass
             elif child.tag == 'supplied':
-                text += self.get_plain_text_recursive(child)
+                self._collect_plain_text(child, parts)
             elif child.tag == 'lg' and child.get('type') == 'chāyā':
                 # Nested chāyā verse group — extract plain text of its <l> children
                 chaya_lines = []
                 for sub_child in child:
                     if sub_child.tag == 'l':
-                        chaya_lines.append(self.get_plain_text_recursive(sub_child))
-                text += ' (' + ' '.join(chaya_lines) + ')'
+                        line_parts = []
+                        self._collect_plain_text(sub_child, line_parts)
+                        chaya_lines.append(''.join(line_parts))
+                parts.append(' (' + ' '.join(chaya_lines) + ')')
             elif child.tag == 'stage':
-                text += '(' + self.get_plain_text_recursive(child) + ')'
+                parts.append('(')
+                self._collect_plain_text(child, parts)
+                parts.append(')')
                 # Ensure a space after closing ) when inline content follows.
                 # Note: the rich-HTML path may have mutated child.tail to ' ' (space-only),
                 # which is dropped by the tail check at the bottom of this loop — so we
                 # must handle the space here rather than relying on that tail append.
-                tail = child.tail or ''
+                tail = child_tail or ''
                 if tail.startswith(' '):
-                    text += ' '
+                    parts.append(' ')
                 elif tail.strip():
                     pass  # tail has real content; space already present or not needed
                 else:
                     # No tail or non-space-prefixed tail: add space if something follows
-                    next_sibling = child.getnext()
+                    next_sibling = children[i + 1] if i + 1 < len(children) else None
                     if next_sibling is not None and next_sibling.tag not in ('lb', 'pb', 'milestone'):
-                        text += ' '
+                        parts.append(' ')
             elif child.tag == 'seg':
                 seg_type = child.get('type', '')
                 if seg_type == 'prakrit':
-                    prakrit_text = child.text or ''
+                    prakrit_parts = [child.text or '']
                     for grandchild in child:
                         if grandchild.tag == 'seg' and grandchild.get('type') == 'chāyā':
                             continue
                         if grandchild.tag == 'stage':
-                            prakrit_text += '(' + self.get_plain_text_recursive(grandchild) + ')'
+                            prakrit_parts.append('(')
+                            self._collect_plain_text(grandchild, prakrit_parts)
+                            prakrit_parts.append(')')
                         elif grandchild.tag == 'lb':
                             # Non-hyphenated lb needs a space before its tail in plain text
                             if grandchild.get('break') != 'no' and grandchild.tail:
-                                if not prakrit_text.endswith(' '):
-                                    prakrit_text += ' '
+                                if not _parts_end_with(prakrit_parts, ' '):
+                                    prakrit_parts.append(' ')
                         else:
-                            prakrit_text += self.get_plain_text_recursive(grandchild)
+                            self._collect_plain_text(grandchild, prakrit_parts)
                         if grandchild.tail:
-                            prakrit_text += grandchild.tail
+                            prakrit_parts.append(grandchild.tail)
+                    parts.extend(prakrit_parts)
+                    parts.append(' (')
                     chaya_el = child.find('seg[@type="chāyā"]')
-                    chaya_text = self.get_plain_text_recursive(chaya_el) if chaya_el is not None else ''
-                    text += prakrit_text + ' (' + chaya_text + ')'
+                    if chaya_el is not None:
+                        self._collect_plain_text(chaya_el, parts)
+                    parts.append(')')
                 elif seg_type == 'chāyā':
                     pass  # handled by parent prakrit seg
                 else:
-                    text += self.get_plain_text_recursive(child)
+                    self._collect_plain_text(child, parts)
             else:
-                text += self.get_plain_text_recursive(child)
-            if child.tail and child.tail.strip():
-                text += child.tail
-        return text
+                self._collect_plain_text(child, parts)
+            if child_tail and child_tail.strip():
+                parts.append(child_tail)
 
     def _count_aksaras(self, text):
-        """Count akṣaras (syllables) in IAST text via skrutable's scansion."""
+        """Count akṣaras (syllables) in IAST text, consulting the on-disk cache first."""
         if not text.strip():
             return 0
-        if self._scanner is None:
-            self._scanner = Scanner()
-        verse = self._scanner.scan(text, from_scheme="IAST")
-        return sum(1 for s in verse.text_syllabified.replace("\n", " ").split(" ") if s)
+        if self._aksara_cache is None:
+            self._aksara_cache = self._load_aksara_cache()
+        count = self._aksara_cache.get(text)
+        if count is None:
+            count = count_aksaras(text)
+            self._aksara_cache[text] = count
+            self._aksara_cache_dirty = True
+        return count
+
+    @staticmethod
+    def _load_aksara_cache():
+        """Read the on-disk akṣara cache, discarding it if written by another skrutable version or counter."""
+        try:
+            with open(AKSARA_CACHE_PATH, encoding='utf-8') as f:
+                cached = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if cached.get('key') != _aksara_cache_key():
+            return {}
+        return cached.get('counts', {})
+
+    def _save_aksara_cache(self):
+        """Write back the akṣara cache if any segment was newly scanned during this run."""
+        if not self._aksara_cache_dirty:
+            return
+        AKSARA_CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = AKSARA_CACHE_PATH.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'key': _aksara_cache_key(), 'counts': self._aksara_cache},
+                      f, ensure_ascii=False, sort_keys=True)
+        os.replace(tmp_path, AKSARA_CACHE_PATH)
+        self._aksara_cache_dirty = False
 
     def _l_caesura_segments(self, l_element):
         """Plain-text segments of an <l>, split at <caesura/> (i.e. per physical print line)."""
@@ -270,6 +469,45 @@ class HtmlConverter:
 
         return offset_para, offset_lines
 
+    def _split_l_at_caesura(self, l_element):
+        """Split an <l> at its first <caesura/> into two runs of the source children.
+
+        Returns (first_run, second_run, tails) where each run is a (text, children)
+        pair for _process_run/_collect_plain_run, or None if the <l> has no caesura.
+        Only the first <caesura/> is a split point. A 4-pāda verse has 3 caesuras
+        (after pādas 1, 2, 3); the rest stay in the second run so process_children's
+        is_after_caesura check still finds them and emits a <br> before pādas 3 and 4
+        (in_lg mode only breaks lines right after a <caesura> sibling).
+
+        If the second run starts with a hyphenated <lb break="no">, the hyphen belongs
+        at the end of the first run: the <lb> moves there (its tail overridden to None
+        via tails) and its tail is promoted into the second run's text, so the word
+        continuation stays in the second half. The source tree is left untouched.
+        """
+        children = list(l_element)
+        split = next((i for i, child in enumerate(children) if child.tag == 'caesura'), None)
+        if split is None:
+            return None
+        first_text, first_children = l_element.text, children[:split]
+        second_text, second_children = children[split].tail, children[split + 1:]
+        tails = {}
+        if second_children and second_children[0].tag == 'lb' and second_children[0].get('break') == 'no':
+            lb_node = second_children.pop(0)
+            second_text = (second_text or '') + (lb_node.tail or '')
+            first_children.append(lb_node)
+            tails[lb_node] = None
+        return (first_text, first_children), (second_text, second_children), tails
+
+    def _process_l_run(self, run, tails, html_node, treat_as_plain, in_lg):
+        """Render one half of a split <l> (see _split_l_at_caesura) into html_node."""
+        text, children = run
+        if treat_as_plain:
+            parts = []
+            self._collect_plain_run(text, children, parts, tails)
+            self.append_text(html_node, ''.join(parts), treat_as_plain=True)
+        else:
+            self._process_run(text, children, html_node, treat_as_plain, in_lg=in_lg, readonly=True, tails=tails)
+
     def _render_l_as_li(self, l_element, target_ul, treat_as_plain):
         """Render an <l> element as a single <li>, with caesura becoming a hidden <br class="lb-br">.
 
@@ -277,47 +515,15 @@ class HtmlConverter:
         per <l> (2 lines for a 4-pāda verse) while line-by-line mode splits at the caesura.
         """
         li = etree.SubElement(target_ul, "li")
-        caesura = l_element.find('caesura')
-        if caesura is None:
-            self.process_children(l_element, li, treat_as_plain, in_lg=True)
+        split = self._split_l_at_caesura(l_element)
+        if split is None:
+            self.process_children(l_element, li, treat_as_plain, in_lg=True, readonly=True)
             return
 
-        # Split at the first <caesura/> only: build two synthetic <l> wrappers.
-        # A 4-pāda verse has 3 caesuras (after pādas 1, 2, 3); only the first is a
-        # split point here — the rest must survive as ordinary children of second_l
-        # so process_children's is_after_caesura check still finds them and emits a
-        # <br> before pādas 3 and 4 (in_lg mode only breaks lines right after a
-        # <caesura> sibling).
-        first_l = etree.Element("l")
-        second_l = etree.Element("l")
-        first_l.text = l_element.text
-        before_caesura = True
-
-        for child in l_element:
-            if child.tag == 'caesura' and before_caesura:
-                before_caesura = False
-                if child.tail:
-                    second_l.text = child.tail
-                continue
-            child_copy = copy.deepcopy(child)
-            if before_caesura:
-                first_l.append(child_copy)
-            else:
-                second_l.append(child_copy)
-
-        # If the first child of second_l is <lb break="no">, the hyphen belongs at
-        # the end of first_l; promote its tail to second_l.text.
-        if len(second_l) > 0 and second_l[0].tag == 'lb' and second_l[0].get('break') == 'no':
-            lb_node = second_l[0]
-            tail = lb_node.tail or ''
-            lb_node.tail = None
-            second_l.remove(lb_node)
-            second_l.text = (second_l.text or '') + tail
-            first_l.append(lb_node)
-
-        self.process_children(first_l, li, treat_as_plain, in_lg=True)
+        first_run, second_run, tails = split
+        self._process_l_run(first_run, tails, li, treat_as_plain, in_lg=True)
         etree.SubElement(li, "br", {"class": "lb-br rich-text"})
-        self.process_children(second_l, li, treat_as_plain, in_lg=True)
+        self._process_l_run(second_run, tails, li, treat_as_plain, in_lg=True)
 
     def _render_l_as_spans(self, l_element, target_div, treat_as_plain, in_lg):
         """Render an <l> element as one or more <span> elements.
@@ -325,76 +531,17 @@ class HtmlConverter:
         If the <l> contains a <caesura/>, split into two <span> elements
         so that each pāda displays on its own line.
         """
-        caesura = l_element.find('caesura')
-        if caesura is None:
+        split = self._split_l_at_caesura(l_element)
+        if split is None:
             span_tag = etree.SubElement(target_div, "span")
-            self.process_children(l_element, span_tag, treat_as_plain, in_lg=in_lg)
+            self.process_children(l_element, span_tag, treat_as_plain, in_lg=in_lg, readonly=True)
             return
 
-        # Split <l> at <caesura/>: build two virtual halves
-        # First half: l.text + children before caesura (with their tails)
-        # Second half: caesura.tail + children after caesura (with their tails)
-        before_caesura = True
-        first_span = etree.SubElement(target_div, "span")
-        second_span = etree.SubElement(target_div, "span")
+        first_run, second_run, tails = split
+        self._process_l_run(first_run, tails, etree.SubElement(target_div, "span"), treat_as_plain, in_lg)
+        self._process_l_run(second_run, tails, etree.SubElement(target_div, "span"), treat_as_plain, in_lg)
 
-        if l_element.text:
-            first_span.text = l_element.text
-
-        for child in l_element:
-            if child.tag == 'caesura' and before_caesura:
-                before_caesura = False
-                if child.tail:
-                    second_span.text = child.tail
-                continue
-            target_span = first_span if before_caesura else second_span
-            child_copy = copy.deepcopy(child)
-            # Move tail to the copy
-            target_span.append(child_copy)
-
-        # Now process each half through process_children wouldn't work since
-        # we've already built the structure. Instead, re-process from scratch
-        # using temporary <l> wrappers.
-        # Clear what we built and do it properly:
-        target_div.remove(first_span)
-        target_div.remove(second_span)
-
-        first_l = etree.Element("l")
-        second_l = etree.Element("l")
-        first_l.text = l_element.text
-        before_caesura = True
-
-        for child in l_element:
-            if child.tag == 'caesura' and before_caesura:
-                before_caesura = False
-                # caesura.tail becomes second_l.text (or prepend)
-                if child.tail:
-                    second_l.text = child.tail
-                continue
-            if before_caesura:
-                child_copy = copy.deepcopy(child)
-                first_l.append(child_copy)
-            else:
-                child_copy = copy.deepcopy(child)
-                second_l.append(child_copy)
-
-        # If the first child of second_l is a hyphenated <lb break="no">, the hyphen
-        # belongs at the end of first_l. Move the lb (without its tail) to first_l,
-        # and promote its tail to second_l.text so the word continuation stays in second_l.
-        if len(second_l) > 0 and second_l[0].tag == 'lb' and second_l[0].get('break') == 'no':
-            lb_node = second_l[0]
-            tail = lb_node.tail or ''
-            lb_node.tail = None
-            second_l.remove(lb_node)
-            second_l.text = (second_l.text or '') + tail
-            first_l.append(lb_node)
-
-        first_span = etree.SubElement(target_div, "span")
-        self.process_children(first_l, first_span, treat_as_plain, in_lg=in_lg)
-        second_span = etree.SubElement(target_div, "span")
-        self.process_children(second_l, second_span, treat_as_plain, in_lg=in_lg)
-
-    def process_children(self, xml_node, html_node, treat_as_plain, in_lg=False):
+    def process_children(self, xml_node, html_node, treat_as_plain, in_lg=False, readonly=False):
         """Recursively processes TEI XML nodes and converts them to HTML elements.
 
         This function walks through the children of an XML node, creating corresponding
@@ -406,17 +553,30 @@ class HtmlConverter:
             xml_node: The source lxml.etree._Element from the TEI XML.
             html_node: The parent lxml.etree._Element in the target HTML tree.
             treat_as_plain: A boolean flag; if True, generates simplified plain text content.
+            readonly: If True, never edit xml_node's subtree; adjusted stage-direction
+                      tails are used for this output only (verse rendering).
         """
         if treat_as_plain:
             text_content = self.get_plain_text_recursive(xml_node)
             self.append_text(html_node, text_content, treat_as_plain=treat_as_plain)
             return
 
-        if xml_node.text:
-            self.append_text(html_node, xml_node.text, treat_as_plain=treat_as_plain)
-        for child in xml_node:
+        self._process_run(xml_node.text, list(xml_node), html_node, treat_as_plain, in_lg=in_lg, readonly=readonly)
+
+    def _process_run(self, text, children, html_node, treat_as_plain, in_lg=False, readonly=False, tails=None):
+        """Rich-mode body of process_children over an explicit run of sibling children.
+
+        text stands in for the parent's .text, sibling lookups stay within the run,
+        and tails maps children whose .tail should be read differently — so one half
+        of an <l> split at its <caesura/> renders exactly as if it were a separate <l>.
+        """
+        tails = tails or {}
+        if text:
+            self.append_text(html_node, text, treat_as_plain=treat_as_plain)
+        for i, child in enumerate(children):
+            child_tail = tails[child] if child in tails else child.tail
             if child.tag == 'lb':
-                previous_sibling = child.getprevious()
+                previous_sibling = children[i - 1] if i > 0 else None
 
                 # A hyphenated <pb> may immediately precede this <lb> (the <lb> that
                 # would have carried break="no" was merged into the <pb> by the XML
@@ -495,30 +655,30 @@ class HtmlConverter:
                     self.corrections_data.append(entry)
                 ante = etree.SubElement(corr_span, "i", {"class": "ante-correction", "title": f"pre-correction (post-: {corr_text})"})
                 if sic is not None:
-                    self.process_children(sic, ante, treat_as_plain, in_lg=in_lg)
+                    self.process_children(sic, ante, treat_as_plain, in_lg=in_lg, readonly=readonly)
                 post = etree.SubElement(corr_span, "i", {"class": "post-correction", "style": "display:none;", "title": f"post-correction (pre-: {sic_text})"})
                 if corr is not None:
-                    self.process_children(corr, post, treat_as_plain, in_lg=in_lg)
+                    self.process_children(corr, post, treat_as_plain, in_lg=in_lg, readonly=readonly)
             elif child.tag in ['del', 'supplied']:
                 corr_span = etree.SubElement(html_node, "span", {"class": "correction"})
-                text = ''.join(child.itertext())
+                inner_text = ''.join(child.itertext())
                 if not self.only_plain:
                     if self.current_verse is not None:
-                        entry = {'sic': text if child.tag == 'del' else '', 'corr': text if child.tag == 'supplied' else '', 'verse': self.current_verse, 'verse_part': self.current_verse_part, 'coord_id': self.current_coord_id}
+                        entry = {'sic': inner_text if child.tag == 'del' else '', 'corr': inner_text if child.tag == 'supplied' else '', 'verse': self.current_verse, 'verse_part': self.current_verse_part, 'coord_id': self.current_coord_id}
                     else:
-                        entry = {'sic': text if child.tag == 'del' else '', 'corr': text if child.tag == 'supplied' else '', 'page': self.current_page, 'line': self.current_line, 'coord_id': self.current_coord_id}
+                        entry = {'sic': inner_text if child.tag == 'del' else '', 'corr': inner_text if child.tag == 'supplied' else '', 'page': self.current_page, 'line': self.current_line, 'coord_id': self.current_coord_id}
                     self.corrections_data.append(entry)
                 if child.tag == 'del':
                     ante = etree.SubElement(corr_span, "i", {"class": "ante-correction", "title": "deletion"})
-                    self.process_children(child, ante, treat_as_plain, in_lg=in_lg)
+                    self.process_children(child, ante, treat_as_plain, in_lg=in_lg, readonly=readonly)
                     etree.SubElement(corr_span, "i", {"class": "post-correction", "style": "display:none;"}).text = ''
                 else: # supplied
                     etree.SubElement(corr_span, "i", {"class": "ante-correction"}).text = ''
                     post = etree.SubElement(corr_span, "i", {"class": "post-correction", "style": "display:none;", "title": "supplied"})
-                    self.process_children(child, post, treat_as_plain, in_lg=in_lg)
+                    self.process_children(child, post, treat_as_plain, in_lg=in_lg, readonly=readonly)
             elif child.tag == 'unclear':
                 unclear_span = etree.SubElement(html_node, "span", {"class": "unclear", "title": "unclear"})
-                self.process_children(child, unclear_span, treat_as_plain, in_lg=in_lg)
+                self.process_children(child, unclear_span, treat_as_plain, in_lg=in_lg, readonly=readonly)
             elif child.tag == 'stage':
                 if not treat_as_plain:
                     for _ in range(self.pending_breaks):
@@ -529,56 +689,60 @@ class HtmlConverter:
                         self.pending_label = None
                 stage_span = etree.SubElement(html_node, "span", {"class": "stage-direction"})
                 stage_span.text = "("
-                self.process_children(child, stage_span, treat_as_plain, in_lg=in_lg)
+                self.process_children(child, stage_span, treat_as_plain, in_lg=in_lg, readonly=readonly)
                 self.append_text(stage_span, ")", treat_as_plain=treat_as_plain)
+                next_sib = children[i + 1] if i + 1 < len(children) else None
                 if not treat_as_plain:
-                    next_sib = child.getnext()
-                    prev_sib = child.getprevious()
+                    prev_sib = children[i - 1] if i > 0 else None
                     # Stage on its own line: no preceding siblings in the XML source,
                     # no text before it in the parent, followed by <lb> — emit a visible
                     # <br> so following content doesn't run on.
-                    xml_parent = child.getparent()
                     if (next_sib is not None and next_sib.tag == 'lb'
                             and prev_sib is None
-                            and not (child.tail and child.tail.strip())
-                            and not (xml_parent is not None and (xml_parent.text or '').strip())):
+                            and not (child_tail and child_tail.strip())
+                            and not (text or '').strip()):
                         etree.SubElement(html_node, "br")
                         # A second <br> makes a visible blank-line gap, needed when more
                         # content follows in the same flow. But if this <lb> is the <p>'s
                         # last child, the <p> ends here and whatever follows is a new
                         # <h3> location heading — its own CSS margin already supplies a
                         # gap, so a second <br> on top of it would double up the spacing.
-                        if next_sib.getnext() is not None:
+                        if i + 2 < len(children):
                             etree.SubElement(html_node, "br")
                 # Ensure a space after the closing paren when followed by content.
                 # The XML parser's remove_blank_text=True strips whitespace-only tails,
                 # so we must inject a space when the tail is missing or abuts the next word.
                 # A mid-line stage direction (non-empty tail = dialogue follows on the same
                 # line) gets two NBSPs instead of a plain space, to set it off visually.
-                if child.tail and child.tail.strip():
+                if child_tail and child_tail.strip():
                     sep = '  '
-                    stripped = child.tail.lstrip(' ')
-                    child.tail = sep + stripped
-                elif child.getnext() is not None or (child.tail and not child.tail.startswith(' ')):
-                    if not child.tail:
-                        child.tail = ' '
-                    elif not child.tail.startswith(' '):
-                        child.tail = ' ' + child.tail
+                    stripped = child_tail.lstrip(' ')
+                    child_tail = sep + stripped
+                elif next_sib is not None or (child_tail and not child_tail.startswith(' ')):
+                    if not child_tail:
+                        child_tail = ' '
+                    elif not child_tail.startswith(' '):
+                        child_tail = ' ' + child_tail
+                if not readonly and child_tail != child.tail:
+                    # The plain-text layer of a <p> is built after its rich layer and
+                    # picks up the adjusted tail from the source tree.
+                    child.tail = child_tail
+                    self._invalidate_plain_text(child)
             elif child.tag == 'seg':
                 seg_type = child.get('type', '')
                 if seg_type == 'chāyā':
                     chaya_span = etree.SubElement(html_node, "span", {"class": "chaya"})
-                    self.process_children(child, chaya_span, treat_as_plain, in_lg=in_lg)
+                    self.process_children(child, chaya_span, treat_as_plain, in_lg=in_lg, readonly=readonly)
                 elif seg_type == 'prakrit':
                     prakrit_span = etree.SubElement(html_node, "span", {"class": "prakrit"})
-                    self.process_children(child, prakrit_span, treat_as_plain, in_lg=in_lg)
+                    self.process_children(child, prakrit_span, treat_as_plain, in_lg=in_lg, readonly=readonly)
                 else:
-                    self.process_children(child, html_node, treat_as_plain, in_lg=in_lg)
+                    self.process_children(child, html_node, treat_as_plain, in_lg=in_lg, readonly=readonly)
             else:
-                self.process_children(child, html_node, treat_as_plain, in_lg=in_lg)
-            if child.tail:
+                self.process_children(child, html_node, treat_as_plain, in_lg=in_lg, readonly=readonly)
+            if child_tail:
                 should_strip = (child.tag in ['lb', 'pb']) and not treat_as_plain
-                self.append_text(html_node, child.tail, strip_leading_whitespace=should_strip, treat_as_plain=treat_as_plain)
+                self.append_text(html_node, child_tail, strip_leading_whitespace=should_strip, treat_as_plain=treat_as_plain)
 
     def _emit_editorial_coord_h2(self, content_div, n_attr):
         """Emit an editorial-coordinate <h3> to content_div for the given n attribute value.
@@ -781,6 +945,7 @@ class HtmlConverter:
 
             for br_tag in trailing_breaks:
                 last_l.append(br_tag)
+            self._invalidate_plain_text(last_l)
 
         # Track which <l> is last so we can bold its verse number in the HTML output
         last_l_for_bold = last_l if (last_l is not None and verse_n) else None
@@ -823,369 +988,267 @@ class HtmlConverter:
                 milestone_li = etree.SubElement(padas_ul, "li", {"class": "milestone-verse"})
                 milestone_li.text = f'{child.get("n")}'
 
-    def convert_xml_to_html(self, xml_path, html_path):
+    def _load_metadata_entries(self, text_base_name):
+        """Load metadata_entries and pdf_page_mapping for the JSON sidecar from the metadata stage's record."""
+        metadata_md_path = PROJECT_ROOT / 'metadata' / 'markdown' / f'{text_base_name}.md'
+
+        if metadata_md_path.exists():
+            metadata_entries, self.pdf_page_mapping = load_sidecar_metadata(metadata_md_path)
+            self.metadata_entries.extend(metadata_entries)
+
+    @staticmethod
+    def _new_document_scan():
+        """State for _scan_body_child: TOC entries, document flags and the last <pb> seen."""
+        return {'toc': [], 'has_named_sections': False, 'has_chaya': False, 'last_pb': None}
+
+    def _scan_body_child(self, child, scan):
+        """Forward-pass bookkeeping for one <body> child, called on each child in document order.
+
+        A single walk over the child's descendants records whether it contains
+        chāyā markup, its first <pb> and first element with an n attribute, and
+        its last <pb>. A <div n> section gets a TOC entry in scan['toc'] with its
+        start page:
+        - standard (line-numbered) texts: the page of the first content element
+          with n (e.g. <p n="336,14">), failing that its first <pb>;
+        - no_line_numbers texts: its leading <pb> child if any, otherwise the last
+          <pb> inside an earlier <body> child (a bare <pb> child does not count).
         """
-        In default rich mode, converts a TEI XML file into an HTML fragment and corresponding JSON sidecar file.
-        - The HTML file contains only the core text content inside a <div id="content">.
-        - The JSON file contains all metadata, TOC, corrections, and display flags.
-        Plain and standalone modes omit the JSON sidecar.
-        Plain mode omits rich formatting anticipating JavaScript controls.
-        Standalone mode outputs a complete rich HTML document, not a fragment.
-        """
-
-        # 1. prep XML data, remove namespace prefixes, get text name
-        parser = etree.XMLParser(remove_blank_text=True)
-        tree = etree.parse(xml_path, parser)
-        for elem in tree.iter():
-            if '}' in elem.tag:
-                elem.tag = elem.tag.split('}', 1)[1]
-        root = tree.getroot()
-        text_base_name = Path(xml_path).stem
-
-        # 2. generate JSON sidecar (TOC + Metadata for rich HTML)
-        div_sections = root.xpath('//body/div[@n]')
-        has_named_sections = any(d.get('n') for d in div_sections)
-        if not self.only_plain:
-            for div_section in (div_sections if has_named_sections else []):
-                section_name = div_section.get('n')
-                start_page = 'N/A'
-                if self.no_line_numbers:
-                    # Condensed-verse-format: only <pb> elements carry page numbers.
-                    # Check if a <pb> is the div's first child (marks the section start).
-                    # Otherwise the section starts mid-page, so walk backwards to the
-                    # nearest preceding <pb>.
-                    first_child = div_section[0] if len(div_section) else None
-                    if first_child is not None and first_child.tag == 'pb':
-                        start_page = first_child.get('n')
+        first_n_elem = first_pb = last_pb = None
+        if child.tag in ('seg', 'lg') and child.get('type') == 'chāyā':
+            scan['has_chaya'] = True
+        for elem in child.iterdescendants(tag=etree.Element):
+            if elem.tag == 'pb':
+                if first_pb is None:
+                    first_pb = elem
+                last_pb = elem
+            elif elem.tag in ('seg', 'lg') and elem.get('type') == 'chāyā':
+                scan['has_chaya'] = True
+            if first_n_elem is None and elem.get('n') is not None:
+                first_n_elem = elem
+
+        if child.tag == 'div' and child.get('n') is not None:
+            section_name = child.get('n')
+            scan['has_named_sections'] = scan['has_named_sections'] or bool(section_name)
+            if not self.only_plain:
+                if not self.no_line_numbers:
+                    if first_n_elem is not None and first_n_elem.tag != 'pb':
+                        n_attr = first_n_elem.get('n')
+                        start_page = n_attr.split(',')[0] if ',' in n_attr else n_attr
+                    elif first_pb is not None:
+                        start_page = first_pb.get('n')
                     else:
-                        for prev in div_section.itersiblings(preceding=True):
-                            pbs = prev.xpath('.//pb')
-                            if pbs:
-                                start_page = pbs[-1].get('n')
-                                break
+                        start_page = 'N/A'
+                elif len(child) and child[0].tag == 'pb':
+                    start_page = child[0].get('n')
+                elif scan['last_pb'] is not None:
+                    start_page = scan['last_pb'].get('n')
                 else:
-                    # Standard texts: the first content element (e.g. <p n="336,14">)
-                    # records the actual page,line where the section starts.
-                    first_elem_with_n = div_section.find('.//*[@n]')
-                    if first_elem_with_n is not None and first_elem_with_n.tag != 'pb':
-                        n_attr = first_elem_with_n.get('n')
-                        if ',' in n_attr:
-                            start_page = n_attr.split(',')[0]
-                        else:
-                            start_page = n_attr
-                    else:
-                        first_pb = div_section.find('.//pb')
-                        if first_pb is not None:
-                            start_page = first_pb.get('n')
-
-                self.toc_data.append({'name': section_name, 'page': start_page, 'id': f'{section_name.replace(" ", "_")}'})
-
-            metadata_md_path = Path(__file__).resolve().parents[3] / 'metadata' / 'markdown' / f'{text_base_name}.md'
-
-            if metadata_md_path.exists():
-                md_content = metadata_md_path.read_text(encoding="utf-8")
-                html_content = markdown.markdown(md_content, extensions=['tables', 'fenced_code'])
-                
-                # Prefix miscellaneous links to point to /static/data/
-                html_content = html_content.replace('href="miscellaneous/', 'href="/static/data/miscellaneous/')
-                html_content = html_content.replace('href="/miscellaneous/', 'href="/static/data/miscellaneous/')
-
-                parsed_md_body = fromstring(html_content)
-
-                nodes = list(parsed_md_body.iterchildren())
-                i = 0
-                while i < len(nodes):
-                    node = nodes[i]
-                    if node.tag == 'h1':
-                        content_nodes = []
-                        i += 1
-                        while i < len(nodes) and nodes[i].tag != 'h1':
-                            content_nodes.append(nodes[i])
-                            i += 1
-
-                        inline_text = None
-                        rendered_html = ""
-
-                        # If there's only one paragraph and it has no child elements (like links), treat it as inline text.
-                        if len(content_nodes) == 1 and content_nodes[0].tag == 'p' and len(content_nodes[0]) == 0:
-                            inline_text = content_nodes[0].text_content()
-                        else:
-                            if content_nodes:
-                                rendered_html = "".join(etree.tostring(cn, encoding="unicode") for cn in content_nodes)
-
-                        label_text = (node.text or '').strip()
-                        if not (inline_text or rendered_html).strip():
-                            continue
-                        self.metadata_entries.append({
-                            "type": "field",
-                            "label": label_text or None,
-                            "inline_text": (inline_text or '').strip() or None,
-                            "content_html": rendered_html
-                        })
-                    else:
-                        i += 1
-
-                pdf_link_url = None
-                pdf_offsets = None
-                edition_pdfs_entry = next((entry for entry in self.metadata_entries if entry['label'] == 'Edition PDFs'), None)
-                if edition_pdfs_entry and edition_pdfs_entry['content_html']:
-                    html_fragment = fromstring(edition_pdfs_entry['content_html'])
-                    first_li = html_fragment.find('.//li')
-                    first_li_text = (first_li.text_content() if first_li is not None else '').strip()
-                    if not first_li_text.startswith('No '):
-                        link = html_fragment.find('.//a')
-                        if link is not None and 'href' in link.attrib:
-                            pdf_link_url = link.get('href')
-
-                pdf_offset_entry = next((entry for entry in self.metadata_entries if entry['label'] == 'PDF Page Offset'), None)
-                if pdf_offset_entry and pdf_offset_entry['content_html']:
-                    html_fragment = fromstring(pdf_offset_entry['content_html']) # this will be a <ul>
-                    offsets = []
-                    for li in html_fragment.findall('.//li'):
-                        text = li.text_content().strip()
-                        if '→' in text:
-                            parts = [p.strip() for p in text.split('→')]
-                        else:
-                            parts = [p.strip() for p in text.split(',')]
-                        if len(parts) == 2:
-                            try:
-                                offsets.append([int(parts[0]), int(parts[1])])
-                            except ValueError:
-                                pass
-                    if offsets:
-                        pdf_offsets = offsets
-
-                if pdf_offsets is None:
-                    pdf_offsets = [[1, 1]]
-
-                if pdf_link_url and pdf_offsets:
-                    self.pdf_page_mapping = {
-                        "url": pdf_link_url,
-                        "offsets": pdf_offsets
-                    }
-
-                # Remove PDF Page Offset from displayed metadata (internal use only)
-                if pdf_offset_entry:
-                    self.metadata_entries.remove(pdf_offset_entry)
-
-
-        # 3. generate content_div HTML fragment (= main content processing loop)
-        content_div = etree.Element("div", id="content")
-        if not self.only_plain:
-            content_div.set('class', 'hide-editorial-coords')
+                    start_page = 'N/A'
+                scan['toc'].append({'name': section_name, 'page': start_page, 'id': f'{section_name.replace(" ", "_")}'})
+
+        if last_pb is not None:
+            scan['last_pb'] = last_pb
+
+    def _convert_section(self, section, content_div):
+        """Convert one <body>/<div n> section, appending its HTML to content_div."""
+        section_name = section.get('n')
+        if section_name:
+            h1 = etree.SubElement(content_div, "h1", id=section_name.replace(" ", "_"))
+            h1.text = f"§ {section_name}"
+
+        # Collect lg elements for this section to wrap in a <ul class="verses">
+        # We use a "current verses_ul" that gets created on first lg and closed on non-lg
+        current_verses_ul = None
+
+        for element in section.iterchildren():
+            if element.tag == "milestone":
+                current_verses_ul = None
+                # Milestones occupy a physical line
+                self.current_line = str(int(self.current_line) + 1)
+                if self.pending_label is not None:
+                    label_text = f'({self.page_label}.{self.current_page}, {self.line_label}.{self.current_line})' if not self.no_line_numbers else f'({self.page_label}.{self.current_page})'
+                    self.pending_label.text = label_text
+                n_attr = element.get("n")
+                if n_attr:
+                    etree.SubElement(content_div, "h2", {"class": "milestone rich-text"}).text = n_attr
+
+            elif element.tag == "pb":
+                self.current_page = element.get("n")
+                self.current_line = "1"
+                pb_a = etree.Element("a", {"class": "pb-label rich-text", "data-page": self.current_page, "target": "_blank"})
+                if self.page_label != "p":
+                    pb_a.text = f'(p.{self.current_page})'
+                else:
+                    pb_a.text = f'({self.page_label}.{self.current_page}, {self.line_label}.1)' if not self.no_line_numbers else f'({self.page_label}.{self.current_page})'
+                self.pending_label = pb_a
 
-        self.current_page, self.current_line = '', '1'  # TODO: investigate whether necessary to reset like this
-        for section in root.xpath('//body/div[@n]'):
-            section_name = section.get('n')
-            if section_name:
-                h1 = etree.SubElement(content_div, "h1", id=section_name.replace(" ", "_"))
-                h1.text = f"§ {section_name}"
-
-            # Collect lg elements for this section to wrap in a <ul class="verses">
-            # We use a "current verses_ul" that gets created on first lg and closed on non-lg
-            current_verses_ul = None
-
-            for element in section.iterchildren():
-                if element.tag == "milestone":
-                    current_verses_ul = None
-                    # Milestones occupy a physical line
-                    self.current_line = str(int(self.current_line) + 1)
-                    if self.pending_label is not None:
-                        label_text = f'({self.page_label}.{self.current_page}, {self.line_label}.{self.current_line})' if not self.no_line_numbers else f'({self.page_label}.{self.current_page})'
-                        self.pending_label.text = label_text
-                    n_attr = element.get("n")
-                    if n_attr:
-                        etree.SubElement(content_div, "h2", {"class": "milestone rich-text"}).text = n_attr
-
-                elif element.tag == "pb":
-                    self.current_page = element.get("n")
-                    self.current_line = "1"
-                    pb_a = etree.Element("a", {"class": "pb-label rich-text", "data-page": self.current_page, "target": "_blank"})
-                    if self.page_label != "p":
-                        pb_a.text = f'(p.{self.current_page})'
-                    else:
-                        pb_a.text = f'({self.page_label}.{self.current_page}, {self.line_label}.1)' if not self.no_line_numbers else f'({self.page_label}.{self.current_page})'
-                    self.pending_label = pb_a
-
-                elif element.tag == "sp":
-                    # Drama: speech container.
-                    # Rich and plain passes are unified into one loop so that
-                    # editorial-coord <h2> elements can be interleaved at
-                    # content_div level between speech containers.
-                    speaker_el = element.find("speaker")
-                    speaker_name = (speaker_el.text or "") if speaker_el is not None else ""
-
-                    speech_div = None        # rich container; reset at each location marker
-                    speech_div_plain = None  # plain container; reset at each location marker
-                    verses_ul = None         # <ul class="verses"> inside speech_div; <li class="verse">
-                                             # elements from process_lg_content must sit inside a <ul>,
-                                             # not directly in speech_div (which is a <div>).
-                                             # Reset alongside speech_div and whenever a non-lg child
-                                             # (p, stage) interrupts a run of verses.
-                    first_rich_div = True    # speaker span emitted only on the first rich div
-                    speaker_shown = False    # speaker name prepended only on first <p> (plain)
-                    last_sp_location = None  # dedup: skip h2 if location unchanged
-
-                    for sp_child in element.iterchildren():
-                        if sp_child.tag == "speaker":
-                            continue
+            elif element.tag == "sp":
+                # Drama: speech container.
+                # Rich and plain passes are unified into one loop so that
+                # editorial-coord <h2> elements can be interleaved at
+                # content_div level between speech containers.
+                speaker_el = element.find("speaker")
+                speaker_name = (speaker_el.text or "") if speaker_el is not None else ""
+
+                speech_div = None        # rich container; reset at each location marker
+                speech_div_plain = None  # plain container; reset at each location marker
+                verses_ul = None         # <ul class="verses"> inside speech_div; <li class="verse">
+                                         # elements from process_lg_content must sit inside a <ul>,
+                                         # not directly in speech_div (which is a <div>).
+                                         # Reset alongside speech_div and whenever a non-lg child
+                                         # (p, stage) interrupts a run of verses.
+                first_rich_div = True    # speaker span emitted only on the first rich div
+                speaker_shown = False    # speaker name prepended only on first <p> (plain)
+                last_sp_location = None  # dedup: skip h2 if location unchanged
+
+                for sp_child in element.iterchildren():
+                    if sp_child.tag == "speaker":
+                        continue
 
-                        n_attr = sp_child.get("n")
-                        if n_attr and ',' in n_attr:
-                            if n_attr != last_sp_location:
-                                # Location marker: emit <h2> and reset speech containers
-                                # so the content following the marker starts a fresh div.
-                                speech_div = None
-                                speech_div_plain = None
-                                verses_ul = None
-                                self._emit_editorial_coord_h2(content_div, n_attr)
-                                last_sp_location = n_attr
-                            elif self.page_label != "p":
-                                # Same location, custom editorial coords: no new h2, but restore
-                                # current_page/line from the n attribute. A <pb> inside the
-                                # preceding sibling may have clobbered them with a PDF page number.
-                                n_parts = n_attr.split(',')
-                                self.current_page = n_parts[0].strip()
-                                self.current_line = n_parts[1].strip() if len(n_parts) > 1 else "1"
-
-                        # Lazily create speech containers (or re-create after a reset).
-                        if not self.only_plain and speech_div is None:
-                            speech_div = etree.SubElement(content_div, "div", {"class": "speech rich-text"})
-                            if speaker_name and first_rich_div:
-                                # A page break pending from before this <sp> still needs to be
-                                # shown, on its own line, ahead of the speaker attribution — but
-                                # only when there's no <p> for it to land inside inline (the normal
-                                # path, via process_children's own <pb> handling). That's the case
-                                # for a bare cue ("name —") going straight into a <lg> verse, which
-                                # has no <p> at all.
-                                if (sp_child.tag != "p"
-                                        and self.pending_label is not None
-                                        and 'pb-label' in (self.pending_label.get('class') or '')):
-                                    pb_p = etree.SubElement(speech_div, "p")
-                                    pb_p.append(self.pending_label)
-                                    self.pending_label = None
-                                etree.SubElement(speech_div, "span", {"class": "speaker"}).text = speaker_name
-                            first_rich_div = False
-                        if speech_div_plain is None:
-                            speech_div_plain = etree.SubElement(content_div, "div", {"class": "speech plain-text"})
-
-                        if sp_child.tag == "p":
+                    n_attr = sp_child.get("n")
+                    if n_attr and ',' in n_attr:
+                        if n_attr != last_sp_location:
+                            # Location marker: emit <h2> and reset speech containers
+                            # so the content following the marker starts a fresh div.
+                            speech_div = None
+                            speech_div_plain = None
                             verses_ul = None
-                            if not self.only_plain:
-                                self.process_children(sp_child, etree.SubElement(speech_div, "p"), treat_as_plain=False, in_lg=False)
-                            p_plain = etree.SubElement(speech_div_plain, "p")
-                            if speaker_name and not speaker_shown:
-                                self.append_text(p_plain, f"{speaker_name} \u2014 ", treat_as_plain=True)
-                                speaker_shown = True
-                            # If a stage direction is alone on its first physical line, emit a <br>
-                            # between it and the following content so they don't run together.
-                            first_child = next(iter(sp_child), None)
-                            if (first_child is not None and first_child.tag == 'stage'
-                                    and not (sp_child.text or '').strip()
-                                    and not (first_child.tail and first_child.tail.strip())
-                                    and first_child.getnext() is not None
-                                    and first_child.getnext().tag == 'lb'):
-                                self.append_text(p_plain, '(' + self.get_plain_text_recursive(first_child) + ')', treat_as_plain=True)
-                                etree.SubElement(p_plain, "br")
-                                # process remaining content after the stage's lb
-                                lb = first_child.getnext()
-                                remaining = (lb.tail or '').strip()
-                                for sib in lb.itersiblings():
-                                    remaining += self.get_plain_text_recursive(sib) + (sib.tail or '')
-                                self.append_text(p_plain, remaining, treat_as_plain=True)
-                            else:
-                                self.process_children(sp_child, p_plain, treat_as_plain=True, in_lg=False)
-                        elif sp_child.tag == "lg":
-                            if not self.only_plain:
-                                # A trailing <lb> from the preceding <p> must not bleed into
-                                # the first verse span as an orphan <br>. Drop the break count;
-                                # the pending_label (pb- or lb-label) is kept so it appears on
-                                # the first verse line, inside the shaded verse box, rather
-                                # than as a sibling before it.
-                                self.pending_breaks = 0
-                                if verses_ul is None:
-                                    verses_ul = etree.SubElement(speech_div, "ul", {"class": "verses"})
-                                if sp_child.get('type') == 'group':
-                                    for lg_child in sp_child.findall("lg"):
-                                        self.process_lg_content(lg_child, verses_ul, treat_as_plain=False)
-                                else:
-                                    self.process_lg_content(sp_child, verses_ul, treat_as_plain=False)
-                            if speaker_name and not speaker_shown:
-                                p_plain = etree.SubElement(speech_div_plain, "p")
-                                self.append_text(p_plain, f"{speaker_name} — ", treat_as_plain=True)
-                                speaker_shown = True
+                            self._emit_editorial_coord_h2(content_div, n_attr)
+                            last_sp_location = n_attr
+                        elif self.page_label != "p":
+                            # Same location, custom editorial coords: no new h2, but restore
+                            # current_page/line from the n attribute. A <pb> inside the
+                            # preceding sibling may have clobbered them with a PDF page number.
+                            n_parts = n_attr.split(',')
+                            self.current_page = n_parts[0].strip()
+                            self.current_line = n_parts[1].strip() if len(n_parts) > 1 else "1"
+
+                    # Lazily create speech containers (or re-create after a reset).
+                    if not self.only_plain and speech_div is None:
+                        speech_div = etree.SubElement(content_div, "div", {"class": "speech rich-text"})
+                        if speaker_name and first_rich_div:
+                            # A page break pending from before this <sp> still needs to be
+                            # shown, on its own line, ahead of the speaker attribution — but
+                            # only when there's no <p> for it to land inside inline (the normal
+                            # path, via process_children's own <pb> handling). That's the case
+                            # for a bare cue ("name —") going straight into a <lg> verse, which
+                            # has no <p> at all.
+                            if (sp_child.tag != "p"
+                                    and self.pending_label is not None
+                                    and 'pb-label' in (self.pending_label.get('class') or '')):
+                                pb_p = etree.SubElement(speech_div, "p")
+                                pb_p.append(self.pending_label)
+                                self.pending_label = None
+                            etree.SubElement(speech_div, "span", {"class": "speaker"}).text = speaker_name
+                        first_rich_div = False
+                    if speech_div_plain is None:
+                        speech_div_plain = etree.SubElement(content_div, "div", {"class": "speech plain-text"})
+
+                    if sp_child.tag == "p":
+                        verses_ul = None
+                        if not self.only_plain:
+                            self.process_children(sp_child, etree.SubElement(speech_div, "p"), treat_as_plain=False, in_lg=False)
+                        p_plain = etree.SubElement(speech_div_plain, "p")
+                        if speaker_name and not speaker_shown:
+                            self.append_text(p_plain, f"{speaker_name} \u2014 ", treat_as_plain=True)
+                            speaker_shown = True
+                        # If a stage direction is alone on its first physical line, emit a <br>
+                        # between it and the following content so they don't run together.
+                        first_child = next(iter(sp_child), None)
+                        if (first_child is not None and first_child.tag == 'stage'
+                                and not (sp_child.text or '').strip()
+                                and not (first_child.tail and first_child.tail.strip())
+                                and first_child.getnext() is not None
+                                and first_child.getnext().tag == 'lb'):
+                            self.append_text(p_plain, '(' + self.get_plain_text_recursive(first_child) + ')', treat_as_plain=True)
+                            etree.SubElement(p_plain, "br")
+                            # process remaining content after the stage's lb
+                            lb = first_child.getnext()
+                            remaining = (lb.tail or '').strip()
+                            for sib in lb.itersiblings():
+                                remaining += self.get_plain_text_recursive(sib) + (sib.tail or '')
+                            self.append_text(p_plain, remaining, treat_as_plain=True)
+                        else:
+                            self.process_children(sp_child, p_plain, treat_as_plain=True, in_lg=False)
+                    elif sp_child.tag == "lg":
+                        if not self.only_plain:
+                            # A trailing <lb> from the preceding <p> must not bleed into
+                            # the first verse span as an orphan <br>. Drop the break count;
+                            # the pending_label (pb- or lb-label) is kept so it appears on
+                            # the first verse line, inside the shaded verse box, rather
+                            # than as a sibling before it.
+                            self.pending_breaks = 0
+                            if verses_ul is None:
+                                verses_ul = etree.SubElement(speech_div, "ul", {"class": "verses"})
                             if sp_child.get('type') == 'group':
                                 for lg_child in sp_child.findall("lg"):
-                                    self.process_lg_content(lg_child, speech_div_plain, treat_as_plain=True)
+                                    self.process_lg_content(lg_child, verses_ul, treat_as_plain=False)
                             else:
-                                self.process_lg_content(sp_child, speech_div_plain, treat_as_plain=True)
-                        elif sp_child.tag == "stage":
-                            verses_ul = None
-                            if not self.only_plain:
-                                for _ in range(self.pending_breaks):
-                                    etree.SubElement(speech_div, "br", {"class": "lb-br rich-text"})
-                                self.pending_breaks = 0
-                                if self.pending_label is not None:
-                                    speech_div.append(self.pending_label)
-                                    self.pending_label = None
-                                stage_span = etree.SubElement(speech_div, "span", {"class": "stage-direction"})
-                                stage_span.text = "("
-                                self.process_children(sp_child, stage_span, treat_as_plain=False, in_lg=False)
-                                self.append_text(stage_span, ")", treat_as_plain=False)
+                                self.process_lg_content(sp_child, verses_ul, treat_as_plain=False)
+                        if speaker_name and not speaker_shown:
                             p_plain = etree.SubElement(speech_div_plain, "p")
-                            stage_text = self.get_plain_text_recursive(sp_child)
-                            self.append_text(p_plain, f"({stage_text})", treat_as_plain=True)
-
-                elif element.tag == "stage":
-                    # Top-level stage direction (outside <sp>)
-                    if not self.only_plain:
-                        p_rich = etree.SubElement(content_div, "p", {"class": "rich-text"})
-                        if self.pending_label is not None:
-                            p_rich.append(self.pending_label)
-                            self.pending_label = None
-                        stage_span = etree.SubElement(p_rich, "span", {"class": "stage-direction"})
-                        stage_span.text = "("
-                        self.process_children(element, stage_span, treat_as_plain=False, in_lg=False)
-                        self.append_text(stage_span, ")", treat_as_plain=False)
-                    p_plain = etree.SubElement(content_div, "p", {"class": "plain-text"})
-                    stage_text = self.get_plain_text_recursive(element)
-                    self.append_text(p_plain, f"({stage_text})", treat_as_plain=True)
-
-                elif element.tag == "p":
-                    if _is_milestone_only_p(element):
-                        # A <p> that carries only <milestone>/<lb>/<pb> children (no real
-                        # text) exists purely to attach a coordinate to a milestone (e.g.
-                        # title lines before the play proper begins). Its milestones are
-                        # already invisible in HTML output, so don't emit an empty <p> or
-                        # a location marker for it either.
-                        continue
-                    current_verses_ul = None
-                    self.current_verse = None
-                    self.current_verse_part = None
-                    n_attr = element.get("n")
-                    if n_attr:
-                        n_parts = n_attr.split(',')
-                        page_part = n_parts[0].strip()
-                        line_part = n_parts[1].strip() if len(n_parts) > 1 else "1"
-                        self.current_page = page_part
-                        self.current_line = line_part
-
-                        if self.page_label != "p":
-                            # Custom editorial coords: n is not the PDF page system.
-                            # Only emit h2 for section starts; never create inline labels.
-                            if len(n_parts) != 2 or line_part == "1":
-                                self.pending_breaks = 0
-                                self.has_editorial_coords = True
-                                self.current_coord_id = n_attr.replace(',', '_').replace(' ', '')
-                                h2 = etree.SubElement(content_div, "h3", {"class": "editorial-coord rich-text", "id": self.current_coord_id})
-                                if len(n_parts) == 2:
-                                    h2.text = f"{self.page_label}.{page_part}, {self.line_label}.{line_part}"
-                                elif len(n_parts) == 1:
-                                    h2.text = f"{self.page_label}.{page_part}"
-                                else:
-                                    h2.text = n_attr
+                            self.append_text(p_plain, f"{speaker_name} — ", treat_as_plain=True)
+                            speaker_shown = True
+                        if sp_child.get('type') == 'group':
+                            for lg_child in sp_child.findall("lg"):
+                                self.process_lg_content(lg_child, speech_div_plain, treat_as_plain=True)
                         else:
-                            # Non-drama: clear pending state and create h2 + inline label.
+                            self.process_lg_content(sp_child, speech_div_plain, treat_as_plain=True)
+                    elif sp_child.tag == "stage":
+                        verses_ul = None
+                        if not self.only_plain:
+                            for _ in range(self.pending_breaks):
+                                etree.SubElement(speech_div, "br", {"class": "lb-br rich-text"})
+                            self.pending_breaks = 0
+                            if self.pending_label is not None:
+                                speech_div.append(self.pending_label)
+                                self.pending_label = None
+                            stage_span = etree.SubElement(speech_div, "span", {"class": "stage-direction"})
+                            stage_span.text = "("
+                            self.process_children(sp_child, stage_span, treat_as_plain=False, in_lg=False)
+                            self.append_text(stage_span, ")", treat_as_plain=False)
+                        p_plain = etree.SubElement(speech_div_plain, "p")
+                        stage_text = self.get_plain_text_recursive(sp_child)
+                        self.append_text(p_plain, f"({stage_text})", treat_as_plain=True)
+
+            elif element.tag == "stage":
+                # Top-level stage direction (outside <sp>)
+                if not self.only_plain:
+                    p_rich = etree.SubElement(content_div, "p", {"class": "rich-text"})
+                    if self.pending_label is not None:
+                        p_rich.append(self.pending_label)
+                        self.pending_label = None
+                    stage_span = etree.SubElement(p_rich, "span", {"class": "stage-direction"})
+                    stage_span.text = "("
+                    self.process_children(element, stage_span, treat_as_plain=False, in_lg=False)
+                    self.append_text(stage_span, ")", treat_as_plain=False)
+                p_plain = etree.SubElement(content_div, "p", {"class": "plain-text"})
+                stage_text = self.get_plain_text_recursive(element)
+                self.append_text(p_plain, f"({stage_text})", treat_as_plain=True)
+
+            elif element.tag == "p":
+                if _is_milestone_only_p(element):
+                    # A <p> that carries only <milestone>/<lb>/<pb> children (no real
+                    # text) exists purely to attach a coordinate to a milestone (e.g.
+                    # title lines before the play proper begins). Its milestones are
+                    # already invisible in HTML output, so don't emit an empty <p> or
+                    # a location marker for it either.
+                    continue
+                current_verses_ul = None
+                self.current_verse = None
+                self.current_verse_part = None
+                n_attr = element.get("n")
+                if n_attr:
+                    n_parts = n_attr.split(',')
+                    page_part = n_parts[0].strip()
+                    line_part = n_parts[1].strip() if len(n_parts) > 1 else "1"
+                    self.current_page = page_part
+                    self.current_line = line_part
+
+                    if self.page_label != "p":
+                        # Custom editorial coords: n is not the PDF page system.
+                        # Only emit h2 for section starts; never create inline labels.
+                        if len(n_parts) != 2 or line_part == "1":
                             self.pending_breaks = 0
                             self.has_editorial_coords = True
                             self.current_coord_id = n_attr.replace(',', '_').replace(' ', '')
@@ -1196,66 +1259,65 @@ class HtmlConverter:
                                 h2.text = f"{self.page_label}.{page_part}"
                             else:
                                 h2.text = n_attr
-                            if len(n_parts) == 2:
-                                pending_is_pb_for_same_page = (
-                                    self.pending_label is not None
-                                    and self.pending_label.get("data-page") == page_part
-                                )
-                                if pending_is_pb_for_same_page:
-                                    # A <pb> already set a page-link label for this page; update
-                                    # its text to reflect the actual first line rather than clearing it.
-                                    self.pending_label.text = f'({self.page_label}.{page_part}, {self.line_label}.{line_part})' if not self.no_line_numbers else f'({self.page_label}.{page_part})'
-                                elif line_part == "1":
-                                    label = etree.Element("a", {"class": "pb-label rich-text", "data-page": page_part, "target": "_blank"})
-                                    label.text = f'({self.page_label}.{page_part}, {self.line_label}.1)'
-                                    self.pending_label = label
-                                else:
-                                    label = etree.Element("span", {"class": "lb-label rich-text", "data-line": line_part})
-                                    label.text = f'({self.page_label}.{page_part}, {self.line_label}.{line_part})'
-                                    self.pending_label = label
-
-                    if not self.only_plain:
-                        self.process_children(element, etree.SubElement(content_div, "p", {"class": "rich-text"}), treat_as_plain=False, in_lg=False)
-                    self.process_children(element, etree.SubElement(content_div, "p", {"class": "plain-text"}), treat_as_plain=True, in_lg=False)
-
-                elif element.tag == "lg":
-                    n_attr = element.get("n")
-
-                    # Detect whether this lg (or its children for group type) uses condensed format
-                    is_condensed = False
-                    if element.get('type') == 'group':
-                        is_condensed = any(_is_condensed_lg(lg_child) for lg_child in element.findall("lg"))
                     else:
-                        is_condensed = _is_condensed_lg(element)
-
-                    # Standard mode: emit location marker h2 before the verse
-                    if not is_condensed and n_attr:
-                        if ',' not in n_attr:
-                            raise ValueError(f"Standard-format <lg> has non-page,line n attribute: n=\"{n_attr}\". Use condensed verse format for verse-numbered lgs.")
-
-                        n_parts = n_attr.split(',')
-                        page_part = n_parts[0].strip()
-                        line_part = n_parts[1].strip() if len(n_parts) > 1 else "1"
-                        self.current_page = page_part
-                        self.current_line = line_part
-
-                        if self.page_label != "p":
-                            # Custom editorial coords: n is not the PDF page system.
-                            # Only emit h2 for section starts; never create inline labels.
-                            if len(n_parts) != 2 or line_part == "1":
-                                self.pending_breaks = 0
-                                self.has_editorial_coords = True
-                                self.current_coord_id = n_attr.replace(',', '_').replace(' ', '')
-                                current_verses_ul = None
-                                h2 = etree.SubElement(content_div, "h3", {"class": "editorial-coord rich-text", "id": self.current_coord_id})
-                                if len(n_parts) == 2:
-                                    h2.text = f"{self.page_label}.{page_part}, {self.line_label}.{line_part}"
-                                elif len(n_parts) == 1:
-                                    h2.text = f"{self.page_label}.{page_part}"
-                                else:
-                                    h2.text = n_attr
+                        # Non-drama: clear pending state and create h2 + inline label.
+                        self.pending_breaks = 0
+                        self.has_editorial_coords = True
+                        self.current_coord_id = n_attr.replace(',', '_').replace(' ', '')
+                        h2 = etree.SubElement(content_div, "h3", {"class": "editorial-coord rich-text", "id": self.current_coord_id})
+                        if len(n_parts) == 2:
+                            h2.text = f"{self.page_label}.{page_part}, {self.line_label}.{line_part}"
+                        elif len(n_parts) == 1:
+                            h2.text = f"{self.page_label}.{page_part}"
                         else:
-                            # Non-drama: clear pending state and create h2 + inline label.
+                            h2.text = n_attr
+                        if len(n_parts) == 2:
+                            pending_is_pb_for_same_page = (
+                                self.pending_label is not None
+                                and self.pending_label.get("data-page") == page_part
+                            )
+                            if pending_is_pb_for_same_page:
+                                # A <pb> already set a page-link label for this page; update
+                                # its text to reflect the actual first line rather than clearing it.
+                                self.pending_label.text = f'({self.page_label}.{page_part}, {self.line_label}.{line_part})' if not self.no_line_numbers else f'({self.page_label}.{page_part})'
+                            elif line_part == "1":
+                                label = etree.Element("a", {"class": "pb-label rich-text", "data-page": page_part, "target": "_blank"})
+                                label.text = f'({self.page_label}.{page_part}, {self.line_label}.1)'
+                                self.pending_label = label
+                            else:
+                                label = etree.Element("span", {"class": "lb-label rich-text", "data-line": line_part})
+                                label.text = f'({self.page_label}.{page_part}, {self.line_label}.{line_part})'
+                                self.pending_label = label
+
+                if not self.only_plain:
+                    self.process_children(element, etree.SubElement(content_div, "p", {"class": "rich-text"}), treat_as_plain=False, in_lg=False)
+                self.process_children(element, etree.SubElement(content_div, "p", {"class": "plain-text"}), treat_as_plain=True, in_lg=False)
+
+            elif element.tag == "lg":
+                n_attr = element.get("n")
+
+                # Detect whether this lg (or its children for group type) uses condensed format
+                is_condensed = False
+                if element.get('type') == 'group':
+                    is_condensed = any(_is_condensed_lg(lg_child) for lg_child in element.findall("lg"))
+                else:
+                    is_condensed = _is_condensed_lg(element)
+
+                # Standard mode: emit location marker h2 before the verse
+                if not is_condensed and n_attr:
+                    if ',' not in n_attr:
+                        raise ValueError(f"Standard-format <lg> has non-page,line n attribute: n=\"{n_attr}\". Use condensed verse format for verse-numbered lgs.")
+
+                    n_parts = n_attr.split(',')
+                    page_part = n_parts[0].strip()
+                    line_part = n_parts[1].strip() if len(n_parts) > 1 else "1"
+                    self.current_page = page_part
+                    self.current_line = line_part
+
+                    if self.page_label != "p":
+                        # Custom editorial coords: n is not the PDF page system.
+                        # Only emit h2 for section starts; never create inline labels.
+                        if len(n_parts) != 2 or line_part == "1":
                             self.pending_breaks = 0
                             self.has_editorial_coords = True
                             self.current_coord_id = n_attr.replace(',', '_').replace(' ', '')
@@ -1267,51 +1329,324 @@ class HtmlConverter:
                                 h2.text = f"{self.page_label}.{page_part}"
                             else:
                                 h2.text = n_attr
-                            if len(n_parts) == 2:
-                                pending_is_pb_for_same_page = (
-                                    self.pending_label is not None
-                                    and self.pending_label.get("data-page") == page_part
-                                )
-                                if pending_is_pb_for_same_page:
-                                    # A <pb> already set a page-link label for this page; update
-                                    # its text to reflect the actual first line rather than clearing it.
-                                    self.pending_label.text = f'({self.page_label}.{page_part}, {self.line_label}.{line_part})' if not self.no_line_numbers else f'({self.page_label}.{page_part})'
-                                elif line_part == "1":
-                                    label = etree.Element("a", {"class": "pb-label rich-text", "data-page": page_part, "target": "_blank"})
-                                    label.text = f'({self.page_label}.{page_part}, {self.line_label}.1)'
-                                    self.pending_label = label
-                                else:
-                                    label = etree.Element("span", {"class": "lb-label rich-text", "data-line": line_part})
-                                    label.text = f'({self.page_label}.{page_part}, {self.line_label}.{line_part})'
-                                    self.pending_label = label
-
-                    # Rich pass: wrap in <ul class="verses"> for verse-styling CSS
-                    if not self.only_plain:
+                    else:
+                        # Non-drama: clear pending state and create h2 + inline label.
                         self.pending_breaks = 0
-                        if current_verses_ul is None:
-                            current_verses_ul = etree.SubElement(content_div, "ul", {"class": "verses rich-text"})
-                        if element.get('type') == 'group':
-                            for lg_child in element.findall("lg"):
-                                self.process_lg_content(lg_child, current_verses_ul, treat_as_plain=False)
+                        self.has_editorial_coords = True
+                        self.current_coord_id = n_attr.replace(',', '_').replace(' ', '')
+                        current_verses_ul = None
+                        h2 = etree.SubElement(content_div, "h3", {"class": "editorial-coord rich-text", "id": self.current_coord_id})
+                        if len(n_parts) == 2:
+                            h2.text = f"{self.page_label}.{page_part}, {self.line_label}.{line_part}"
+                        elif len(n_parts) == 1:
+                            h2.text = f"{self.page_label}.{page_part}"
                         else:
-                            self.process_lg_content(element, current_verses_ul, treat_as_plain=False)
+                            h2.text = n_attr
+                        if len(n_parts) == 2:
+                            pending_is_pb_for_same_page = (
+                                self.pending_label is not None
+                                and self.pending_label.get("data-page") == page_part
+                            )
+                            if pending_is_pb_for_same_page:
+                                # A <pb> already set a page-link label for this page; update
+                                # its text to reflect the actual first line rather than clearing it.
+                                self.pending_label.text = f'({self.page_label}.{page_part}, {self.line_label}.{line_part})' if not self.no_line_numbers else f'({self.page_label}.{page_part})'
+                            elif line_part == "1":
+                                label = etree.Element("a", {"class": "pb-label rich-text", "data-page": page_part, "target": "_blank"})
+                                label.text = f'({self.page_label}.{page_part}, {self.line_label}.1)'
+                                self.pending_label = label
+                            else:
+                                label = etree.Element("span", {"class": "lb-label rich-text", "data-line": line_part})
+                                label.text = f'({self.page_label}.{page_part}, {self.line_label}.{line_part})'
+                                self.pending_label = label
 
-                    # Plain pass
+                # Rich pass: wrap in <ul class="verses"> for verse-styling CSS
+                if not self.only_plain:
+                    self.pending_breaks = 0
+                    if current_verses_ul is None:
+                        current_verses_ul = etree.SubElement(content_div, "ul", {"class": "verses rich-text"})
                     if element.get('type') == 'group':
                         for lg_child in element.findall("lg"):
-                            self.process_lg_content(lg_child, content_div, treat_as_plain=True)
+                            self.process_lg_content(lg_child, current_verses_ul, treat_as_plain=False)
                     else:
-                        self.process_lg_content(element, content_div, treat_as_plain=True)
+                        self.process_lg_content(element, current_verses_ul, treat_as_plain=False)
+
+                # Plain pass
+                if element.get('type') == 'group':
+                    for lg_child in element.findall("lg"):
+                        self.process_lg_content(lg_child, content_div, treat_as_plain=True)
+                else:
+                    self.process_lg_content(element, content_div, treat_as_plain=True)
+
+    def _write_json_sidecar(self, html_path, text_base_name, has_named_sections, has_chaya):
+        """Write the rich-mode JSON sidecar (TOC, metadata, corrections, display flags) next to html_path.
+
+        With split_sidecar, <text>.json holds only what the first render needs (flags,
+        TOC, PDF page mapping), written compactly; the metadata entries go to
+        <text>.metadata.json and the corrections table to <text>.corrections.json,
+        for the reader to fetch when they are first shown.
+        """
+        if self.split_sidecar:
+            self._write_split_sidecar(html_path, text_base_name, has_named_sections, has_chaya)
+            return
+
+        if self.corrections_data:
+            self.metadata_entries.append({
+                "type": "corrections",
+                "count": len(self.corrections_data),
+                "rows": self.corrections_data
+            })
+
+        document_context = {
+            "title": text_base_name,
+            "has_toc": has_named_sections,
+            "toc": self.toc_data,
+            "metadata_entries": self.metadata_entries,
+            "has_verses": self.has_verses,
+            "has_editorial_coords": self.has_editorial_coords,
+            "has_line_breaks": self.has_line_breaks,
+            "has_corrections": bool(self.corrections_data),
+            "no_line_numbers": self.no_line_numbers,
+            "drama": self.drama,
+            "has_chaya": has_chaya,
+        }
+        # Only include boolean flags when true; the reader defaults absent keys to false
+        if self.no_line_numbers:
+            document_context["no_line_numbers"] = True
+        if self.drama:
+            document_context["drama"] = True
+        if has_chaya:
+            document_context["has_chaya"] = True
+        if self.pdf_page_mapping:
+            document_context["pdf_page_mapping"] = self.pdf_page_mapping
+        if self.page_label != "p":
+            document_context["page_label"] = self.page_label
+        if self.line_label != "l":
+            document_context["line_label"] = self.line_label
+        if self.compact_lines:
+            document_context["compact_lines"] = True
+        if self.separate_plain:
+            document_context["separate_plain"] = True
+
+        json_path = Path(html_path).with_suffix('.json')
+        with open(json_path, "w", encoding='utf-8') as f:
+            json.dump(document_context, f, ensure_ascii=False, indent=4)
+
+    def _write_split_sidecar(self, html_path, text_base_name, has_named_sections, has_chaya):
+        """Write the split_sidecar files: core <text>.json, <text>.metadata.json and <text>.corrections.json."""
+        document_context = {
+            "title": text_base_name,
+            "split_sidecar": True,
+            "has_toc": has_named_sections,
+            "toc": self.toc_data,
+            "has_verses": self.has_verses,
+            "has_editorial_coords": self.has_editorial_coords,
+            "has_line_breaks": self.has_line_breaks,
+            "has_corrections": bool(self.corrections_data),
+        }
+        # The corrections count is shown before the table itself is loaded
+        if self.corrections_data:
+            document_context["corrections_count"] = len(self.corrections_data)
+        # Only include boolean flags when true; the reader defaults absent keys to false
+        for flag, value in (("no_line_numbers", self.no_line_numbers), ("drama", self.drama), ("has_chaya", has_chaya),
+                            ("compact_lines", self.compact_lines), ("separate_plain", self.separate_plain)):
+            if value:
+                document_context[flag] = True
+        if self.pdf_page_mapping:
+            document_context["pdf_page_mapping"] = self.pdf_page_mapping
+        if self.page_label != "p":
+            document_context["page_label"] = self.page_label
+        if self.line_label != "l":
+            document_context["line_label"] = self.line_label
+
+        html_path = Path(html_path)
+        corrections_path = html_path.with_suffix('.corrections.json')
+        outputs = {
+            html_path.with_suffix('.json'): document_context,
+            html_path.with_suffix('.metadata.json'): {"metadata_entries": self.metadata_entries},
+            corrections_path: {"count": len(self.corrections_data), "rows": self.corrections_data},
+        }
+        if not self.corrections_data:
+            # No table to load; drop one left by an earlier run.
+            del outputs[corrections_path]
+            if corrections_path.exists():
+                corrections_path.unlink()
+        for path, data in outputs.items():
+            with open(path, "w", encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+
+    def _postprocess_content(self, content_div, start=0):
+        """Apply the optional output reductions to the children of content_div from index start on."""
+        if self.compact_lines:
+            self._compact_line_labels(content_div, start)
+        if self.separate_plain:
+            self._split_plain_layer(content_div, start)
+
+    def _split_plain_layer(self, content_div, start=0):
+        """Move plain-text blocks out of content_div into self.plain_blocks.
+
+        Every plain-text block is a top-level child of content_div following the
+        rich-text rendering of the same source element. Each is anchored to the
+        id of its rich counterpart: the verse id when the blocks follow a list of
+        condensed verses (one block per <li class="verse">), otherwise the last
+        TOC, editorial-coord or verse id seen before it ("" before the first).
+        Several blocks can share an anchor (e.g. two verses after one coord), so
+        each is keyed "<anchor>~<n>", n counting the blocks of that anchor from 1.
+        """
+        for child in list(content_div[start:]):
+            if 'plain-text' in (child.get('class') or '').split():
+                anchor = (self._plain_verse_ids.pop(0) if self._plain_verse_ids else self._plain_anchor) or ''
+                count = self._plain_block_counts[anchor] = self._plain_block_counts.get(anchor, 0) + 1
+                self.plain_blocks.append([f"{anchor}~{count}", etree.tostring(child, encoding="unicode", with_tail=False)])
+                content_div.remove(child)
+                self._in_plain_run = True
+                continue
+            if self._in_plain_run:
+                self._plain_verse_ids = []
+                self._in_plain_run = False
+            for elem in child.iter():
+                elem_id = elem.get('id')
+                if elem_id and elem.tag in ('h1', 'h3', 'li'):
+                    self._plain_anchor = elem_id
+                    if 'verse' in (elem.get('class') or '').split():
+                        self._plain_verse_ids.append(elem_id)
+
+    def _write_plain_layer(self, html_path, text_base_name):
+        """Write the separate_plain blocks next to html_path as <text>.plain.json."""
+        plain_layer = {"title": text_base_name, "blocks": self.plain_blocks}
+        with open(Path(html_path).with_suffix('.plain.json'), "w", encoding='utf-8') as f:
+            json.dump(plain_layer, f, ensure_ascii=False, separators=(',', ':'))
+
+    def _compact_line_labels(self, content_div, start=0):
+        """Replace lb-labels (and the lb-br breaks directly before them) with bare line markers.
+
+        Each <span class="lb-label" data-line="7">(p.12, l.7)</span>, together with
+        any <br class="lb-br"> immediately preceding it, becomes an empty
+        <i class="lb"></i>, and [page, line, breaks] is appended to self.line_table
+        so the client can render the label and breaks on demand. Only children of
+        content_div from index start on are scanned, so sections can be compacted
+        as they are converted. pb-labels, which carry the page links, are kept.
+        """
+        prefix = f'({self.page_label}.'
+        separator = f', {self.line_label}.'
+        for label in [e for child in content_div[start:] for e in child.iter('span')
+                      if e.get('class') == 'lb-label rich-text']:
+            line = label.get('data-line')
+            page = label.text[len(prefix):-1].rpartition(separator)[0]
+            parent = label.getparent()
+            breaks = 0
+            previous = label.getprevious()
+            while (previous is not None and previous.tag == 'br' and previous.get('class') == 'lb-br rich-text'
+                   and not previous.tail):
+                breaks += 1
+                parent.remove(previous)
+                previous = label.getprevious()
+            marker = etree.Element("i", {"class": "lb"})
+            marker.text = ''
+            marker.tail = label.tail
+            parent.replace(label, marker)
+            self.line_table.append([page, line, breaks])
+
+    def _write_line_table(self, html_path):
+        """Write the compact_lines line table next to html_path as <text>.lines.json."""
+        line_table = {"page_label": self.page_label, "line_label": self.line_label, "rows": self.line_table}
+        with open(Path(html_path).with_suffix('.lines.json'), "w", encoding='utf-8') as f:
+            json.dump(line_table, f, ensure_ascii=False, separators=(',', ':'))
+
+    def _write_offset_sidecar(self, html_path, offsets):
+        """Write offsets (see HtmlOffsetIndex) next to html_path as <text>.offsets.json.
+
+        Lets the app answer a deep link to a page, line, verse or section with an
+        HTTP Range read or seek instead of loading and searching the whole HTML.
+        """
+        with open(Path(html_path).with_suffix('.offsets.json'), "w", encoding='utf-8') as f:
+            json.dump(offsets, f, ensure_ascii=False, separators=(',', ':'))
+
+    def _new_content_div(self):
+        content_div = etree.Element("div", id="content")
+        if not self.only_plain:
+            content_div.set('class', 'hide-editorial-coords')
+        return content_div
+
+    def _plain_html_head(self, text_base_name):
+        head = etree.Element("head")
+        etree.SubElement(head, "meta", charset="utf-8")
+        title = etree.SubElement(head, "title")
+        title.text = text_base_name
+        etree.SubElement(head, "meta", name="viewport", content="width=device-width, initial-scale=1.0")
+        return head
+
+    def _standalone_template_parts(self, text_base_name):
+        """Split the standalone HTML template into (before, after) the content placeholder."""
+        template_path = Path(__file__).parent / 'templates' / 'standalone.html'
+        with open(template_path, 'r', encoding='utf-8') as f:
+            template_str = f.read()
+        template_str = template_str.replace('{{ title }}', text_base_name)
+        before, _, after = template_str.partition('{{ content_html | safe }}')
+        return before, after
+
+    def convert_xml_to_html(self, xml_path, html_path):
+        """
+        In default rich mode, converts a TEI XML file into an HTML fragment and corresponding JSON sidecar files.
+        - The HTML file contains only the core text content inside a <div id="content">.
+        - The JSON file contains all metadata, TOC, corrections, and display flags.
+        - With offsets, the .offsets.json file maps pages, lines, coords, verses and TOC anchors to byte offsets in the HTML.
+        Plain and standalone modes omit the JSON sidecars; offsets are not available with them or with sharding.
+        Plain mode omits rich formatting anticipating JavaScript controls.
+        Standalone mode outputs a complete rich HTML document, not a fragment.
+        Streaming mode (see convert_xml_to_html_streaming) produces the same files
+        with bounded memory; sharded mode (see convert_xml_to_html_sharded) splits
+        the HTML into separately loadable fragments. With xslt, plain mode renders
+        the same HTML through the templates/plain.xsl stylesheet instead.
+        """
+        if self.xslt:
+            from plain_xslt import render_plain_html
+            with open(html_path, "w", encoding="utf-8") as f:
+                f.write(render_plain_html(xml_path, self.page_label, self.line_label))
+            return
+        if self.shard:
+            self.convert_xml_to_html_sharded(xml_path, html_path)
+            return
+        if self.stream:
+            self.convert_xml_to_html_streaming(xml_path, html_path)
+            return
+
+        # 1. prep XML data, remove namespace prefixes, get text name
+        parser = etree.XMLParser(remove_blank_text=True)
+        tree = etree.parse(xml_path, parser)
+        for elem in tree.iter():
+            if '}' in elem.tag:
+                elem.tag = elem.tag.split('}', 1)[1]
+        root = tree.getroot()
+        text_base_name = Path(xml_path).stem
+        self._plain_text_cache = {}
+
+        # 2. generate JSON sidecar (TOC + Metadata for rich HTML)
+        body = root.find('.//body')
+        scan = self._new_document_scan()
+        for child in (body if body is not None else []):
+            self._scan_body_child(child, scan)
+        has_named_sections = scan['has_named_sections']
+        if not self.only_plain:
+            if has_named_sections:
+                self.toc_data.extend(scan['toc'])
+            self._load_metadata_entries(text_base_name)
+
+        # 3. generate content_div HTML fragment (= main content processing loop)
+        content_div = self._new_content_div()
+
+        self.current_page, self.current_line = '', '1'  # TODO: investigate whether necessary to reset like this
+        for section in root.xpath('//body/div[@n]'):
+            self._convert_section(section, content_div)
+        self._postprocess_content(content_div)
+
+        self._save_aksara_cache()
 
         # 4. write output depending on mode
         if self.only_plain:
             # inject rich content_div fragment into simple HTML template
             html_doc = etree.Element("html")
-            head = etree.SubElement(html_doc, "head")
-            etree.SubElement(head, "meta", charset="utf-8")
-            title = etree.SubElement(head, "title")
-            title.text = text_base_name
-            etree.SubElement(head, "meta", name="viewport", content="width=device-width, initial-scale=1.0")
+            html_doc.append(self._plain_html_head(text_base_name))
             body_full = etree.SubElement(html_doc, "body")
             body_full.append(content_div)
             with open(html_path, "w", encoding="utf-8") as f:
@@ -1319,62 +1654,242 @@ class HtmlConverter:
 
         elif self.standalone:
             # inject rich content_div fragment into HTML template with rich CSS
-            template_path = Path(__file__).parent / 'templates' / 'standalone.html'
-            with open(template_path, 'r', encoding='utf-8') as f:
-                template_str = f.read()
-
+            before, after = self._standalone_template_parts(text_base_name)
             content_str = etree.tostring(content_div, pretty_print=True, encoding="unicode")
 
-            output_html = template_str.replace('{{ title }}', text_base_name)
-            output_html = output_html.replace('{{ content_html | safe }}', content_str)
-
             with open(html_path, "w", encoding="utf-8") as f:
-                f.write(output_html)
+                f.write(before + content_str + after)
 
         else: # rich
             # directly write rich content_div fragment and JSON sidecar
-            with open(html_path, "w", encoding="utf-8") as f:
-                f.write(etree.tostring(content_div, pretty_print=True, encoding="unicode"))
-
-            if self.corrections_data:
-                self.metadata_entries.append({
-                    "type": "corrections",
-                    "count": len(self.corrections_data),
-                    "rows": self.corrections_data
-                })
-
-            has_chaya = bool(root.xpath('//seg[@type="chāyā"]') or root.xpath('//lg[@type="chāyā"]'))
-            document_context = {
-                "title": text_base_name,
-                "has_toc": has_named_sections,
-                "toc": self.toc_data,
-                "metadata_entries": self.metadata_entries,
-                "has_verses": self.has_verses,
-                "has_editorial_coords": self.has_editorial_coords,
-                "has_line_breaks": self.has_line_breaks,
-                "has_corrections": bool(self.corrections_data),
-                "no_line_numbers": self.no_line_numbers,
-                "drama": self.drama,
-                "has_chaya": has_chaya,
-            }
-            # Only include boolean flags when true; the reader defaults absent keys to false
-            if self.no_line_numbers:
-                document_context["no_line_numbers"] = True
-            if self.drama:
-                document_context["drama"] = True
-            if has_chaya:
-                document_context["has_chaya"] = True
-            if self.pdf_page_mapping:
-                document_context["pdf_page_mapping"] = self.pdf_page_mapping
-            if self.page_label != "p":
-                document_context["page_label"] = self.page_label
-            if self.line_label != "l":
-                document_context["line_label"] = self.line_label
-
-            json_path = Path(html_path).with_suffix('.json')
-            with open(json_path, "w", encoding='utf-8') as f:
-                json.dump(document_context, f, ensure_ascii=False, indent=4)
+            html_bytes = etree.tostring(content_div, pretty_print=True, encoding="unicode").encode("utf-8")
+            with open(html_path, "wb") as f:
+                f.write(html_bytes)
+
+            self._write_json_sidecar(html_path, text_base_name, has_named_sections, scan['has_chaya'])
+            if self.offsets:
+                self._write_offset_sidecar(html_path, html_byte_offsets(html_bytes, self.line_table if self.compact_lines else None))
+            if self.compact_lines:
+                self._write_line_table(html_path)
+            if self.separate_plain:
+                self._write_plain_layer(html_path, text_base_name)
+
+    def convert_xml_to_html_streaming(self, xml_path, html_path):
+        """Streaming variant of convert_xml_to_html with memory bounded by the largest section.
+
+        The TEI is read with iterparse; each <body>/<div> is converted as soon as it
+        has been parsed, its HTML written through an incremental etree.xmlfile writer,
+        and both the XML section and its HTML discarded before the next one is read.
+
+        Output matches the non-streaming mode element for element; only the
+        indentation of the top-level elements inside <div id="content"> differs,
+        since each is serialized on its own.
+        """
+        text_base_name = Path(xml_path).stem
+        self._plain_text_cache = {}
+        if not self.only_plain:
+            self._load_metadata_entries(text_base_name)
+        if self.offsets:
+            self._offset_index = HtmlOffsetIndex(self.line_table if self.compact_lines else None)
+
+        with open(html_path, "wb") as f:
+            after = ''
+            if self.standalone:
+                before, after = self._standalone_template_parts(text_base_name)
+                f.write(before.encode("utf-8"))
+            with etree.xmlfile(f, encoding="utf-8") as xf:
+                if self.only_plain:
+                    with xf.element("html"):
+                        xf.write("\n")
+                        xf.write(self._plain_html_head(text_base_name), pretty_print=True)
+                        with xf.element("body"):
+                            xf.write("\n")
+                            has_named_sections, has_chaya = self._stream_sections(xml_path, xf)
+                            xf.write("\n")
+                        xf.write("\n")
+                else:
+                    has_named_sections, has_chaya = self._stream_sections(xml_path, xf, f)
+            f.write(("\n" + after).encode("utf-8"))
+            html_bytes = f.tell()
+
+        self._save_aksara_cache()
+
+        if not self.only_plain and not self.standalone:
+            self._write_json_sidecar(html_path, text_base_name, has_named_sections, has_chaya)
+            if self.offsets:
+                self._write_offset_sidecar(html_path, self._offset_index.offsets(html_bytes))
+            if self.compact_lines:
+                self._write_line_table(html_path)
+            if self.separate_plain:
+                self._write_plain_layer(html_path, text_base_name)
+
+    def _stream_sections(self, xml_path, xf, f=None):
+        """Convert and write <body>/<div n> sections one at a time into <div id="content">.
 
+        With offsets, each top-level element is serialized once and written
+        straight to f, the file under xf, so that its start tags are indexed at
+        their position in the file.
+
+        Returns (has_named_sections, has_chaya).
+        """
+        flags = {}
+        content_div = self._new_content_div()
+        with xf.element(content_div.tag, content_div.attrib):
+            xf.write("\n")
+            for _, section_html in self._iter_section_html(xml_path, content_div, flags):
+                for html_elem in section_html:
+                    if self._offset_index is None:
+                        xf.write(html_elem, pretty_print=True)
+                        continue
+                    chunk = etree.tostring(html_elem, pretty_print=True, encoding="utf-8")
+                    xf.flush()
+                    self._offset_index.add(chunk, f.tell())
+                    f.write(chunk)
+        return flags['has_named_sections'], flags['has_chaya']
+
+    def _iter_section_html(self, xml_path, content_div, flags):
+        """Parse xml_path incrementally and yield (section_name, content_div) per <body>/<div n>.
+
+        content_div holds only the HTML of the section just converted; it is
+        emptied again once the caller resumes. The TOC and has_chaya flag are
+        accumulated along the way by _scan_body_child, and flags receives
+        has_named_sections and has_chaya when the generator is exhausted.
+        """
+        scan = self._new_document_scan()
+
+        self.current_page, self.current_line = '', '1'
+        for _, elem in etree.iterparse(xml_path, events=("end",), remove_blank_text=True):
+            parent = elem.getparent()
+            if parent is None or etree.QName(parent).localname != 'body':
+                if etree.QName(elem).localname == 'teiHeader':
+                    elem.clear()
+                continue
+
+            for sub_elem in elem.iter():
+                if '}' in sub_elem.tag:
+                    sub_elem.tag = sub_elem.tag.split('}', 1)[1]
+
+            self._scan_body_child(elem, scan)
+            if elem.tag == 'div' and elem.get('n') is not None:
+                self._convert_section(elem, content_div)
+                self._postprocess_content(content_div)
+                yield elem.get('n'), content_div
+                for html_elem in list(content_div):
+                    content_div.remove(html_elem)
+
+            # Free the processed section and everything parsed before it.
+            self._plain_text_cache = {}
+            elem.clear()
+            while elem.getprevious() is not None:
+                del parent[0]
+
+        if scan['has_named_sections'] and not self.only_plain:
+            self.toc_data.extend(scan['toc'])
+        flags['has_named_sections'] = scan['has_named_sections']
+        flags['has_chaya'] = scan['has_chaya']
+
+    def convert_xml_to_html_sharded(self, xml_path, html_path):
+        """Write the HTML as separately loadable fragments plus a shard index.
+
+        Instead of html_path itself, a directory of the same name without the
+        .html suffix is written, holding numbered fragments (0001.html, ...) and
+        index.json. Each fragment contains the top-level elements that would
+        otherwise sit inside <div id="content">, serialized as in streaming mode,
+        so concatenating all fragments inside that div reproduces the full text.
+
+        By default there is one fragment per <body>/<div n> section. With
+        shard_pages=N a new fragment starts, between top-level elements, once the
+        current one has reached N printed pages; sections may then share or span
+        fragments. Pages are read from pb-label data-page attributes and, with the
+        default "p" page label, from editorial-coord ids.
+
+        index.json lists the fragments in reading order with the TOC ids (section
+        <h1> ids) they contain, their first and last page and their byte sizes,
+        along with the attributes of the enclosing content div. The rich-mode JSON
+        sidecar is written next to html_path as usual.
+        """
+        text_base_name = Path(xml_path).stem
+        self._plain_text_cache = {}
+        if not self.only_plain:
+            self._load_metadata_entries(text_base_name)
+
+        shard_dir = Path(html_path).with_suffix('')
+        shard_dir.mkdir(parents=True, exist_ok=True)
+        for stale in shard_dir.glob('*.html'):
+            stale.unlink()
+
+        shards = []
+        shard_file = None
+        current_page = None
+
+        def open_shard():
+            nonlocal shard_file
+            if shard_file is not None:
+                shard_file.close()
+            name = f"{len(shards) + 1:04d}.html"
+            shard_file = open(shard_dir / name, "wb")
+            shards.append({"file": name, "toc_ids": [], "first_page": current_page, "last_page": current_page, "page_count": 0})
+
+        flags = {}
+        content_div = self._new_content_div()
+        try:
+            for _, section_html in self._iter_section_html(xml_path, content_div, flags):
+                if not self.shard_pages or shard_file is None:
+                    open_shard()
+                for html_elem in section_html:
+                    pages = self._pages_in(html_elem)
+                    if (self.shard_pages and pages and pages[0] != current_page
+                            and shards[-1]["page_count"] >= self.shard_pages):
+                        open_shard()
+                    shard = shards[-1]
+                    for page in pages:
+                        if page != current_page:
+                            current_page = page
+                            shard["page_count"] += 1
+                            if shard["first_page"] is None:
+                                shard["first_page"] = page
+                    shard["last_page"] = current_page
+                    shard["toc_ids"].extend(h1.get('id') for h1 in html_elem.iter('h1') if h1.get('id'))
+                    shard_file.write(etree.tostring(html_elem, pretty_print=True, encoding="utf-8"))
+        finally:
+            if shard_file is not None:
+                shard_file.close()
+
+        self._save_aksara_cache()
+
+        for shard in shards:
+            shard["bytes"] = (shard_dir / shard["file"]).stat().st_size
+            del shard["page_count"]
+        shard_index = {
+            "title": text_base_name,
+            "shard_by": "pages" if self.shard_pages else "section",
+            "content_attributes": dict(content_div.attrib),
+            "total_bytes": sum(shard["bytes"] for shard in shards),
+            "shards": shards,
+        }
+        if self.shard_pages:
+            shard_index["pages_per_shard"] = self.shard_pages
+        with open(shard_dir / 'index.json', "w", encoding='utf-8') as f:
+            json.dump(shard_index, f, ensure_ascii=False, indent=4)
+
+        if not self.only_plain:
+            self._write_json_sidecar(html_path, text_base_name, flags['has_named_sections'], flags['has_chaya'])
+            if self.compact_lines:
+                self._write_line_table(html_path)
+            if self.separate_plain:
+                self._write_plain_layer(html_path, text_base_name)
+
+    def _pages_in(self, html_elem):
+        """Return the printed pages marked within html_elem, in document order, without repeats."""
+        pages = []
+        for elem in html_elem.iter():
+            page = elem.get('data-page')
+            if (page is None and self.page_label == "p" and elem.tag == 'h3'
+                    and 'editorial-coord' in (elem.get('class') or '')):
+                page = (elem.get('id') or '').split('_')[0] or None
+            if page and (not pages or pages[-1] != page):
+                pages.append(page)
+        return pages
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Convert TEI XML to HTML and JSON context.")
@@ -1386,19 +1901,46 @@ if __name__ == "__main__":
     parser.add_argument("--drama", action="store_true", help="Drama mode: handle speakers, stage directions, and chāyās.")
     parser.add_argument("--page-label", default="p", help="Label used for the first part of an editorial coordinate (default: p).")
     parser.add_argument("--line-label", default="l", help="Label used for the second part of an editorial coordinate (default: l).")
+    parser.add_argument("--stream", action="store_true", help="Convert and write one section at a time to bound memory use on large texts.")
+    parser.add_argument("--shard", action="store_true", help="Write one HTML fragment per section plus an index.json into a directory named after html_path.")
+    parser.add_argument("--shard-pages", type=int, metavar="N", help="Like --shard, but start a new fragment every N printed pages.")
+    parser.add_argument("--compact-lines", action="store_true", help="Replace per-line lb-label spans with bare markers plus a <text>.lines.json line table.")
+    parser.add_argument("--separate-plain", action="store_true", help="Move the plain-text layer out of rich HTML into <text>.plain.json.")
+    parser.add_argument("--split-sidecar", action="store_true", help="Write a compact core <text>.json plus separate <text>.metadata.json and <text>.corrections.json.")
+    parser.add_argument("--offsets", action="store_true", help="Also write a <text>.offsets.json mapping pages, lines, coords, verses and TOC anchors to byte offsets in the rich HTML.")
+    parser.add_argument("--xslt", action="store_true", help="With --plain, render through the XSLT stylesheet templates/plain.xsl instead of HtmlConverter.")
     args = parser.parse_args()
 
-    converter = HtmlConverter(
-        no_line_numbers=args.no_line_numbers,
-        only_plain=args.plain,
-        standalone=args.standalone,
-        drama=args.drama,
-        page_label=args.page_label,
-        line_label=args.line_label,
-    )
+    try:
+        converter = HtmlConverter(
+            no_line_numbers=args.no_line_numbers,
+            only_plain=args.plain,
+            standalone=args.standalone,
+            drama=args.drama,
+            page_label=args.page_label,
+            line_label=args.line_label,
+            stream=args.stream,
+            shard=args.shard,
+            shard_pages=args.shard_pages,
+            compact_lines=args.compact_lines,
+            separate_plain=args.separate_plain,
+            xslt=args.xslt,
+            split_sidecar=args.split_sidecar,
+            offsets=args.offsets,
+        )
+    except ValueError as e:
+        parser.error(str(e))
     converter.convert_xml_to_html(args.xml_path, args.html_path)
 
-    if not args.standalone and not args.plain:
+    if converter.shard:
+        shard_dir = Path(args.html_path).with_suffix('')
+        if args.plain:
+            print(f"Wrote shards to {shard_dir}")
+        else:
+            print(f"Wrote shards to {shard_dir} and {Path(args.html_path).with_suffix('.json')}")
+    elif converter.offsets:
+        print(f"Wrote {args.html_path}, {Path(args.html_path).with_suffix('.json')} and {Path(args.html_path).with_suffix('.offsets.json')}")
+    elif not args.standalone and not args.plain:
         print(f"Wrote {args.html_path} and {Path(args.html_path).with_suffix('.json')}")
     else:
         print(f"Wrote {args.html_path}")
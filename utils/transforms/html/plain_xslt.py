@@ -0,0 +1,94 @@
+"""
+XSLT fast path for plain HTML.
+
+Plain HTML is a mechanical mapping from TEI to <p>/<div class="lg"> blocks with
+corrections resolved, so templates/plain.xsl expresses it as an XSLT 1.0
+stylesheet that lxml compiles once and runs in libxslt, without HtmlConverter's
+per-node Python dispatch. convert_xml_to_html.py uses it for --plain --xslt.
+
+Run as a script to verify that the stylesheet and HtmlConverter produce
+identical plain HTML for every text of the project-edition XML corpus.
+"""
+import argparse
+import difflib
+import functools
+import sys
+import tempfile
+from pathlib import Path
+
+from lxml import etree
+
+PROJECT_ROOT = Path(__file__).resolve().parents[3]
+XML_DIR = PROJECT_ROOT / 'texts' / 'project_editions' / 'xml'
+STYLESHEET_PATH = Path(__file__).parent / 'templates' / 'plain.xsl'
+
+
+@functools.lru_cache(maxsize=1)
+def _plain_stylesheet():
+    return etree.XSLT(etree.parse(str(STYLESHEET_PATH)))
+
+
+def render_plain_html(xml_path, page_label="p", line_label="l"):
+    """Render xml_path as plain HTML with the XSLT stylesheet.
+
+    The document is parsed exactly as HtmlConverter parses it (blank text
+    removed, namespace prefixes stripped), so both paths see the same tree.
+
+    Returns:
+        The plain HTML document as a string.
+
+    Raises:
+        ValueError: if a standard-format <lg> has a non-page,line n attribute.
+    """
+    tree = etree.parse(str(xml_path), etree.XMLParser(remove_blank_text=True))
+    for elem in tree.iter():
+        if '}' in elem.tag:
+            elem.tag = elem.tag.split('}', 1)[1]
+
+    stylesheet = _plain_stylesheet()
+    try:
+        result = stylesheet(
+            tree,
+            title=etree.XSLT.strparam(Path(xml_path).stem),
+            **{'page-label': etree.XSLT.strparam(page_label), 'line-label': etree.XSLT.strparam(line_label)},
+        )
+    except etree.XSLTApplyError:
+        raise ValueError('; '.join(entry.message for entry in stylesheet.error_log)) from None
+    return etree.tostring(result.getroot(), pretty_print=True, encoding="unicode")
+
+
+def verify_corpus(xml_dir=XML_DIR):
+    """Compare XSLT and HtmlConverter plain HTML for every text in xml_dir.
+
+    Returns:
+        A list of (file name, unified diff) for texts whose outputs differ.
+    """
+    from convert_xml_to_html import HtmlConverter
+    from utils.transforms.flag_map import editorial_coord_labels_map
+
+    mismatches = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for xml_path in sorted(Path(xml_dir).glob('*.xml')):
+            page_label, line_label = editorial_coord_labels_map.get(xml_path.stem, ("p", "l"))
+            html_path = Path(tmp_dir) / f'{xml_path.stem}.html'
+            HtmlConverter(only_plain=True, page_label=page_label, line_label=line_label).convert_xml_to_html(xml_path, html_path)
+            expected = html_path.read_text(encoding="utf-8")
+            actual = render_plain_html(xml_path, page_label, line_label)
+            if actual != expected:
+                diff = ''.join(difflib.unified_diff(expected.splitlines(True), actual.splitlines(True),
+                                                    'HtmlConverter', 'plain.xsl', n=1))
+                mismatches.append((xml_path.name, diff))
+    return mismatches
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Verify the plain HTML stylesheet against HtmlConverter on the XML corpus.")
+    parser.add_argument("--xml-dir", default=XML_DIR, type=Path, help="Directory of TEI XML files to check.")
+    args = parser.parse_args()
+
+    mismatches = verify_corpus(args.xml_dir)
+    for name, diff in mismatches:
+        print(f"{name}: plain.xsl output differs from HtmlConverter:\n{diff}")
+    if mismatches:
+        sys.exit(1)
+    print("plain.xsl output matches HtmlConverter on all texts.")
@@ -6,6 +6,7 @@ import sys
 
 PROJECT_ROOT = Path(__file__).resolve().parents[3]
 sys.path.append(str(PROJECT_ROOT))
+from utils.transforms.corpus_inventory import load_inventory
 from utils.transforms.flag_map import flag_map, editorial_coord_labels_map
 
 XML_DIR = os.path.join(PROJECT_ROOT, "texts/project_editions/xml")
@@ -14,14 +15,23 @@ HTML_RICH_DIR = os.path.join(PROJECT_ROOT, "texts/transforms/html/rich")
 CONVERSION_SCRIPT = os.path.join(PROJECT_ROOT, "utils/transforms/html/convert_xml_to_html.py")
 
 
-def regenerate_html(xml_dir, plain_dir, rich_dir, standalone=False):
+def regenerate_html(xml_dir, plain_dir, rich_dir, standalone=False, stream=False, shard=False, shard_pages=None, compact_lines=False, separate_plain=False, xslt=False, split_sidecar=False, offsets=False):
     """
     Converts all XML files in a directory to both plain and rich HTML versions.
+    With shard or shard_pages, rich HTML is written as per-text shard directories.
+    With compact_lines, rich HTML carries bare line markers plus a .lines.json line table.
+    With separate_plain, the plain-text layer of rich HTML goes to a .plain.json file.
+    With split_sidecar, rich HTML gets a compact core .json plus separate .metadata.json and .corrections.json.
+    With offsets, rich HTML gets an .offsets.json mapping its coordinates to byte offsets.
+    With xslt, plain HTML is rendered by the templates/plain.xsl stylesheet; it cannot be combined with stream.
     """
+    if xslt and stream:
+        raise ValueError("xslt cannot be combined with stream")
     os.makedirs(plain_dir, exist_ok=True)
     os.makedirs(rich_dir, exist_ok=True)
 
-    xml_files = [f for f in os.listdir(xml_dir) if f.endswith(".xml")]
+    inventory = load_inventory(xml_dir, {'.': {'.xml': 'xml'}})
+    xml_files = [os.path.basename(text_files['xml'][0]) for text_files in inventory.values()]
 
     # Pass 1: Generate all plain files
     for filename in xml_files:
@@ -30,6 +40,10 @@ def regenerate_html(xml_dir, plain_dir, rich_dir, standalone=False):
         plain_html_path = os.path.join(plain_dir, filename.replace(".xml", ".html"))
 
         command = ["python", CONVERSION_SCRIPT, xml_path, plain_html_path, "--plain"]
+        if stream:
+            command.append("--stream")
+        if xslt:
+            command.append("--xslt")
 
         flags = flag_map.get(stem, "")
         if "--drama" in flags:
@@ -55,6 +69,20 @@ def regenerate_html(xml_dir, plain_dir, rich_dir, standalone=False):
             command.append("--drama")
         if standalone:
             command.append("--standalone")
+        if stream:
+            command.append("--stream")
+        if shard_pages:
+            command.extend(["--shard-pages", str(shard_pages)])
+        elif shard:
+            command.append("--shard")
+        if compact_lines:
+            command.append("--compact-lines")
+        if separate_plain:
+            command.append("--separate-plain")
+        if split_sidecar:
+            command.append("--split-sidecar")
+        if offsets:
+            command.append("--offsets")
         labels = editorial_coord_labels_map.get(stem)
         if labels:
             command.extend(["--page-label", labels[0], "--line-label", labels[1]])
@@ -64,6 +92,25 @@ def regenerate_html(xml_dir, plain_dir, rich_dir, standalone=False):
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Regenerate HTML files from XML.")
     parser.add_argument("--standalone", action="store_true", help="Generate standalone HTML files for development.")
+    parser.add_argument("--stream", action="store_true", help="Convert one section at a time to bound memory use.")
+    parser.add_argument("--shard", action="store_true", help="Write rich HTML as one fragment per section plus an index.json.")
+    parser.add_argument("--shard-pages", type=int, metavar="N", help="Write rich HTML as fragments of N printed pages plus an index.json.")
+    parser.add_argument("--compact-lines", action="store_true", help="Replace per-line labels in rich HTML with bare markers plus a line table.")
+    parser.add_argument("--separate-plain", action="store_true", help="Move the plain-text layer of rich HTML into a separate .plain.json file.")
+    parser.add_argument("--split-sidecar", action="store_true", help="Split the rich JSON sidecar into a compact core plus separate metadata and corrections files.")
+    parser.add_argument("--offsets", action="store_true", help="Also map the coordinates of rich HTML to byte offsets in a separate .offsets.json file.")
+    parser.add_argument("--xslt", action="store_true", help="Render plain HTML with the XSLT stylesheet instead of the Python converter.")
     args = parser.parse_args()
+    if args.standalone and (args.shard or args.shard_pages):
+        parser.error("--shard/--shard-pages cannot be combined with --standalone")
+    if args.standalone and (args.compact_lines or args.separate_plain or args.split_sidecar):
+        parser.error("--compact-lines, --separate-plain and --split-sidecar cannot be combined with --standalone")
+    if args.offsets and (args.standalone or args.shard or args.shard_pages):
+        parser.error("--offsets cannot be combined with --standalone or --shard/--shard-pages")
+    if args.xslt and args.stream:
+        parser.error("--xslt cannot be combined with --stream")
 
-    regenerate_html(XML_DIR, HTML_PLAIN_DIR, HTML_RICH_DIR, standalone=args.standalone)
\ No newline at end of file
+    regenerate_html(XML_DIR, HTML_PLAIN_DIR, HTML_RICH_DIR, standalone=args.standalone, stream=args.stream,
+                    shard=args.shard, shard_pages=args.shard_pages, compact_lines=args.compact_lines,
+                    separate_plain=args.separate_plain, xslt=args.xslt,
+                    split_sidecar=args.split_sidecar, offsets=args.offsets)
\ No newline at end of file
@@ -0,0 +1,452 @@
+<?xml version="1.0" encoding="utf-8"?>
+<!--
+  Plain HTML for one TEI text, as HtmlConverter writes it in plain mode.
+
+  Applied by plain_xslt.py to the document as convert_xml_to_html.py parses it
+  (blank text removed, namespace prefixes stripped). Plain text follows
+  HtmlConverter.get_plain_text_recursive: <corr> inside <choice> is preferred,
+  <del> is dropped and <supplied> is kept.
+
+  Modes:
+    section  a <body>/<div n> section
+    body     one child of a section
+    sp       one child of an <sp>, inside its speech container
+    lg-child one child of an <lg>, inside its <div class="lg plain-text">
+    text     the plain text of an element (its text, then its children in mode run)
+    run      one child within its parent's plain text, followed by its tail if not blank
+-->
+<xsl:stylesheet version="1.0" xmlns:xsl="http://www.w3.org/1999/XSL/Transform">
+
+  <xsl:param name="title" select="''"/>
+  <xsl:param name="page-label" select="'p'"/>
+  <xsl:param name="line-label" select="'l'"/>
+
+  <xsl:variable name="ws" select="'&#x20;&#x9;&#xA;&#xD;'"/>
+
+  <xsl:template match="/">
+    <html>
+      <head>
+        <meta charset="utf-8"/>
+        <title><xsl:value-of select="$title"/></title>
+        <meta name="viewport" content="width=device-width, initial-scale=1.0"/>
+      </head>
+      <body>
+        <div id="content">
+          <xsl:apply-templates select="//body/div[@n]" mode="section"/>
+        </div>
+      </body>
+    </html>
+  </xsl:template>
+
+  <!-- ===== Sections ===== -->
+
+  <xsl:template match="div" mode="section">
+    <xsl:if test="string(@n)">
+      <h1 id="{translate(@n, ' ', '_')}">
+        <xsl:text>§ </xsl:text>
+        <xsl:value-of select="@n"/>
+      </h1>
+    </xsl:if>
+    <xsl:apply-templates select="*" mode="body"/>
+  </xsl:template>
+
+  <xsl:template match="*" mode="body"/>
+
+  <xsl:template match="milestone[string(@n)]" mode="body">
+    <h2 class="milestone rich-text"><xsl:value-of select="@n"/></h2>
+  </xsl:template>
+
+  <xsl:template match="stage" mode="body">
+    <p class="plain-text">
+      <xsl:text>(</xsl:text>
+      <xsl:apply-templates select="." mode="text"/>
+      <xsl:text>)</xsl:text>
+    </p>
+  </xsl:template>
+
+  <!-- A <p> with only <milestone>/<lb>/<pb> children and no text produces nothing. -->
+  <xsl:template match="p[not(text()[normalize-space()]) and not(*[not(self::milestone or self::lb or self::pb)])]" mode="body" priority="1"/>
+
+  <xsl:template match="p" mode="body">
+    <xsl:if test="string(@n)">
+      <xsl:call-template name="editorial-coord"/>
+    </xsl:if>
+    <p class="plain-text">
+      <xsl:apply-templates select="." mode="text"/>
+    </p>
+  </xsl:template>
+
+  <xsl:template match="lg" mode="body">
+    <xsl:variable name="condensed" select="(@type = 'group' and lg[l[string(@n)]]) or (not(@type = 'group') and l[string(@n)])"/>
+    <xsl:if test="not($condensed) and string(@n)">
+      <xsl:if test="not(contains(@n, ','))">
+        <xsl:message terminate="yes">Standard-format &lt;lg&gt; has non-page,line n attribute: n="<xsl:value-of select="@n"/>". Use condensed verse format for verse-numbered lgs.</xsl:message>
+      </xsl:if>
+      <xsl:call-template name="editorial-coord"/>
+    </xsl:if>
+    <xsl:call-template name="lg-group"/>
+  </xsl:template>
+
+  <!-- Editorial-coordinate heading for the context element's n="page,line".
+       Outside <sp>, custom coordinate labels only head a section start (line 1). -->
+  <xsl:template name="editorial-coord">
+    <xsl:param name="always" select="false()"/>
+    <xsl:variable name="commas" select="string-length(@n) - string-length(translate(@n, ',', ''))"/>
+    <xsl:variable name="page">
+      <xsl:call-template name="strip">
+        <xsl:with-param name="s" select="substring-before(concat(@n, ','), ',')"/>
+      </xsl:call-template>
+    </xsl:variable>
+    <xsl:variable name="line">
+      <xsl:choose>
+        <xsl:when test="$commas = 0">1</xsl:when>
+        <xsl:otherwise>
+          <xsl:call-template name="strip">
+            <xsl:with-param name="s" select="substring-before(concat(substring-after(@n, ','), ','), ',')"/>
+          </xsl:call-template>
+        </xsl:otherwise>
+      </xsl:choose>
+    </xsl:variable>
+    <xsl:if test="$always or $page-label = 'p' or $commas != 1 or $line = '1'">
+      <h3 class="editorial-coord rich-text" id="{translate(@n, ', ', '_')}">
+        <xsl:choose>
+          <xsl:when test="$commas = 1">
+            <xsl:value-of select="concat($page-label, '.', $page, ', ', $line-label, '.', $line)"/>
+          </xsl:when>
+          <xsl:when test="$commas = 0">
+            <xsl:value-of select="concat($page-label, '.', $page)"/>
+          </xsl:when>
+          <xsl:otherwise>
+            <xsl:value-of select="@n"/>
+          </xsl:otherwise>
+        </xsl:choose>
+      </h3>
+    </xsl:if>
+  </xsl:template>
+
+  <!-- ===== Drama speeches ===== -->
+
+  <!-- Each <sp> child with a new n="page,line" starts a fresh speech container, headed by
+       an editorial coordinate unless it repeats the last one emitted by any <sp>. -->
+  <xsl:template match="sp" mode="body">
+    <xsl:apply-templates select="*[not(self::speaker)]" mode="sp-start"/>
+  </xsl:template>
+
+  <xsl:template match="*" mode="sp-start">
+    <xsl:variable name="previous-n" select="preceding-sibling::*[not(self::speaker)][contains(@n, ',')][1]/@n"/>
+    <xsl:variable name="is-reset" select="contains(@n, ',') and not(@n = $previous-n)"/>
+    <xsl:if test="$is-reset or not(preceding-sibling::*[not(self::speaker)])">
+      <!-- The last coordinate emitted is previous-n or, failing that, the last one of an earlier <sp>. -->
+      <xsl:variable name="previous-sp" select="../preceding-sibling::sp[*[not(self::speaker)][contains(@n, ',')]][1]"/>
+      <xsl:variable name="emitted-n" select="$previous-n
+          | $previous-sp[not($previous-n)]/*[not(self::speaker)][contains(@n, ',')][last()]/@n
+          | parent::sp[not($previous-n) and not($previous-sp)]/preceding::*[parent::sp][not(self::speaker)][contains(@n, ',')][1]/@n"/>
+      <xsl:if test="$is-reset and not(@n = $emitted-n)">
+        <xsl:call-template name="editorial-coord">
+          <xsl:with-param name="always" select="true()"/>
+        </xsl:call-template>
+      </xsl:if>
+      <div class="speech plain-text">
+        <xsl:apply-templates select="." mode="sp-member"/>
+      </div>
+    </xsl:if>
+  </xsl:template>
+
+  <xsl:template match="*" mode="sp-member">
+    <xsl:apply-templates select="." mode="sp"/>
+    <xsl:apply-templates select="following-sibling::*[not(self::speaker)][1][not(contains(@n, ',')) or @n = preceding-sibling::*[not(self::speaker)][contains(@n, ',')][1]/@n]" mode="sp-member"/>
+  </xsl:template>
+
+  <xsl:template match="*" mode="sp"/>
+
+  <xsl:template match="p" mode="sp">
+    <p>
+      <xsl:call-template name="speaker-cue"/>
+      <xsl:variable name="stage" select="*[1][self::stage][not(normalize-space(following-sibling::node()[1][self::text()]))]"/>
+      <xsl:choose>
+        <!-- A stage direction alone on the first physical line gets its own line. -->
+        <xsl:when test="$stage and not(normalize-space(node()[1][self::text()])) and $stage/following-sibling::*[1][self::lb]">
+          <xsl:text>(</xsl:text>
+          <xsl:apply-templates select="$stage" mode="text"/>
+          <xsl:text>)</xsl:text>
+          <br/>
+          <xsl:variable name="lb" select="$stage/following-sibling::*[1]"/>
+          <xsl:call-template name="strip">
+            <xsl:with-param name="s" select="$lb/following-sibling::node()[1][self::text()]"/>
+          </xsl:call-template>
+          <xsl:for-each select="$lb/following-sibling::*">
+            <xsl:apply-templates select="." mode="text"/>
+            <xsl:value-of select="following-sibling::node()[1][self::text()]"/>
+          </xsl:for-each>
+        </xsl:when>
+        <xsl:otherwise>
+          <xsl:apply-templates select="." mode="text"/>
+        </xsl:otherwise>
+      </xsl:choose>
+    </p>
+  </xsl:template>
+
+  <xsl:template match="lg" mode="sp">
+    <xsl:variable name="cue">
+      <xsl:call-template name="speaker-cue"/>
+    </xsl:variable>
+    <xsl:if test="string($cue)">
+      <p><xsl:value-of select="$cue"/></p>
+    </xsl:if>
+    <xsl:call-template name="lg-group"/>
+  </xsl:template>
+
+  <xsl:template match="stage" mode="sp">
+    <p>
+      <xsl:text>(</xsl:text>
+      <xsl:apply-templates select="." mode="text"/>
+      <xsl:text>)</xsl:text>
+    </p>
+  </xsl:template>
+
+  <!-- "Speaker — " before the first <p> or <lg> of a speech. -->
+  <xsl:template name="speaker-cue">
+    <xsl:variable name="speaker" select="string(../speaker[1]/node()[1][self::text()])"/>
+    <xsl:if test="$speaker and not(preceding-sibling::p or preceding-sibling::lg)">
+      <xsl:value-of select="concat($speaker, ' — ')"/>
+    </xsl:if>
+  </xsl:template>
+
+  <!-- ===== Verse ===== -->
+
+  <xsl:template name="lg-group">
+    <xsl:choose>
+      <xsl:when test="@type = 'group'">
+        <xsl:apply-templates select="lg" mode="lg"/>
+      </xsl:when>
+      <xsl:otherwise>
+        <xsl:apply-templates select="." mode="lg"/>
+      </xsl:otherwise>
+    </xsl:choose>
+  </xsl:template>
+
+  <xsl:template match="lg" mode="lg">
+    <div class="lg plain-text">
+      <xsl:apply-templates select="*" mode="lg-child"/>
+    </div>
+  </xsl:template>
+
+  <xsl:template match="*" mode="lg-child"/>
+
+  <xsl:template match="head[node()[1][self::text()]]" mode="lg-child">
+    <p class="lg-head">
+      <xsl:value-of select="node()[1]"/>
+      <xsl:call-template name="attached-backs"/>
+    </p>
+  </xsl:template>
+
+  <xsl:template match="l" mode="lg-child">
+    <xsl:call-template name="l-spans">
+      <xsl:with-param name="owner" select="."/>
+    </xsl:call-template>
+  </xsl:template>
+
+  <xsl:template match="lg[@type = 'chāyā']" mode="lg-child">
+    <div class="chaya">
+      <xsl:for-each select="l">
+        <xsl:call-template name="l-spans"/>
+      </xsl:for-each>
+      <xsl:call-template name="attached-backs"/>
+    </div>
+  </xsl:template>
+
+  <!-- A <back> is appended to the last block of its verse; only <back>s ahead of
+       every block get a <p> of their own. -->
+  <xsl:template match="back" mode="lg-child">
+    <xsl:if test="not(preceding-sibling::*[self::l or self::lg[@type = 'chāyā'] or self::head[node()[1][self::text()]] or self::back])">
+      <p>
+        <xsl:for-each select=". | following-sibling::back[not(preceding-sibling::*[self::l or self::lg[@type = 'chāyā'] or self::head[node()[1][self::text()]]])]">
+          <xsl:apply-templates select="." mode="text"/>
+        </xsl:for-each>
+      </p>
+    </xsl:if>
+  </xsl:template>
+
+  <!-- Plain text of the <back> siblings whose nearest preceding block is the context element. -->
+  <xsl:template name="attached-backs">
+    <xsl:variable name="id" select="generate-id()"/>
+    <xsl:for-each select="following-sibling::back[generate-id(preceding-sibling::*[self::l or self::lg[@type = 'chāyā'] or self::head[node()[1][self::text()]]][1]) = $id]">
+      <xsl:apply-templates select="." mode="text"/>
+    </xsl:for-each>
+  </xsl:template>
+
+  <!-- One <span> per <l>, or two if it has a <caesura/> (see HtmlConverter._split_l_at_caesura).
+       owner is the lg child whose trailing <back>s go into the last span. -->
+  <xsl:template name="l-spans">
+    <xsl:param name="owner" select="/.."/>
+    <xsl:variable name="caesura" select="caesura[1]"/>
+    <xsl:choose>
+      <xsl:when test="not($caesura)">
+        <span>
+          <xsl:apply-templates select="." mode="text"/>
+          <xsl:for-each select="$owner">
+            <xsl:call-template name="attached-backs"/>
+          </xsl:for-each>
+        </span>
+      </xsl:when>
+      <xsl:otherwise>
+        <!-- A hyphenated <lb> right after the caesura ends the first half; its tail starts the second. -->
+        <xsl:variable name="moved-lb" select="$caesura/following-sibling::*[1][self::lb][@break = 'no']"/>
+        <span>
+          <xsl:value-of select="node()[1][self::text()]"/>
+          <xsl:apply-templates select="*[not(self::caesura) and not(preceding-sibling::caesura)]" mode="run">
+            <xsl:with-param name="run-end" select="generate-id($caesura)"/>
+          </xsl:apply-templates>
+        </span>
+        <span>
+          <xsl:value-of select="$caesura/following-sibling::node()[1][self::text()]"/>
+          <xsl:value-of select="$moved-lb/following-sibling::node()[1][self::text()]"/>
+          <xsl:apply-templates select="($moved-lb | $caesura[not($moved-lb)])/following-sibling::*" mode="run"/>
+          <xsl:for-each select="$owner">
+            <xsl:call-template name="attached-backs"/>
+          </xsl:for-each>
+        </span>
+      </xsl:otherwise>
+    </xsl:choose>
+  </xsl:template>
+
+  <!-- ===== Plain text ===== -->
+
+  <xsl:template match="*" mode="text">
+    <xsl:value-of select="node()[1][self::text()]"/>
+    <xsl:apply-templates select="*" mode="run"/>
+  </xsl:template>
+
+  <xsl:template name="tail">
+    <xsl:variable name="tail" select="following-sibling::node()[1][self::text()]"/>
+    <xsl:if test="normalize-space($tail)">
+      <xsl:value-of select="$tail"/>
+    </xsl:if>
+  </xsl:template>
+
+  <xsl:template match="*" mode="run">
+    <xsl:apply-templates select="." mode="text"/>
+    <xsl:call-template name="tail"/>
+  </xsl:template>
+
+  <xsl:template match="choice" mode="run">
+    <xsl:apply-templates select="corr[1]" mode="text"/>
+    <xsl:call-template name="tail"/>
+  </xsl:template>
+
+  <xsl:template match="del | seg[@type = 'chāyā']" mode="run">
+    <xsl:call-template name="tail"/>
+  </xsl:template>
+
+  <xsl:template match="lg[@type = 'chāyā']" mode="run">
+    <xsl:text> (</xsl:text>
+    <xsl:for-each select="l">
+      <xsl:if test="position() > 1">
+        <xsl:text> </xsl:text>
+      </xsl:if>
+      <xsl:apply-templates select="." mode="text"/>
+    </xsl:for-each>
+    <xsl:text>)</xsl:text>
+    <xsl:call-template name="tail"/>
+  </xsl:template>
+
+  <!-- run-end: id of the <caesura/> that ends this half of a split <l>, if any. -->
+  <xsl:template match="stage" mode="run">
+    <xsl:param name="run-end" select="''"/>
+    <xsl:variable name="tail" select="string(following-sibling::node()[1][self::text()])"/>
+    <xsl:variable name="next" select="following-sibling::*[1][generate-id() != $run-end]"/>
+    <xsl:text>(</xsl:text>
+    <xsl:apply-templates select="." mode="text"/>
+    <xsl:text>)</xsl:text>
+    <xsl:choose>
+      <xsl:when test="starts-with($tail, ' ')">
+        <xsl:text> </xsl:text>
+      </xsl:when>
+      <xsl:when test="normalize-space($tail)"/>
+      <xsl:when test="$next and not($next[self::lb or self::pb or self::milestone])">
+        <xsl:text> </xsl:text>
+      </xsl:when>
+    </xsl:choose>
+    <xsl:call-template name="tail"/>
+  </xsl:template>
+
+  <!-- Prakrit followed by its chāyā in parentheses. -->
+  <xsl:template match="seg[@type = 'prakrit']" mode="run">
+    <xsl:call-template name="prakrit">
+      <xsl:with-param name="next" select="*[1]"/>
+      <xsl:with-param name="acc" select="string(node()[1][self::text()])"/>
+    </xsl:call-template>
+    <xsl:text> (</xsl:text>
+    <xsl:apply-templates select="seg[@type = 'chāyā'][1]" mode="text"/>
+    <xsl:text>)</xsl:text>
+    <xsl:call-template name="tail"/>
+  </xsl:template>
+
+  <!-- Walk a Prakrit <seg>'s children from next on, with acc holding the text so far. -->
+  <xsl:template name="prakrit">
+    <xsl:param name="next"/>
+    <xsl:param name="acc"/>
+    <xsl:choose>
+      <xsl:when test="not($next)">
+        <xsl:value-of select="$acc"/>
+      </xsl:when>
+      <xsl:when test="$next[self::seg[@type = 'chāyā']]">
+        <xsl:call-template name="prakrit">
+          <xsl:with-param name="next" select="$next/following-sibling::*[1]"/>
+          <xsl:with-param name="acc" select="$acc"/>
+        </xsl:call-template>
+      </xsl:when>
+      <xsl:otherwise>
+        <xsl:variable name="tail" select="string($next/following-sibling::node()[1][self::text()])"/>
+        <xsl:variable name="part">
+          <xsl:choose>
+            <xsl:when test="$next[self::stage]">
+              <xsl:text>(</xsl:text>
+              <xsl:apply-templates select="$next" mode="text"/>
+              <xsl:text>)</xsl:text>
+            </xsl:when>
+            <xsl:when test="$next[self::lb]">
+              <!-- A non-hyphenated line break is a space. -->
+              <xsl:if test="not($next/@break = 'no') and $tail and substring($acc, string-length($acc)) != ' '">
+                <xsl:text> </xsl:text>
+              </xsl:if>
+            </xsl:when>
+            <xsl:otherwise>
+              <xsl:apply-templates select="$next" mode="text"/>
+            </xsl:otherwise>
+          </xsl:choose>
+        </xsl:variable>
+        <xsl:call-template name="prakrit">
+          <xsl:with-param name="next" select="$next/following-sibling::*[1]"/>
+          <xsl:with-param name="acc" select="concat($acc, $part, $tail)"/>
+        </xsl:call-template>
+      </xsl:otherwise>
+    </xsl:choose>
+  </xsl:template>
+
+  <!-- s without leading and trailing whitespace. -->
+  <xsl:template name="strip">
+    <xsl:param name="s"/>
+    <xsl:variable name="start" select="substring(normalize-space($s), 1, 1)"/>
+    <xsl:if test="$start">
+      <xsl:call-template name="rstrip">
+        <xsl:with-param name="s" select="concat($start, substring-after($s, $start))"/>
+      </xsl:call-template>
+    </xsl:if>
+  </xsl:template>
+
+  <xsl:template name="rstrip">
+    <xsl:param name="s"/>
+    <xsl:choose>
+      <xsl:when test="contains($ws, substring($s, string-length($s)))">
+        <xsl:call-template name="rstrip">
+          <xsl:with-param name="s" select="substring($s, 1, string-length($s) - 1)"/>
+        </xsl:call-template>
+      </xsl:when>
+      <xsl:otherwise>
+        <xsl:value-of select="$s"/>
+      </xsl:otherwise>
+    </xsl:choose>
+  </xsl:template>
+
+</xsl:stylesheet>
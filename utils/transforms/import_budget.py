@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Checks the import cost of the pipeline's entry-point scripts.
+
+Each script is imported in a fresh interpreter under `python -X importtime`,
+with its own directory first on sys.path as when it is run directly. The
+script fails its budget if importing it takes longer than its allowance
+(best of several runs, excluding interpreter startup) or if it pulls in a
+heavy dependency that it should only import on first use.
+
+Usage: python utils/transforms/import_budget.py [--repeat N] [--verbose]
+"""
+
+import argparse
+import subprocess
+import sys
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+
+# script (relative to the project root) -> (budget in ms, modules it must not import at load)
+#
+# Wall-clock budgets are about three times each script's best-of-5 import time
+# on a development machine, so that slower CI runners do not fail them. They
+# catch a gross regression; the lists of heavy modules (markdown ~30 ms,
+# lxml.etree ~18 ms, skrutable several hundred) are the exact check.
+ENTRY_POINTS = {
+    'utils/transforms/html/convert_xml_to_html.py': (150, ('markdown', 'skrutable', 'lxml.html', 'importlib.metadata')),
+    'utils/transforms/html/aksara_counter.py': (20, ('skrutable', 'lxml')),
+    'utils/transforms/metadata/convert_md_to_html.py': (50, ('markdown', 'skrutable')),
+    'utils/transforms/metadata/jsonify_metadata.py': (50, ('markdown', 'skrutable')),
+    'utils/transforms/metadata/sidecar_metadata.py': (60, ('markdown', 'lxml', 'importlib.metadata')),
+    'utils/transforms/metadata/update_version.py': (40, ('markdown', 'skrutable')),
+    'utils/transforms/xml/convert_plaintext_to_xml.py': (100, ('markdown', 'skrutable')),
+    'utils/transforms/xml/convert_markdown_to_xml.py': (120, ('markdown', 'skrutable')),
+    'utils/transforms/xml/convert_xml_to_plaintext.py': (80, ('markdown', 'skrutable')),
+}
+
+
+def measure_import(script):
+    """Import script in a fresh interpreter under -X importtime.
+
+    Returns:
+        (cumulative import time of the script's module in ms,
+         dict of every module imported -> its cumulative import time in ms).
+    """
+    script = PROJECT_ROOT / script
+    code = f"import sys; sys.path.insert(0, {str(script.parent)!r}); import {script.stem}"
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                            capture_output=True, text=True, cwd=PROJECT_ROOT)
+    if result.returncode != 0:
+        raise RuntimeError(f"importing {script} failed:\n{result.stderr}")
+
+    # -X importtime lists a module after everything it imported, indented one
+    # level deeper; the script's imports are the deeper lines right above it.
+    entries = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        entries.append((len(name) - len(name.lstrip()), name.strip(), int(cumulative)))
+    index = next(i for i, (_, name, _) in enumerate(entries) if name == script.stem)
+    depth, _, total_us = entries[index]
+    modules = {}
+    for entry_depth, name, cumulative in reversed(entries[:index]):
+        if entry_depth <= depth:
+            break
+        modules[name] = cumulative / 1000
+    return total_us / 1000, modules
+
+
+def check_budgets(repeat=5, verbose=False):
+    """Measure every entry point; returns a list of budget violations."""
+    failures = []
+    for script, (budget_ms, forbidden) in ENTRY_POINTS.items():
+        best_ms, modules = None, {}
+        for _ in range(repeat):
+            ms, modules = measure_import(script)
+            best_ms = ms if best_ms is None else min(best_ms, ms)
+        eager = sorted(m for m in forbidden if m in modules)
+        status = 'ok' if best_ms <= budget_ms and not eager else 'OVER'
+        print(f"{status:4}  {best_ms:7.1f} ms / {budget_ms:4d} ms  {script}")
+        if verbose:
+            heaviest = sorted((ms, name) for name, ms in modules.items())[-5:]
+            print("      heaviest: " + ', '.join(f"{name} {ms:.1f} ms" for ms, name in reversed(heaviest)))
+        if best_ms > budget_ms:
+            failures.append(f"{script}: {best_ms:.1f} ms exceeds its {budget_ms} ms budget")
+        if eager:
+            failures.append(f"{script}: imports {', '.join(eager)} at load")
+    return failures
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Check entry-point import times against their budgets.")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per script; the fastest counts (default: 5).")
+    parser.add_argument("--verbose", action="store_true", help="Also list the five slowest imports per script.")
+    args = parser.parse_args()
+
+    failures = check_budgets(args.repeat, args.verbose)
+    for failure in failures:
+        print(f"ERROR: {failure}")
+    if failures:
+        sys.exit(1)
+    print("All entry points within their import budgets.")
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Writes catalog facet indexes and a compact catalog listing from metadata.json.
+
+For each facet in FACET_FIELDS, metadata/transforms/facets/<facet>.json maps
+every normalised value of its fields to its display label and the sorted
+metadata.json keys of the texts that have it, so the web app can filter the
+catalog with a dictionary lookup instead of scanning every record:
+
+    {"fields": ["Genres"], "values": {"kāvya": {"label": "Kāvya", "texts": [...]}}}
+
+metadata/transforms/catalog.json lists, per text, only the SUMMARY_FIELDS the
+catalog listing shows, with its author(s) under "Authors" whichever of
+AUTHOR_FIELDS the metadata uses.
+"""
+
+import json
+import re
+import sys
+import unicodedata
+from pathlib import Path
+
+# the headings metadata files give their author(s) under
+AUTHOR_FIELDS = ('Author', 'Authors', 'Attributed Author')
+
+# facet name (output file stem) -> metadata fields
+FACET_FIELDS = {
+    'author': AUTHOR_FIELDS,
+    'genre': ('Genres',),
+    'text_type': ('Text Type',),
+    'source_collection': ('Source Collection',),
+    'license': ('HANSEL License',),
+}
+
+SUMMARY_FIELDS = (
+    'Title',
+    'Text Type',
+    'Genres',
+    'Edition Short',
+    'File Size (KB)',
+)
+
+_LINK_RE = re.compile(r'\[([^\]]*)\]\([^)]*\)')
+
+
+def facet_label(value):
+    """A field value as a facet label: links reduced to their text, whitespace collapsed, trailing period dropped."""
+    value = unicodedata.normalize('NFC', _LINK_RE.sub(r'\1', value))
+    return ' '.join(value.split()).rstrip('.').strip()
+
+
+def field_values(record, fields):
+    """The values of record's fields, a string field counting as one value and a list as several."""
+    values = []
+    for field in fields:
+        raw = record.get(field)
+        values.extend([raw] if isinstance(raw, str) else raw or [])
+    return values
+
+
+def build_facets(consolidated):
+    """facet name -> {"fields", "values": {normalised value: {"label", "texts"}}} for the records in consolidated."""
+    facets = {}
+    for facet, fields in FACET_FIELDS.items():
+        values = {}
+        for key, record in consolidated.items():
+            if not isinstance(record, dict):
+                continue  # the top-level "version" entry
+            for item in field_values(record, fields):
+                label = facet_label(item)
+                if not label:
+                    continue
+                entry = values.setdefault(label.casefold(), {'label': label, 'texts': set()})
+                entry['texts'].add(key)
+        facets[facet] = {
+            'fields': list(fields),
+            'values': {value: {'label': entry['label'], 'texts': sorted(entry['texts'])}
+                       for value, entry in sorted(values.items())},
+        }
+    return facets
+
+
+def build_summary(consolidated):
+    """The catalog listing: per text, its key, its authors (if any) and the SUMMARY_FIELDS it has."""
+    summary = []
+    for key, record in consolidated.items():
+        if not isinstance(record, dict):
+            continue
+        entry = {'key': key}
+        authors = field_values(record, AUTHOR_FIELDS)
+        if authors:
+            entry['Authors'] = authors
+        entry.update({field: record[field] for field in SUMMARY_FIELDS if field in record})
+        summary.append(entry)
+    return summary
+
+
+def _dump(path, data):
+    path.write_text(json.dumps(data, ensure_ascii=False, separators=(',', ':')), encoding='utf-8')
+
+
+def main(folder='.', consolidated=None):
+    """Write the facet indexes and catalog listing; consolidated is metadata.json's content, read if not given."""
+    transforms_dir = Path(folder) / 'metadata' / 'transforms'
+    if consolidated is None:
+        with open(transforms_dir / 'metadata.json', encoding='utf-8') as f:
+            consolidated = json.load(f)
+
+    facets_dir = transforms_dir / 'facets'
+    facets_dir.mkdir(parents=True, exist_ok=True)
+    facets = build_facets(consolidated)
+    for facet, index in facets.items():
+        _dump(facets_dir / f'{facet}.json', index)
+    for facet_path in facets_dir.glob('*.json'):
+        if facet_path.stem not in facets:
+            facet_path.unlink()
+
+    summary = build_summary(consolidated)
+    _dump(transforms_dir / 'catalog.json', summary)
+    print(f'Wrote {len(facets)} facet indexes to {facets_dir} and {transforms_dir / "catalog.json"} ({len(summary)} texts).')
+
+
+if __name__ == '__main__':
+    main(sys.argv[1] if len(sys.argv) > 1 else '.')
@@ -6,59 +6,60 @@ Changes:
 • Each record now includes `"Filename": "<basename.md>"`.
 • The top‑level key is the filename (stem) transliterated from HK → IAST
   using skrutable.Transliterator.
+• File Size (KB) is computed by metadata_loader.py, and the Original
+  Submission Filetype comes from the corpus inventory
+  (utils/transforms/corpus_inventory.py).
+• Entries are cached per metadata file in .cache/metadata/json, so a
+  metadata edit only re-validates and re-transliterates the files that
+  changed.
 """
 
+import functools
+import hashlib
 import json
 import os
 import re
 import sys
 from pathlib import Path
 
-from skrutable.transliteration import Transliterator
+PROJECT_ROOT = Path(__file__).resolve().parents[3]
+sys.path.append(str(PROJECT_ROOT))
+
+from utils.transforms.corpus_inventory import build_inventory, text_files_for
+from metadata_loader import load_metadata, parse_metadata_file
 from validate_metadata import validate_record
-T = Transliterator(from_scheme="HK", to_scheme="IAST")   # HK → IAST
 
-_heading = re.compile(r'^# (.+)')
+# The code an entry is built by: this module's field mapping, the metadata
+# parser and the validation rules. Cached entries are keyed on its digest.
+_ENTRY_SOURCES = ('jsonify_metadata.py', 'metadata_loader.py', 'validate_metadata.py')
 
-def _normalise(section_lines):
-    while section_lines and section_lines[0] == '':
-        section_lines.pop(0)
-    while section_lines and section_lines[-1] == '':
-        section_lines.pop()
 
-    if section_lines and all(re.match(r'^[-*]\s+', l) for l in section_lines):
-        return [re.sub(r'^[-*]\s+', '', l) for l in section_lines]
+@functools.lru_cache(maxsize=None)
+def _transliterator():
+    """HK → IAST skrutable Transliterator, built on first use (importing skrutable is slow)."""
+    from skrutable.transliteration import Transliterator
+    return Transliterator(from_scheme="HK", to_scheme="IAST")
 
-    return ' '.join(section_lines).strip()
-
-def parse_markdown(path: Path) -> dict:
-    """Return a dict of metadata, including the filename."""
-    meta, key, buf = {}, None, []
-    for raw in path.read_text(encoding='utf-8').splitlines():
-        h = _heading.match(raw)
-        if h:
-            if key is not None:
-                meta[key] = _normalise(buf)
-            key, buf = h.group(1).strip(), []
-        else:
-            buf.append(raw.rstrip('\n'))
-    if key is not None:
-        meta[key] = _normalise(buf)
+def record_to_json(record) -> dict:
+    """Return a dict of metadata, including the filename, for a metadata_loader.MetadataRecord."""
+    meta = dict(record.fields)
 
     # Set default for PDF Page Offset if missing
     if "PDF Page Offset" not in meta:
         meta["PDF Page Offset"] = ["1 → 1"]
 
     # Add filename field
-    meta["Filename"] = path.name[:-3]
+    meta["Filename"] = record.path.name[:-3]
     return meta
 
-def get_file_extension(filename_without_extension):
-    search_folder = './texts/original_submissions'
-    for item in os.listdir(search_folder):
-        base_name, extension = os.path.splitext(item)
-        if base_name.lower() == filename_without_extension.lower():
-            return extension
+def parse_markdown(path: Path) -> dict:
+    """Return a dict of metadata, including the filename."""
+    return record_to_json(parse_metadata_file(path))
+
+def get_file_extension(text_files):
+    """The original submission's extension from a corpus inventory entry, or None."""
+    submission = text_files.get('original_submission')
+    return os.path.splitext(submission[0])[1] if submission else None
 
 def parse_additional_files(file_list):
     """
@@ -111,7 +112,86 @@ def parse_additional_files(file_list):
                 })
     return parsed_files
 
-def main(folder: str):
+def build_entry(metadata_record) -> dict:
+    """The metadata.json entry for one metadata_loader.MetadataRecord.
+
+    Returns a dict with the HK → IAST "key", the processed "record" and the
+    validation "warnings"; a record with warnings is left unprocessed.
+    """
+    record = record_to_json(metadata_record)
+    warnings = metadata_record.warnings + validate_record(metadata_record.path.name, record)
+    if not warnings:
+        # convert file size (kb) to float
+        if 'File Size (KB)' in record:
+            record['File Size (KB)'] = float(record['File Size (KB)'])
+
+        # parse additional files
+        if 'Additional Files' in record:
+            record['Additional Files'] = parse_additional_files(record['Additional Files'])
+    return {
+        "key": _transliterator().transliterate(metadata_record.stem),
+        "record": record,
+        "warnings": warnings,
+    }
+
+
+def _cache_key():
+    from importlib.metadata import version as package_version
+    code = hashlib.sha256()
+    for name in _ENTRY_SOURCES:
+        code.update((Path(__file__).parent / name).read_bytes())
+    return {"code_sha256": code.hexdigest(), "skrutable_version": package_version("skrutable")}
+
+
+def load_entries(markdown_dir, cache_dir, records=None):
+    """Return the metadata.json entries for every file in markdown_dir, in file name order.
+
+    Entries are cached in cache_dir per metadata file, keyed by the hash of
+    its record's content (which includes the computed File Size (KB)), so only
+    new or changed files are validated, mapped to JSON fields and
+    transliterated. Every file is still parsed: parsing is cheap, and the
+    other metadata steps need all the records anyway. Cache files of deleted
+    metadata files are removed. records are already loaded
+    metadata_loader.MetadataRecords, if any.
+    """
+    if records is None:
+        records = load_metadata(markdown_dir)
+
+    key = _cache_key()
+    entries = []
+    for metadata_record in records:
+        source_sha256 = hashlib.sha256(metadata_record.content.encode('utf-8')).hexdigest()
+        cache_path = cache_dir / f'{metadata_record.stem}.json'
+        entry = None
+        try:
+            with open(cache_path, encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            pass
+        if entry is None or entry.get("source_sha256") != source_sha256 or any(entry.get(k) != v for k, v in key.items()):
+            entry = {**key, "source_sha256": source_sha256, **build_entry(metadata_record)}
+            if not entry["warnings"]:
+                cache_dir.mkdir(parents=True, exist_ok=True)
+                tmp_path = cache_path.with_suffix('.json.tmp')
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(entry, f, ensure_ascii=False)
+                os.replace(tmp_path, cache_path)
+        entries.append(entry)
+
+    expected = {metadata_record.stem for metadata_record in records}
+    for cache_path in cache_dir.glob('*.json'):
+        if cache_path.stem not in expected:
+            cache_path.unlink()
+    return entries
+
+
+def main(folder: str, records=None):
+    """Write metadata.json and return its content; records are loaded from folder if not given.
+
+    Entries of unchanged metadata files are taken from the per-file cache in
+    .cache/metadata/json (see load_entries), so only edited files are
+    validated and transliterated.
+    """
     root = Path(folder)
     metadata_markdown_in_dir = root / 'metadata' / 'markdown'
 
@@ -123,33 +203,28 @@ def main(folder: str):
         sys.exit("Could not find __data_version__ in VERSION file.")
     version = version_content.splitlines()[0].split('"')[1]
 
-    consolidated = {}
-    all_warnings = []
-    for md in metadata_markdown_in_dir.glob('*.md'):
-        record = parse_markdown(md)
-        translit_key = T.transliterate(md.stem)
-        consolidated[translit_key] = record
-        all_warnings.extend(validate_record(md.name, record))
+    entries = load_entries(metadata_markdown_in_dir, root / '.cache' / 'metadata' / 'json', records)
 
+    all_warnings = [w for entry in entries for w in entry["warnings"]]
     if all_warnings:
         print("Metadata validation errors:")
         for w in all_warnings:
             print(f"  ERROR: {w}")
         sys.exit(1)
 
-    for k, record in consolidated.items():
+    # One listing of the corpus directories serves every record
+    inventory = build_inventory(root.resolve())
 
-        # convert file size (kb) to float
-        consolidated[k]['File Size (KB)'] = float(consolidated[k]['File Size (KB)'])
+    consolidated = {}
+    for entry in entries:
+        record = dict(entry["record"])
+        text_files = text_files_for(inventory, record['Filename'])
 
         # detect and store original file type
-        ext = get_file_extension(consolidated[k]['Filename'])
+        ext = get_file_extension(text_files)
         if ext is not None:
-            consolidated[k]['Original Submission Filetype'] = ext
-        
-        # parse additional files
-        if 'Additional Files' in consolidated[k]:
-             consolidated[k]['Additional Files'] = parse_additional_files(consolidated[k]['Additional Files'])
+            record['Original Submission Filetype'] = ext
+        consolidated[entry["key"]] = record
 
     # Add version to the consolidated data
     consolidated['version'] = version
@@ -158,6 +233,7 @@ def main(folder: str):
     metadata_json_file.write_text(json.dumps(consolidated, ensure_ascii=False, indent=2),
                    encoding='utf-8')
     print(f'Wrote {metadata_json_file} ({len(consolidated)} files).')
+    return consolidated
 
 if __name__ == '__main__':
     main(sys.argv[1] if len(sys.argv) > 1 else '.')
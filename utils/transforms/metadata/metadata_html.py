@@ -0,0 +1,52 @@
+"""
+Markdown rendering shared by the metadata HTML pages (convert_md_to_html.py)
+and the sidecar metadata records (sidecar_metadata.py).
+
+Each metadata record is rendered once, whole, by render_metadata_html. The HTML
+page keeps the sections it shows (select_sections) and the sidecar record
+splits every section into a field, so both carry the same HTML for a field.
+"""
+
+import functools
+import html
+import re
+
+_SECTION_START_RE = re.compile(r'^(?=<h1>)', flags=re.MULTILINE)
+_HEADING_RE = re.compile(r'<h1>(.*?)</h1>', flags=re.DOTALL)
+_TAG_RE = re.compile(r'<[^>]+>')
+
+
+@functools.lru_cache(maxsize=None)
+def _markdown_renderer():
+    """This process's configured Markdown instance, reused for every document (see render_metadata_html)."""
+    import markdown
+    return markdown.Markdown(extensions=["mdx_gfm"], output_format='html5')
+
+
+def renderer_versions():
+    """The versions of the packages the rendered HTML depends on."""
+    from importlib.metadata import version as package_version
+    return {"markdown_version": package_version("markdown"), "py_gfm_version": package_version("py-gfm")}
+
+
+def render_metadata_html(md_text):
+    """Render metadata Markdown to HTML, with miscellaneous links pointing to /static/data/."""
+    md = _markdown_renderer()
+    md.reset()
+    html_body = md.convert(md_text)
+
+    # Prefix miscellaneous links to point to /static/data/
+    html_body = html_body.replace('href="miscellaneous/', 'href="/static/data/miscellaneous/')
+    html_body = html_body.replace('href="/miscellaneous/', 'href="/static/data/miscellaneous/')
+    return html_body
+
+
+def select_sections(html_body, headings):
+    """The rendered HTML before the first <h1>, plus each <h1> section whose heading is in headings."""
+    chunks = _SECTION_START_RE.split(html_body)
+    selected = [chunks[0]]
+    for chunk in chunks[1:]:
+        heading = html.unescape(_TAG_RE.sub('', _HEADING_RE.match(chunk).group(1))).strip()
+        if heading in headings:
+            selected.append(chunk)
+    return ''.join(selected)
@@ -0,0 +1,139 @@
+"""
+Shared loader for the metadata/markdown/*.md files.
+
+Each file is read and split into its "# Heading" sections once, into a
+MetadataRecord that every consumer works from: VERSION computation
+(update_version.py), metadata HTML (convert_md_to_html.py), metadata.json
+(jsonify_metadata.py), the sidecar records (sidecar_metadata.py) and the TEI
+header builder (xml/convert_markdown_to_xml.py). The record also carries the
+normalised field values and the parsed Last Updated dates, with a warning for
+each date that is not a valid YYYY-MM-DD date.
+
+File Size (KB) is not taken from the Markdown: where the text's project-edition
+.txt is in the corpus inventory, its computed size replaces the section's
+value, so every output shows the same size.
+"""
+
+import re
+import sys
+from datetime import date
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[3]
+MARKDOWN_DIR = PROJECT_ROOT / 'metadata' / 'markdown'
+
+sys.path.append(str(PROJECT_ROOT))
+from utils.transforms.corpus_inventory import file_size_kb, load_inventory, text_files_for
+
+FILE_SIZE_FIELD = 'File Size (KB)'
+
+DATE_FIELDS = (
+    'Original Submission Last Updated',
+    'Text Last Updated',
+    'Metadata Last Updated',
+)
+
+_HEADING_RE = re.compile(r'^# (.+)$', flags=re.MULTILINE)
+_DATE_RE = re.compile(r'\d{4}-\d{2}-\d{2}')
+_BULLET_RE = re.compile(r'^[-*]\s+')
+
+
+def _normalise(section_lines):
+    """A section's value: a list for an all-bullet section, otherwise its lines joined by spaces."""
+    section_lines = list(section_lines)
+    while section_lines and section_lines[0] == '':
+        section_lines.pop(0)
+    while section_lines and section_lines[-1] == '':
+        section_lines.pop()
+
+    if section_lines and all(_BULLET_RE.match(l) for l in section_lines):
+        return [_BULLET_RE.sub('', l) for l in section_lines]
+
+    return ' '.join(section_lines).strip()
+
+
+class MetadataRecord:
+    """One metadata Markdown file, split into sections.
+
+    Attributes:
+        path: The .md file.
+        content: Its full text, with File Size (KB) set to the computed size.
+        preamble: Text before the first heading.
+        sections: (heading, body) pairs in file order; body runs from the end of
+            the heading line up to the next heading, so f"# {heading}{body}"
+            reproduces the section.
+        fields: heading -> normalised value (a string, or a list for bullet lists).
+        dates: date field -> datetime.date, for the valid DATE_FIELDS present.
+        warnings: Validation problems found while loading.
+    """
+    # Not a dataclass: importing dataclasses (~10 ms, mostly inspect) would double update_version's import time.
+    def __init__(self, path, content, preamble=''):
+        self.path = path
+        self.content = content
+        self.preamble = preamble
+        self.sections = []
+        self.fields = {}
+        self.dates = {}
+        self.warnings = []
+
+    @property
+    def stem(self):
+        return self.path.stem
+
+    def section_lines(self):
+        """heading -> the raw lines of its section (a repeated heading keeps its last section)."""
+        return {heading: body.splitlines()[1:] for heading, body in self.sections}
+
+    def set_section_value(self, heading, value):
+        """Replace the text of an existing section, keeping the blank lines around it."""
+        matches = [m for m in _HEADING_RE.finditer(self.content) if m.group(1).strip() == heading]
+        bodies = [(i, body) for i, (section_heading, body) in enumerate(self.sections) if section_heading == heading]
+        for match, (i, body) in reversed(list(zip(matches, bodies))):
+            stripped = body.strip()
+            start = body.index(stripped) if stripped else len(body)
+            new_body = body[:start] + value + body[start + len(stripped):]
+            self.sections[i] = (heading, new_body)
+            self.content = self.content[:match.end()] + new_body + self.content[match.end() + len(body):]
+        self.fields[heading] = _normalise(self.section_lines()[heading])
+
+    def latest_date(self):
+        """The latest of the record's Last Updated dates, or None."""
+        return max(self.dates.values(), default=None)
+
+
+def parse_metadata_file(md_path, project_root=None):
+    """Read and parse one metadata Markdown file into a MetadataRecord.
+
+    The File Size (KB) value comes from the corpus inventory of project_root
+    (by default, the project the file's metadata/markdown directory is in).
+    """
+    md_path = Path(md_path)
+    # Decoded without newline translation, so content.encode() gives back the file's
+    # bytes (unless File Size (KB) is replaced below)
+    content = md_path.read_bytes().decode('utf-8')
+    parts = _HEADING_RE.split(content)
+    record = MetadataRecord(path=md_path, content=content, preamble=parts[0])
+    record.sections = [(parts[i].strip(), parts[i + 1]) for i in range(1, len(parts), 2)]
+    record.fields = {heading: _normalise(lines) for heading, lines in record.section_lines().items()}
+
+    if FILE_SIZE_FIELD in record.fields:
+        inventory = load_inventory(project_root or md_path.resolve().parents[2])
+        size_kb = file_size_kb(text_files_for(inventory, record.stem))
+        if size_kb is not None and record.fields[FILE_SIZE_FIELD] != f"{size_kb:g}":
+            record.set_section_value(FILE_SIZE_FIELD, f"{size_kb:g}")
+
+    for date_field in DATE_FIELDS:
+        value = record.fields.get(date_field)
+        if not value:
+            continue
+        match = _DATE_RE.match(value) if isinstance(value, str) else None
+        try:
+            record.dates[date_field] = date.fromisoformat(match.group(0))
+        except (AttributeError, ValueError):
+            record.warnings.append(f"{md_path.name}: {date_field} is not a YYYY-MM-DD date: {value!r}")
+    return record
+
+
+def load_metadata(markdown_dir=MARKDOWN_DIR):
+    """Parse every .md file in markdown_dir, in file name order."""
+    return [parse_metadata_file(md_path) for md_path in sorted(Path(markdown_dir).glob('*.md'))]
@@ -1,16 +1,26 @@
 #!/usr/bin/env python3
 """
-Runs all metadata processing scripts.
-1. Renders Markdown to HTML.
-2. Consolidates Markdown metadata to JSON.
-3. Updates the data version.
+Runs all metadata processing steps in one process.
+Each metadata/markdown/*.md file is loaded once (see metadata_loader.py) and
+the same records feed every step:
+1. Updates the data version.
+2. Renders Markdown to HTML (once per file, for both the HTML pages and step 5).
+3. Consolidates Markdown metadata to JSON.
+4. Writes the catalog facet indexes and listing.
+5. Builds the per-text metadata records loaded by the HTML stage.
 """
 
-import subprocess
 import sys
 from pathlib import Path
 import os
 
+import catalog_index
+import convert_md_to_html
+import jsonify_metadata
+import sidecar_metadata
+import update_version
+from metadata_loader import load_metadata
+
 def main():
     """
     Orchestrates the metadata processing pipeline.
@@ -19,19 +29,15 @@ def main():
 
     metadata_dir = project_root / 'metadata'
     html_out_dir = metadata_dir / 'transforms' / 'html'
-    
-    # Scripts
-    update_version_script = project_root / 'utils' / 'transforms' / 'metadata' / 'update_version.py'
-    convert_script = project_root / 'utils' / 'transforms' / 'metadata' / 'convert_md_to_html.py'
-    jsonify_script = project_root / 'utils' / 'transforms' / 'metadata' / 'jsonify_metadata.py'
+
+    records = load_metadata(metadata_dir / 'markdown')
 
     # 1. Clean output directories
     print("--- Cleaning output directories ---")
     # Clean HTML directory
     if html_out_dir.exists():
         # Get expected html files from md files
-        md_files = metadata_dir.glob('*.md')
-        expected_html_stems = {p.stem for p in md_files}
+        expected_html_stems = {record.stem for record in records}
         for html_file in html_out_dir.glob('*.html'):
             if html_file.stem not in expected_html_stems:
                 os.remove(html_file)
@@ -42,24 +48,38 @@ def main():
     try:
         # 2. Update data version
         print("--- Updating data version ---")
-        subprocess.run(['python', str(update_version_script)], check=True)
+        update_version.main(records)
         print("")
 
         # 3. Render Markdown to HTML
         print("--- Rendering Markdown to HTML ---")
-        subprocess.run(['python', str(convert_script), str(project_root)], check=True)
+        rendered = convert_md_to_html.main(str(project_root), records)
         print("")
 
         # 4. Consolidate metadata to JSON
         print("--- Consolidating metadata to JSON ---")
-        subprocess.run(['python', str(jsonify_script), str(project_root)], check=True)
+        consolidated = jsonify_metadata.main(str(project_root), records)
+        print("")
+
+        # 5. Build catalog facet indexes
+        print("--- Building catalog facet indexes ---")
+        catalog_index.main(str(project_root), consolidated)
+        print("")
+
+        # 6. Build sidecar metadata records for the HTML stage
+        print("--- Building sidecar metadata records ---")
+        sidecar_metadata.main(str(project_root), records, rendered)
         print("")
 
         print("Metadata regeneration complete.")
 
-    except subprocess.CalledProcessError:
+    except SystemExit as e:
+        if e.code in (None, 0):
+            raise
+        if isinstance(e.code, str):
+            print(e.code, file=sys.stderr)
         print("\n--- Metadata regeneration FAILED. ---")
         sys.exit(1)
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
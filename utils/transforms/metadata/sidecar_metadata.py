@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+Builds the per-text metadata records used by the rich HTML JSON sidecars.
+
+Each metadata/markdown/<stem>.md becomes a record holding the sidecar's
+"field" metadata entries (label, inline text or rendered HTML) and the PDF page
+mapping derived from the Edition PDFs and PDF Page Offset fields. The fields
+are split from the same rendering of the Markdown (see metadata_html.py) that
+the metadata HTML page is built from, which the metadata stage passes in, so
+each file is rendered once per build. Records are written to
+.cache/metadata/sidecar/<stem>.json, keyed by the Markdown's hash and the
+renderer's package versions, and loaded by convert_xml_to_html.py instead of
+rendering the Markdown again per text.
+"""
+
+import hashlib
+import json
+import os
+import sys
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[3]
+sys.path.append(str(PROJECT_ROOT))
+from utils.transforms.metadata.metadata_html import render_metadata_html, renderer_versions
+from utils.transforms.metadata.metadata_loader import parse_metadata_file
+
+RECORDS_DIR = PROJECT_ROOT / '.cache' / 'metadata' / 'sidecar'
+
+
+def render_sidecar_metadata(html_content):
+    """Split rendered metadata HTML (see metadata_html.py) into (metadata_entries, pdf_page_mapping) for the JSON sidecar.
+
+    PDF Page Offset is used for the mapping only and is not among the returned entries.
+    pdf_page_mapping is None unless an Edition PDFs link is given.
+    """
+    from lxml import etree
+    from lxml.html import fromstring
+
+    metadata_entries = []
+    pdf_page_mapping = None
+
+    parsed_md_body = fromstring(html_content)
+
+    nodes = list(parsed_md_body.iterchildren())
+    i = 0
+    while i < len(nodes):
+        node = nodes[i]
+        if node.tag == 'h1':
+            content_nodes = []
+            i += 1
+            while i < len(nodes) and nodes[i].tag != 'h1':
+                content_nodes.append(nodes[i])
+                i += 1
+
+            inline_text = None
+            rendered_html = ""
+
+            # If there's only one paragraph and it has no child elements (like links), treat it as inline text.
+            if len(content_nodes) == 1 and content_nodes[0].tag == 'p' and len(content_nodes[0]) == 0:
+                inline_text = content_nodes[0].text_content()
+            else:
+                if content_nodes:
+                    rendered_html = "".join(etree.tostring(cn, encoding="unicode") for cn in content_nodes)
+
+            label_text = (node.text or '').strip()
+            if not (inline_text or rendered_html).strip():
+                continue
+            metadata_entries.append({
+                "type": "field",
+                "label": label_text or None,
+                "inline_text": (inline_text or '').strip() or None,
+                "content_html": rendered_html
+            })
+        else:
+            i += 1
+
+    pdf_link_url = None
+    pdf_offsets = None
+    edition_pdfs_entry = next((entry for entry in metadata_entries if entry['label'] == 'Edition PDFs'), None)
+    if edition_pdfs_entry and edition_pdfs_entry['content_html']:
+        html_fragment = fromstring(edition_pdfs_entry['content_html'])
+        first_li = html_fragment.find('.//li')
+        first_li_text = (first_li.text_content() if first_li is not None else '').strip()
+        if not first_li_text.startswith('No '):
+            link = html_fragment.find('.//a')
+            if link is not None and 'href' in link.attrib:
+                pdf_link_url = link.get('href')
+
+    pdf_offset_entry = next((entry for entry in metadata_entries if entry['label'] == 'PDF Page Offset'), None)
+    if pdf_offset_entry and pdf_offset_entry['content_html']:
+        html_fragment = fromstring(pdf_offset_entry['content_html']) # this will be a <ul>
+        offsets = []
+        for li in html_fragment.findall('.//li'):
+            text = li.text_content().strip()
+            if '→' in text:
+                parts = [p.strip() for p in text.split('→')]
+            else:
+                parts = [p.strip() for p in text.split(',')]
+            if len(parts) == 2:
+                try:
+                    offsets.append([int(parts[0]), int(parts[1])])
+                except ValueError:
+                    pass
+        if offsets:
+            pdf_offsets = offsets
+
+    if pdf_offsets is None:
+        pdf_offsets = [[1, 1]]
+
+    if pdf_link_url and pdf_offsets:
+        pdf_page_mapping = {
+            "url": pdf_link_url,
+            "offsets": pdf_offsets
+        }
+
+    # Remove PDF Page Offset from displayed metadata (internal use only)
+    if pdf_offset_entry:
+        metadata_entries.remove(pdf_offset_entry)
+
+    return metadata_entries, pdf_page_mapping
+
+
+def _record_key(md_bytes):
+    return {"source_sha256": hashlib.sha256(md_bytes).hexdigest(), **renderer_versions()}
+
+
+def write_sidecar_record(md_path, records_dir=RECORDS_DIR, md_bytes=None, html_content=None):
+    """Store md_path's record in records_dir. Returns the record.
+
+    md_bytes is the content of md_path's MetadataRecord, and html_content its
+    rendering, if the caller already has them.
+    """
+    if md_bytes is None:
+        md_bytes = parse_metadata_file(md_path).content.encode('utf-8')
+    if html_content is None:
+        html_content = render_metadata_html(md_bytes.decode("utf-8"))
+    metadata_entries, pdf_page_mapping = render_sidecar_metadata(html_content)
+    record = {
+        **_record_key(md_bytes),
+        "metadata_entries": metadata_entries,
+        "pdf_page_mapping": pdf_page_mapping,
+    }
+    records_dir.mkdir(parents=True, exist_ok=True)
+    record_path = records_dir / f'{Path(md_path).stem}.json'
+    tmp_path = record_path.with_suffix('.json.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(record, f, ensure_ascii=False)
+    os.replace(tmp_path, record_path)
+    return record
+
+
+def load_sidecar_metadata(md_path, records_dir=RECORDS_DIR):
+    """Return (metadata_entries, pdf_page_mapping) for md_path from its stored record.
+
+    A missing or stale record (different Markdown hash or renderer version) is
+    rebuilt and stored first, so callers always get current metadata. The
+    Markdown is that of md_path's metadata_loader.MetadataRecord, with the
+    computed File Size (KB), as in the records the metadata stage writes.
+    """
+    record_path = records_dir / f'{Path(md_path).stem}.json'
+    md_bytes = parse_metadata_file(md_path).content.encode('utf-8')
+    record = None
+    try:
+        with open(record_path, encoding='utf-8') as f:
+            record = json.load(f)
+    except (OSError, ValueError):
+        pass
+    key = _record_key(md_bytes)
+    if record is None or any(record.get(k) != v for k, v in key.items()):
+        record = write_sidecar_record(md_path, records_dir, md_bytes)
+    return record["metadata_entries"], record["pdf_page_mapping"]
+
+
+def main(root_folder='.', records=None, rendered=None):
+    """Write a sidecar record per metadata file.
+
+    records are the metadata_loader.MetadataRecords already loaded by the
+    metadata stage; without them each file under root_folder is loaded here.
+    rendered is {stem: rendered HTML} from convert_md_to_html.main; files
+    missing from it are rendered here.
+    """
+    project_root = Path(root_folder).resolve()
+    markdown_in_dir = project_root / 'metadata' / 'markdown'
+    records_dir = project_root / '.cache' / 'metadata' / 'sidecar'
+
+    if records is None:
+        records = [parse_metadata_file(md_file, project_root) for md_file in sorted(markdown_in_dir.glob("*.md"))]
+    sources = [(record.path, record.content.encode('utf-8')) for record in records]
+    rendered = rendered or {}
+    for md_file, md_bytes in sources:
+        write_sidecar_record(md_file, records_dir, md_bytes, rendered.get(md_file.stem))
+
+    # Drop records of deleted metadata files.
+    expected = {md_file.stem for md_file, _ in sources}
+    for record_path in records_dir.glob('*.json'):
+        if record_path.stem not in expected:
+            record_path.unlink()
+
+    print(f"Wrote {len(sources)} sidecar metadata records to {records_dir.relative_to(project_root)}")
+
+if __name__ == '__main__':
+    main(sys.argv[1] if len(sys.argv) > 1 else '.')
@@ -8,41 +8,24 @@ import re
 import sys
 from pathlib import Path
 
-def main():
+from metadata_loader import load_metadata
+
+def main(records=None):
     """
     Updates the __data_version__ in the VERSION file.
+
+    records: MetadataRecords from metadata_loader.load_metadata(); loaded here if not given.
     """
     project_root = Path(__file__).resolve().parent.parent.parent.parent
-
-    # 1. Find the latest date from all metadata files
-    metadata_dir = project_root / 'metadata' / 'markdown'
-    md_files = list(metadata_dir.glob('*.md'))
-
-    latest_date = ""
-
-    for md_file in md_files:
-        content = md_file.read_text(encoding="utf-8")
-
-        # Find Text Last Updated
-        text_date_match = re.search(r"# Text Last Updated\s*\n\s*(\d{4}-\d{2}-\d{2})", content)
-        if text_date_match:
-            date = text_date_match.group(1)
-            if date > latest_date:
-                latest_date = date
-
-        # Find Metadata Last Updated
-        meta_date_match = re.search(r"# Metadata Last Updated\s*\n\s*(\d{4}-\d{2}-\d{2})", content)
-        if meta_date_match:
-            date = meta_date_match.group(1)
-            if date > latest_date:
-                latest_date = date
-
-        # Find Original Submission Last Updated
-        submission_date_match = re.search(r"# Original Submission Last Updated\s*\n\s*(\d{4}-\d{2}-\d{2})", content)
-        if submission_date_match:
-            date = submission_date_match.group(1)
-            if date > latest_date:
-                latest_date = date
+    if records is None:
+        records = load_metadata(project_root / 'metadata' / 'markdown')
+
+    # 1. Find the latest Last Updated date from all metadata files
+    for record in records:
+        for warning in record.warnings:
+            print(f"Warning: {warning}")
+    latest = max((record.latest_date() for record in records if record.dates), default=None)
+    latest_date = latest.isoformat() if latest else ""
 
     if not latest_date:
         print("Warning: No dates found in metadata files. Not updating VERSION.")
@@ -22,7 +22,8 @@ def main():
     commands = [
         metadata_regenerate_command,
         xml_regenerate_command,
-        "python utils/transforms/html/regenerate.py"
+        "python utils/transforms/html/regenerate.py",
+        "python utils/transforms/compress_outputs.py"
     ]
 
     for command_str in commands:
@@ -1,44 +1,60 @@
 import argparse
+import sys
 from lxml import etree
 from pathlib import Path
 
 from tei_builder import TeiHeaderBuilder
 from conversion_utils import add_shared_argparse_args, get_root, ns, write_xml_file
 
+PROJECT_ROOT = Path(__file__).resolve().parents[3]
+sys.path.append(str(PROJECT_ROOT))
+from utils.transforms.metadata.metadata_loader import parse_metadata_file
 
-def build_tei_header(src: Path, template_path: Path, licenses_path: Path) -> etree._Element:
-    text = src.read_text(encoding="utf-8")
-    lines = text.splitlines()
-    builder = TeiHeaderBuilder(template_path, licenses_path)
-    return builder.build(lines)
+TEMPLATE_PATH = PROJECT_ROOT / "utils/transforms/xml/template_components/header_template.xml"
+LICENSES_PATH = PROJECT_ROOT / "utils/transforms/xml/template_components/licenses"
 
 
-def configure_cli(parser: argparse.ArgumentParser):
-    add_shared_argparse_args(parser, input_type="markdown")
+def build_tei_header(src: Path, template_path: Path, licenses_path: Path, record=None, builder=None) -> etree._Element:
+    """Build the teiHeader for metadata file src.
 
+    record is src's metadata_loader.MetadataRecord if already loaded, and builder
+    a TeiHeaderBuilder to reuse across files (its template is parsed only once).
+    """
+    if record is None:
+        record = parse_metadata_file(src)
+    if builder is None:
+        builder = TeiHeaderBuilder(template_path, licenses_path)
+    return builder.build(record.section_lines())
 
-def cli():
-    parser = argparse.ArgumentParser(
-        description="Convert markdown metadata to TEI-XML header"
-    )
-    configure_cli(parser)
-    args = parser.parse_args()
-
-    template_path = Path("utils/transforms/xml/template_components/header_template.xml")
-    licenses_path = Path("utils/transforms/xml/template_components/licenses")
 
+def write_tei_header(record, out: Path, pretty_print: bool = True, prettier: bool = False, builder=None):
+    """Replace the teiHeader of XML file out with one built from a MetadataRecord."""
     # clean up old header
-    root = get_root(args.out)
+    root = get_root(out)
     old_header_element = root.find('tei:teiHeader', ns)
     if old_header_element is not None:
         root.remove(old_header_element)
 
     # create and insert new header
-    new_header_element = build_tei_header(args.src, template_path, licenses_path)
+    new_header_element = build_tei_header(record.path, TEMPLATE_PATH, LICENSES_PATH, record=record, builder=builder)
     if new_header_element is not None:
         root.insert(0, new_header_element)  # first element within TEI
 
-    write_xml_file(root, args.out, pretty_print=not args.uglier, prettier=args.prettier)
+    write_xml_file(root, out, pretty_print=pretty_print, prettier=prettier)
+
+
+def configure_cli(parser: argparse.ArgumentParser):
+    add_shared_argparse_args(parser, input_type="markdown")
+
+
+def cli():
+    parser = argparse.ArgumentParser(
+        description="Convert markdown metadata to TEI-XML header"
+    )
+    configure_cli(parser)
+    args = parser.parse_args()
+
+    write_tei_header(parse_metadata_file(args.src), args.out, pretty_print=not args.uglier, prettier=args.prettier)
 
 
 if __name__ == "__main__":
@@ -1,23 +1,26 @@
 import argparse
 from pathlib import Path
-import os
 import subprocess
 import sys
 
 PROJECT_ROOT = Path(__file__).resolve().parents[3]
 sys.path.append(str(PROJECT_ROOT))
 
+from utils.transforms.corpus_inventory import load_inventory
 from utils.transforms.flag_map import flag_map
+from utils.transforms.metadata.metadata_loader import load_metadata
 
 METADATA_DIR = PROJECT_ROOT / 'metadata' / 'markdown'
 TEXTS_DIR = PROJECT_ROOT / 'texts'
 
 
 def run_conversion(script_name, in_dir, in_ext, out_dir, out_ext, flag_map, direction):
-    source_files = [f for f in os.listdir(in_dir) if f.endswith(in_ext)]
-    for filename in source_files:
-        in_path = in_dir / filename
-        stem = Path(filename).stem
+    # source files and their chāyā companions (in_dir/chaya), listed once
+    inventory = load_inventory(in_dir, {'.': {in_ext: 'source'}, 'chaya': {'.txt': 'chaya'}})
+    for stem, text_files in inventory.items():
+        if 'source' not in text_files:
+            continue
+        in_path = in_dir / text_files['source'][0]
         out_path = out_dir / f'{stem}{out_ext}'
         flags = flag_map.get(stem, '')
         command = ['python', str(script_name), str(in_path), str(out_path)]
@@ -29,12 +32,22 @@ def run_conversion(script_name, in_dir, in_ext, out_dir, out_ext, flag_map, dire
             else:
                 command.extend(flags.split())
         if direction == 'xml' and '--chaya' in flags:
-            chaya_path = in_dir / 'chaya' / f'{stem}.txt'
-            if chaya_path.exists():
-                command.extend(['--chaya', str(chaya_path)])
+            chaya = text_files.get('chaya')
+            if chaya:
+                command.extend(['--chaya', str(in_dir / chaya[0])])
         subprocess.run(command)
 
 
+def regenerate_headers(metadata_dir, xml_dir):
+    """Rebuild the <teiHeader> of every XML file from its metadata, loading each .md file once."""
+    from convert_markdown_to_xml import TEMPLATE_PATH, LICENSES_PATH, write_tei_header
+    from tei_builder import TeiHeaderBuilder
+
+    builder = TeiHeaderBuilder(TEMPLATE_PATH, LICENSES_PATH)
+    for record in load_metadata(metadata_dir):
+        write_tei_header(record, xml_dir / f'{record.stem}.xml', builder=builder)
+
+
 def main():
     parser = argparse.ArgumentParser(description="Regenerate XML from plaintext or vice-versa, cleaning stale files.")
     group = parser.add_mutually_exclusive_group(required=True)
@@ -47,16 +60,8 @@ def main():
         # run TWO conversions, corresponding to <teiHeader> and <text> elements
         # TODO: resolve why order of these two matters (namespaces?)
 
-        # metadata => <teiHeader>
-        run_conversion(
-            script_name=PROJECT_ROOT / 'utils/transforms/xml/convert_markdown_to_xml.py',
-            in_dir=METADATA_DIR,
-            in_ext='.md',
-            out_dir=TEXTS_DIR / 'project_editions' / 'xml',
-            out_ext='.xml',
-            flag_map={},
-            direction='xml',
-        )
+        # metadata => <teiHeader>, in this process
+        regenerate_headers(METADATA_DIR, TEXTS_DIR / 'project_editions' / 'xml')
 
         # project_edition plain-text => <text>
         run_conversion(
@@ -1343,28 +1343,19 @@ class TeiHeaderBuilder:
         parser = etree.XMLParser(remove_comments=True)
         self.template_tree = etree.parse(str(template_path), parser)
 
-    def build(self, lines: list[str]) -> etree._Element:
-        self.parse_metadata(lines)
+    def build(self, sections: dict[str, list[str]]) -> etree._Element:
+        """Build the teiHeader from a metadata file's sections (MetadataRecord.section_lines())."""
+        self.parse_metadata(sections)
         tree = copy.deepcopy(self.template_tree)
         self.populate_template_lxml(tree)
         header_element = tree.getroot().find('tei:teiHeader', self.ns)
         return header_element
 
-    def parse_metadata(self, lines: list[str]):
-        current_key = None
-        current_value = []
-        for line in lines:
-            line = line.strip()
-            if line.startswith('# '):
-                if current_key:
-                    self.metadata[current_key] = self._process_value(current_value)
-                current_key = line[2:].strip()
-                current_value = []
-            elif current_key:
-                if line:
-                    current_value.append(line)
-        if current_key:
-            self.metadata[current_key] = self._process_value(current_value)
+    def parse_metadata(self, sections: dict[str, list[str]]):
+        self.metadata = {}
+        for key, lines in sections.items():
+            if key:
+                self.metadata[key] = self._process_value([line.strip() for line in lines if line.strip()])
 
     def _process_value(self, value_lines: list[str]) -> str | list | dict:
         stripped_lines = [line for line in value_lines if line.strip()]
@@ -1623,7 +1614,7 @@ class TeiHeaderBuilder:
                     pub_stmt_date.set('to', str(max_year))
 
         if 'Text Type' in self.metadata and 'Prose with verse' in self.metadata['Text Type']:
-            boilerplate_file = Path("utils/transforms/xml/template_components/textual_units/prose_with_verse.xml")
+            boilerplate_file = Path(__file__).parent / "template_components" / "textual_units" / "prose_with_verse.xml"
             if boilerplate_file.exists():
                 p_template = root.find(".//tei:p[@id='intermediate-textual-units']", namespaces=self.ns)
                 if p_template is not None:
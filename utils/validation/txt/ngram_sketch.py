@@ -0,0 +1,271 @@
+"""
+Count-min sketches of the corpus n-gram counts, for validating n-grams longer
+than the exact reference (utils.CONFIG['max_ngram_size']) covers.
+
+For each n in CONFIG['sketch_ngram_sizes'], the bracketless text of every file
+matching CONFIG['sketch_corpus_glob'] is counted into a table of d =
+CONFIG['sketch_depth'] rows of w = 2**CONFIG['sketch_width_bits'] counters: each
+n-gram is reduced to a 64-bit fingerprint, hashed to one counter per row, and
+adds its count there. The estimated count of an n-gram is the smallest of its d
+counters. The tables take d * w * 4 bytes per n however large the corpus grows
+(16 MB each by default). They are memory-mapped from CONFIG['sketch_dirpath'],
+and rebuilt whenever the corpus texts or the sketch dimensions change.
+
+Accuracy, for a corpus of N n-grams of which D are distinct:
+  - An estimate is never below the true count.
+  - An estimate exceeds the true count by more than e/w * N with
+    probability at most e**-d (about 2.6e-6 * N and 1.8% by default).
+  - An n-gram absent from the corpus is estimated at 0, and so flagged as
+    unfamiliar, unless each of its d counters is shared with some corpus n-gram,
+    which is expected for a fraction (1 - e**(-D/w))**d of them (about 1e-3 for
+    the current corpus's 5-grams). A text can therefore pass with a few unfamiliar
+    n-grams unflagged, but a flagged n-gram is always absent from the corpus.
+  - Distinct n-grams share a fingerprint with probability about D**2 / 2**65.
+
+A text that is itself part of the sketched corpus is checked against the rest of
+the corpus: the sketch is linear, so its own counts are subtracted first.
+
+Run as a script to build the sketches, or to check the estimates and bounds
+above against exact counts of the current corpus:
+
+    python ngram_sketch.py build
+    python ngram_sketch.py check
+"""
+
+import argparse
+import glob
+import hashlib
+import json
+import math
+import os
+import sys
+from collections import Counter
+
+from utils import (
+    scan_brackets,
+    clean_up_whitespace,
+    encode_text,
+    CONFIG,
+)
+
+# odd 64-bit multipliers for the fingerprint polynomial and the row hashes
+_FINGERPRINT_BASE = 0x9E3779B97F4A7C15
+_ROW_MULTIPLIERS = (
+    0xBF58476D1CE4E5B9, 0x94D049BB133111EB, 0xD6E8FEB86659FD93, 0xA0761D6478BD642F,
+    0xE7037ED1A0B428DB, 0x8EBC6AF09C88C6E3, 0x589965CC75374CC3, 0x1D8E4E27C47D124F,
+)
+
+
+def bracketless_text(content):
+    """content as content validation checks it: brackets removed and whitespace cleaned up."""
+    return clean_up_whitespace(scan_brackets(content)[0])
+
+
+def fingerprint_ngrams(codes, n):
+    """
+    returns a 64-bit fingerprint of the n-gram starting at each position of codes,
+    a codepoint array (or a 2-D array with one n-gram per row)
+    """
+    import numpy as np
+    if codes.ndim == 2:
+        columns = [codes[:, k] for k in range(n)]
+    else:
+        count = max(len(codes) - n + 1, 0)
+        columns = [codes[k:k + count] for k in range(n)]
+    fingerprints = np.zeros(len(columns[0]), dtype=np.uint64)
+    for column in columns:
+        fingerprints = fingerprints * np.uint64(_FINGERPRINT_BASE) + column.astype(np.uint64)
+    # finalizer, so that n-grams differing in one character spread over all bits
+    fingerprints ^= fingerprints >> np.uint64(31)
+    fingerprints *= np.uint64(_ROW_MULTIPLIERS[0])
+    fingerprints ^= fingerprints >> np.uint64(29)
+    return fingerprints
+
+
+def sketch_columns(fingerprints, width_bits, depth):
+    """returns the (depth, len(fingerprints)) array of each fingerprint's counter in each row"""
+    import numpy as np
+    if depth > len(_ROW_MULTIPLIERS):
+        raise ValueError(f"sketch depth is limited to {len(_ROW_MULTIPLIERS)} rows")
+    shift = np.uint64(64 - width_bits)
+    return np.stack([(fingerprints * np.uint64(multiplier)) >> shift for multiplier in _ROW_MULTIPLIERS[:depth]]).astype(np.int64)
+
+
+def count_into_table(table, columns, counts=None):
+    """Add one (or counts) to table at columns, row by row."""
+    import numpy as np
+    width = table.shape[1]
+    for row, row_columns in enumerate(columns):
+        table[row] += np.bincount(row_columns, weights=counts, minlength=width).astype(table.dtype)
+
+
+def _digest(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def sketch_key(corpus_files, width_bits, depth, sizes):
+    """What the sketches are built from: their dimensions and the digest of each corpus file."""
+    files = {}
+    for path in sorted(corpus_files):
+        with open(path, 'rb') as f:
+            files[os.path.basename(path)] = _digest(f.read())
+    return {'width_bits': width_bits, 'depth': depth, 'sizes': list(sizes), 'files': files}
+
+
+def build_sketches(corpus_files, sketch_dir, width_bits, depth, sizes):
+    """Count the corpus into one table per n in sizes, written to sketch_dir. Returns the manifest."""
+    import numpy as np
+    tables = {n: np.zeros((depth, 1 << width_bits), dtype=np.uint32) for n in sizes}
+    text_digests = []
+    for path in sorted(corpus_files):
+        with open(path, 'r') as f:
+            text = bracketless_text(f.read())
+        text_digests.append(_digest(text.encode('utf-8')))
+        codes = encode_text(text)
+        for n in sizes:
+            count_into_table(tables[n], sketch_columns(fingerprint_ngrams(codes, n), width_bits, depth))
+
+    manifest = sketch_key(corpus_files, width_bits, depth, sizes)
+    manifest['texts'] = text_digests
+    manifest['totals'] = {str(n): int(tables[n][0].sum()) for n in sizes}
+    os.makedirs(sketch_dir, exist_ok=True)
+    for n, table in tables.items():
+        _replace(os.path.join(sketch_dir, f'{n}.npy'), lambda f, table=table: np.save(f, table), 'wb')
+    # written last, so an interrupted build is rebuilt on next use
+    _replace(os.path.join(sketch_dir, 'manifest.json'), lambda f: json.dump(manifest, f, indent=2), 'w')
+    return manifest
+
+
+def _replace(path, write, mode):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, mode) as f:
+        write(f)
+    os.replace(tmp_path, path)
+
+
+class NgramSketches:
+    """
+    The corpus sketches, memory-mapped, built first if missing or out of date.
+
+    Attributes:
+        manifest: Dimensions, corpus file and bracketless text digests, and per-n
+            totals of the sketches.
+        tables: n -> (depth, width) uint32 table.
+    """
+    def __init__(self, sketch_dir=CONFIG['sketch_dirpath'], corpus_glob=CONFIG['sketch_corpus_glob'],
+                 width_bits=CONFIG['sketch_width_bits'], depth=CONFIG['sketch_depth'], sizes=CONFIG['sketch_ngram_sizes']):
+        import numpy as np
+        corpus_files = glob.glob(corpus_glob)
+        expected = sketch_key(corpus_files, width_bits, depth, sizes)
+        try:
+            with open(os.path.join(sketch_dir, 'manifest.json')) as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            manifest = {}
+        if {k: manifest.get(k) for k in expected} != expected:
+            manifest = build_sketches(corpus_files, sketch_dir, width_bits, depth, sizes)
+        self.manifest = manifest
+        self.width_bits = width_bits
+        self.tables = {n: np.load(os.path.join(sketch_dir, f'{n}.npy'), mmap_mode='r') for n in sizes}
+
+    def digest(self):
+        """sha256 identifying what the sketches were built from."""
+        key = {k: self.manifest[k] for k in ('width_bits', 'depth', 'sizes', 'files')}
+        return _digest(json.dumps(key, sort_keys=True).encode('utf-8'))
+
+    def includes(self, text):
+        """Whether bracketless text is one of the corpus texts the sketches count."""
+        return _digest(text.encode('utf-8')) in self.manifest['texts']
+
+    def estimate(self, n, fingerprints, own_counts=None):
+        """
+        returns the estimated corpus counts of the n-grams with the given distinct
+        fingerprints, and the corpus total of n-grams
+
+        own_counts, if given, are these n-grams' counts in a corpus text, which
+        are left out of both
+        """
+        import numpy as np
+        table = self.tables[n]
+        columns = sketch_columns(fingerprints, self.width_bits, table.shape[0])
+        total = self.manifest['totals'][str(n)]
+        estimates = np.full(len(fingerprints), np.iinfo(np.int64).max)
+        for row, row_columns in enumerate(columns):
+            counters = table[row][row_columns].astype(np.int64)
+            if own_counts is not None:
+                # what the text itself added to each of these counters
+                slots, inverse = np.unique(row_columns, return_inverse=True)
+                counters -= np.bincount(inverse, weights=own_counts, minlength=len(slots)).astype(np.int64)[inverse]
+            estimates = np.minimum(estimates, counters)
+        if own_counts is not None:
+            total -= int(own_counts.sum())
+        return estimates, total
+
+
+def check_sketches(sketches, corpus_files, sizes):
+    """
+    Compare the sketch estimates with exact counts of corpus_files, and the
+    rates of overestimates and of missed unfamiliar n-grams with their bounds
+    (allowing three standard errors for sampling, as the rates are measured).
+
+    returns whether every n is within its bounds
+    """
+    import numpy as np
+    ok = True
+    texts = []
+    for path in sorted(corpus_files):
+        with open(path, 'r') as f:
+            texts.append(bracketless_text(f.read()))
+    for n in sizes:
+        exact = Counter()
+        for text in texts:
+            exact.update(text[i:i+n] for i in range(len(text)-n+1))
+        ngrams = list(exact)
+        codes = encode_text(''.join(ngrams)).reshape(len(ngrams), n)
+        estimates, total = sketches.estimate(n, fingerprint_ngrams(codes, n))
+        true_counts = np.fromiter(exact.values(), dtype=np.int64, count=len(exact))
+        errors = estimates - true_counts
+
+        depth, width = sketches.tables[n].shape
+        error_bound = math.e / width * total
+        overestimate_rate = float(np.mean(errors > error_bound))
+        overestimate_bound = math.exp(-depth)
+
+        # unfamiliar n-grams: corpus n-grams reversed, where absent from the corpus
+        absent = [ngram[::-1] for ngram in ngrams if ngram[::-1] not in exact]
+        absent_codes = encode_text(''.join(absent)).reshape(len(absent), n)
+        absent_estimates, _ = sketches.estimate(n, fingerprint_ngrams(absent_codes, n))
+        missed_rate = float(np.mean(absent_estimates > 0)) if absent else 0.0
+        missed_bound = (1 - math.exp(-len(ngrams) / width)) ** depth
+
+        within = (errors.min() >= 0
+                  and overestimate_rate <= overestimate_bound + _sampling_margin(overestimate_bound, len(ngrams))
+                  and missed_rate <= missed_bound + _sampling_margin(missed_bound, len(absent)))
+        ok = ok and within
+        print(f"n={n}: {len(ngrams)} distinct of {total}; "
+              f"underestimates {int((errors < 0).sum())}; "
+              f"max overestimate {int(errors.max())} (bound {error_bound:.1f} at rate {overestimate_bound:.2%}, "
+              f"exceeded at {overestimate_rate:.2%}); "
+              f"unfamiliar missed {missed_rate:.3%} of {len(absent)} (bound {missed_bound:.3%})"
+              f"{'' if within else ' -- OUT OF BOUNDS'}")
+    return ok
+
+
+def _sampling_margin(rate, samples):
+    return 3 * math.sqrt(rate * (1 - rate) / samples) if samples else 0.0
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description="build or check the corpus n-gram count-min sketches")
+    parser.add_argument("command", choices=["build", "check"], help="build the sketches, or check them against exact counts")
+    args = parser.parse_args()
+
+    corpus_files = glob.glob(CONFIG['sketch_corpus_glob'])
+    if args.command == 'build':
+        manifest = build_sketches(corpus_files, CONFIG['sketch_dirpath'], CONFIG['sketch_width_bits'],
+                                  CONFIG['sketch_depth'], CONFIG['sketch_ngram_sizes'])
+        print(f"Built sketches of {len(manifest['files'])} texts for n={manifest['sizes']} in {os.path.normpath(CONFIG['sketch_dirpath'])}")
+    else:
+        if not check_sketches(NgramSketches(), corpus_files, CONFIG['sketch_ngram_sizes']):
+            sys.exit(1)
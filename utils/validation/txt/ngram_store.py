@@ -0,0 +1,211 @@
+"""
+Binary store for the reference n-gram counts used by content validation.
+
+The reference itself is reference_ngrams.json, which is committed so that
+updates can be reviewed as text. The store is built from it under .cache/ and
+rebuilt whenever the JSON changes; updates (validate.py -u) are merged into the
+store and exported back to the JSON.
+
+For each n, the store directory holds three .npy arrays of equal length:
+
+    <n>.keys.npy    the packed n-gram keys (see utils.pack_ngrams), sorted
+    <n>.counts.npy  the count of each key
+    <n>.ranks.npy   each key's position in the reference ordering (most
+                    frequent first, ties in order of first recording)
+
+Arrays are memory-mapped on load, so opening the store costs the same however
+large the reference grows, and keys are looked up by binary search. Upserts
+merge new counts into the arrays and rewrite only the arrays for that n.
+
+Run as a script to export the store to the JSON format or to rebuild it from
+such a JSON file:
+
+    python ngram_store.py export [-o reference_ngrams.json]
+    python ngram_store.py import [-i reference_ngrams.json]
+"""
+
+import argparse
+import hashlib
+import os
+import shutil
+
+from utils import (
+    encode_text,
+    pack_ngrams,
+    unpack_ngram,
+    load_ngram_counts,
+    save_ngram_counts,
+    CONFIG,
+)
+
+ARRAY_NAMES = ('keys', 'counts', 'ranks')
+
+# Digest of the JSON the store was built from or last exported to, written last
+SOURCE_DIGEST_NAME = 'source.sha256'
+
+
+def _array_path(store_dir, n, name):
+    return os.path.join(store_dir, f'{n}.{name}.npy')
+
+
+def load_reference_ngrams(store_dir, n):
+    """
+    returns the reference (keys, counts, ranks) arrays for n, memory-mapped,
+    or empty arrays if the store has no n-grams of that size
+    """
+    import numpy as np
+    try:
+        return tuple(np.load(_array_path(store_dir, n, name), mmap_mode='r') for name in ARRAY_NAMES)
+    except FileNotFoundError:
+        return np.empty(0, dtype=np.uint64), np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+
+
+def load_reference_store(store_dir, max_n):
+    """n -> load_reference_ngrams(store_dir, n), for n up to max_n."""
+    return {n: load_reference_ngrams(store_dir, n) for n in range(1, max_n+1)}
+
+
+def reference_store_digest(store_dir, max_n):
+    """sha256 of the store's arrays for n up to max_n, identifying the reference a result was checked against."""
+    digest = hashlib.sha256()
+    for n in range(1, max_n+1):
+        for name in ARRAY_NAMES:
+            digest.update(f'{n}.{name}'.encode())
+            try:
+                with open(_array_path(store_dir, n, name), 'rb') as f:
+                    digest.update(f.read())
+            except FileNotFoundError:
+                pass
+    return digest.hexdigest()
+
+
+def save_reference_ngrams(store_dir, n, keys, counts, ranks):
+    """Write the arrays for n, each replacing its predecessor atomically."""
+    import numpy as np
+    os.makedirs(store_dir, exist_ok=True)
+    arrays = (keys.astype(np.uint64), counts.astype(np.int64), ranks.astype(np.int64))
+    for name, array in zip(ARRAY_NAMES, arrays):
+        path = _array_path(store_dir, n, name)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.save(f, array)
+        os.replace(tmp_path, path)
+
+
+def merge_ngram_counts(store_dir, n, new_keys, new_counts, first_positions):
+    """
+    Add counts for the n-gram keys new_keys (sorted, distinct) to the store.
+
+    Keys not yet in the reference are appended in order of first_positions (their
+    first occurrence in the new text), and the reference ordering is then
+    re-sorted by count, keeping the previous order among equal counts.
+    """
+    import numpy as np
+    keys, counts, ranks = load_reference_ngrams(store_dir, n)
+
+    merged_keys = np.union1d(keys, new_keys)
+    old_slots = np.searchsorted(merged_keys, keys)
+    new_slots = np.searchsorted(merged_keys, new_keys)
+
+    merged_counts = np.zeros(len(merged_keys), dtype=np.int64)
+    merged_counts[old_slots] = counts
+    merged_counts[new_slots] += new_counts
+
+    # previous ordering, with unrecorded keys after it by first occurrence
+    previous = np.empty(len(merged_keys), dtype=np.int64)
+    previous[old_slots] = ranks
+    unrecorded = ~np.isin(new_keys, keys)
+    appended = np.argsort(first_positions[unrecorded], kind='stable').argsort()
+    previous[new_slots[unrecorded]] = len(keys) + appended
+
+    order = np.lexsort((previous, -merged_counts))
+    merged_ranks = np.empty(len(merged_keys), dtype=np.int64)
+    merged_ranks[order] = np.arange(len(merged_keys))
+
+    save_reference_ngrams(store_dir, n, merged_keys, merged_counts, merged_ranks)
+
+
+def store_to_ngram_counts(store_dir, max_n):
+    """The store's content as {str(n): {ngram: count}}, each dict in reference order."""
+    ngram_counts = {}
+    for n in range(1, max_n+1):
+        keys, counts, ranks = load_reference_ngrams(store_dir, n)
+        order = ranks.argsort()
+        ngram_counts[str(n)] = {unpack_ngram(key, n): int(count) for key, count in zip(keys[order], counts[order])}
+    return ngram_counts
+
+
+def _file_digest(path):
+    """sha256 of the file at path, or '' if there is none."""
+    try:
+        with open(path, 'rb') as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except FileNotFoundError:
+        return ''
+
+
+def _write_source_digest(store_dir, json_path):
+    with open(os.path.join(store_dir, SOURCE_DIGEST_NAME), 'w') as f:
+        f.write(_file_digest(json_path))
+
+
+def build_reference_store(json_path, store_dir, max_n):
+    """Replace the store in store_dir with the counts in json_path."""
+    shutil.rmtree(store_dir, ignore_errors=True)
+    ngram_counts_to_store(load_ngram_counts(json_path, max_n), store_dir)
+    # written last, so an interrupted build is rebuilt on next use
+    _write_source_digest(store_dir, json_path)
+
+
+def ensure_reference_store(json_path=CONFIG['reference_ngrams_filepath'],
+                           store_dir=CONFIG['reference_ngrams_store_dirpath'],
+                           max_n=CONFIG['max_ngram_size']):
+    """Build the store from json_path unless it is already up to date with it. Returns store_dir."""
+    try:
+        with open(os.path.join(store_dir, SOURCE_DIGEST_NAME)) as f:
+            built_from = f.read()
+    except FileNotFoundError:
+        built_from = None
+    if built_from != _file_digest(json_path):
+        build_reference_store(json_path, store_dir, max_n)
+    return store_dir
+
+
+def export_reference_store(store_dir, json_path, max_n):
+    """Write the store's counts to json_path, which the store is then up to date with."""
+    save_ngram_counts(store_to_ngram_counts(store_dir, max_n), json_path)
+    _write_source_digest(store_dir, json_path)
+
+
+def ngram_counts_to_store(ngram_counts, store_dir):
+    """Write {str(n): {ngram: count}} (each dict in reference order) to the store."""
+    import numpy as np
+    for size, ngrams in ngram_counts.items():
+        n = int(size)
+        if not ngrams:
+            save_reference_ngrams(store_dir, n, np.empty(0), np.empty(0), np.empty(0))
+            continue
+        keys = pack_ngrams(encode_text(''.join(ngrams)).reshape(len(ngrams), n), n)
+        counts = np.fromiter(ngrams.values(), dtype=np.int64, count=len(ngrams))
+        order = keys.argsort()
+        # the key sorted into slot i was at position order[i] in the reference
+        save_reference_ngrams(store_dir, n, keys[order], counts[order], order)
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description="export or rebuild the binary reference n-gram store")
+    parser.add_argument("command", choices=["export", "import"], help="export the store to JSON, or import JSON into the store")
+    parser.add_argument("-s", "--store-dirpath", default=CONFIG['reference_ngrams_store_dirpath'], help="store directory")
+    parser.add_argument("-o", "--output-filepath", default=CONFIG['reference_ngrams_filepath'], help="JSON file to export to")
+    parser.add_argument("-i", "--input-filepath", default=CONFIG['reference_ngrams_filepath'], help="JSON file to import from")
+    args = parser.parse_args()
+
+    if args.command == 'export':
+        export_reference_store(args.store_dirpath, args.output_filepath, CONFIG['max_ngram_size'])
+        print(f"Exported {args.store_dirpath} to {args.output_filepath}")
+    else:
+        if not os.path.exists(args.input_filepath):
+            parser.error(f"{args.input_filepath} not found")
+        build_reference_store(args.input_filepath, args.store_dirpath, CONFIG['max_ngram_size'])
+        print(f"Imported {args.input_filepath} into {args.store_dirpath}")
@@ -1,80 +1,245 @@
+import bisect
 import json
-import math
 import os
 import re
 from collections import Counter
 
 ABSOLUTE_PATH = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.normpath(os.path.join(ABSOLUTE_PATH, '..', '..', '..'))
 
 CONFIG = {
     'max_ngram_size': 2,  # unigrams and bigrams
     'reference_ngrams_filepath': os.path.join(ABSOLUTE_PATH, 'reference_ngrams.json'),
+    # binary store built from reference_ngrams.json (see ngram_store.py)
+    'reference_ngrams_store_dirpath': os.path.join(PROJECT_ROOT, '.cache', 'validation', 'reference_ngrams'),
     'unfamiliar_ngrams_default_filepath': 'utils/validation/txt/tmp/unfamiliar_ngrams.txt',
     'bracketless_content_default_filepath': 'utils/validation/txt/tmp/bracketless_content.txt',
     'long_sequence_threshold': 128,
     'residuals_ranking_k': 10,
     'residual_threshold': 100,
+    # --corpus: every .txt file here, with results cached per file
+    'corpus_dirpath': os.path.join(PROJECT_ROOT, 'texts', 'project_editions', 'txt'),
+    'results_cache_dirpath': os.path.join(PROJECT_ROOT, '.cache', 'validation', 'results'),
+    # --sketch-ngrams: longer n-grams checked against count-min sketches of the corpus (see ngram_sketch.py)
+    'sketch_ngram_sizes': (3, 4, 5),
+    'sketch_width_bits': 20,  # 2**20 counters per row
+    'sketch_depth': 4,
+    'sketch_corpus_glob': os.path.join(PROJECT_ROOT, 'texts', 'project_editions', 'txt', '*.txt'),
+    'sketch_dirpath': os.path.join(PROJECT_ROOT, '.cache', 'validation', 'ngram_sketch'),
 }
 
-def remove_bracket_groups(content, bracket_group_pattern):
+# Bracket groups of the plain-text format, by opening token:
+#   removable: ( ) < > ≤ ≥ [ ] { } -- dropped with their contents from the bracketless content
+#   kept: ((stage direction)), ˹prakrit˼, ˹prakrit˼(chāyā), «...», ¿...¿ -- brackets dropped, contents kept
+_CLOSING = {
+    '(': ')', '<': '>', '≤': '≥', '[': ']', '{': '}',
+    '((': '))', '˹': '˼', 'chāyā': ')', '«': '»', '¿': '¿',
+}
+_REMOVABLE = {'(', '<', '≤', '[', '{'}
+_OPENERS = {'(', '<', '≤', '[', '{', '˹', '«'}
+
+# A group of these may not contain the listed bracket characters (message, is_error)
+_CONTAINMENT_RULES = {
+    '[': ('{}<>', 'Invalid brackets {}, <> found within document identifier', True),
+    '{': ('[]<>', 'Invalid brackets [], <> found within group identifier', True),
+    '<': ('[]{}', 'Invalid brackets [], {} found within note', True),
+    '(': ('()[]{}<>', 'Round brackets contain brackets', False),
+    'chāyā': ('()[]{}<>', 'Round brackets contain brackets', False),
+}
+# bracket character -> kinds of group that may not contain it
+_FORBIDDING_KINDS = {}
+for _kind, (_chars, _, _) in _CONTAINMENT_RULES.items():
+    for _char in _chars:
+        _FORBIDDING_KINDS.setdefault(_char, []).append(_kind)
+
+# Unbalanced brackets of these groups are errors; of the others, warnings
+_STRUCTURAL_GROUPS = {'[', '{', '<'}
+
+# Group text longer than this is shortened in messages
+_MESSAGE_TEXT_LIMIT = 80
+
+# A whole removable group with no brackets inside (most groups) is one token
+_NO_BRACKETS = r'[^()<>≤≥\[\]{}˹˼«»¿]*'
+# (the leading lookahead lets the regex engine skip plain text by character class)
+_BRACKET_TOKEN = re.compile(
+    r'(?=[()<>≤≥\[\]{}˹˼«»¿])(?:\(\(|\)\)|'
+    + '|'.join(re.escape(o) + _NO_BRACKETS + re.escape(c) for o, c in
+               [('(', ')'), ('<', '>'), ('≤', '≥'), ('[', ']'), ('{', '}')])
+    + r'|[()<>≤≥\[\]{}˹˼«»¿])'
+)
+
+
+class _Group:
+    __slots__ = ('kind', 'start', 'mark', 'has_text', 'violation')
+
+    def __init__(self, kind, start, mark):
+        self.kind = kind
+        self.start = start          # index of the opening bracket in the content
+        self.mark = mark            # index of the group's slot in the output list
+        self.has_text = False       # whether it kept any non-empty text
+        self.violation = False      # whether it contains a bracket its rule forbids
+
+
+def scan_brackets(content):
     """
+    Walks content once, validating bracket nesting and building the bracketless content.
+
+    Removable groups are dropped with everything nested in them; kept groups
+    lose their brackets only (˹prakrit˼(chāyā) becomes "prakrit chāyā"). An
+    unclosed opener or unmatched closer is reported and left in the content
+    as a literal character.
+
     returns
-        1) content without named bracket group
-        2) errors
+        1) bracketless content
+        2) errors, each prefixed with its line and column
+        3) warnings, likewise
+        4) Counter of closed groups by opening bracket
     """
-    errors = []
-    while True:
-        hits = re.findall(bracket_group_pattern, content)
-        if not hits:
-            break
-        for hit in hits:
-            # Report illegally nested brackets within hit bracket group
-            if re.search(r'[\[\]{}]', hit):
-                errors.append(f"Invalid nesting within group {hit}")
-            content = content.replace(hit, '')
-    return content, errors
-    
+    errors, warnings = [], []
+    closed = Counter()
+    newlines = None
 
-def remove_removables(file_content):
-    # Drama: strip bracket characters but keep content for n-gram checking
-    # 1) ˹prakrit˼(chāyā) → prakrit chāyā  (both are validatable content)
-    file_content = re.sub(r'˹([^˼]*)˼\(([^)]*)\)', r'\1 \2', file_content)
-    # 2) Any remaining ˹...˼ without a chāyā pair
-    file_content = re.sub(r'˹([^˼]*)˼', r'\1', file_content)
-    # 3) ((stage direction)) → stage direction
-    file_content = re.sub(r'\(\(([^)]*)\)\)', r'\1', file_content)
-
-    # Patterns for (valid sets of) brackets with removable content
-    bracket_pairs = r'\(\)<>≤≥\[\]\{\}'
-    patterns = [
-        rf'\([^{bracket_pairs}]*\)',
-        rf'<[^{bracket_pairs}]*>',
-        rf'≤[^{bracket_pairs}]*≥',
-        rf'\[[^{bracket_pairs}]*\]',
-        rf'{{[^{bracket_pairs}]*}}' # double curly braces inside f-strings to escape
-    ]
+    def report(index, message, is_error):
+        nonlocal newlines
+        if newlines is None:
+            newlines = [m.start() for m in re.finditer('\n', content)]
+        line = bisect.bisect_left(newlines, index)
+        column = index - (newlines[line - 1] if line else -1)
+        (errors if is_error else warnings).append(f"Line {line + 1}, column {column}: {message}")
 
-    # Remove all removable brackets
-    for pattern in patterns:
-        while re.search(pattern, file_content):
-            file_content = re.sub(pattern, '', file_content)
+    def group_text(start, end):
+        if end - start > _MESSAGE_TEXT_LIMIT:
+            return content[start:start + _MESSAGE_TEXT_LIMIT - 1] + '…'
+        return content[start:end]
 
-    return file_content
+    # Output is built in one list: each open group has a slot at its mark (the
+    # opener's literal should it never close, or the space before a chāyā),
+    # and closing a removable group truncates the list back to its mark.
+    out = []
+    top = _Group(None, 0, 0)   # the document itself
+    stack = []
+    position = 0
+    chaya_at = -1              # index of a ( directly after ˼, which opens a chāyā
+    next_close = -1            # index of the next ) at or after position
+    # kind -> its open groups not yet found to contain a forbidden bracket, outermost first
+    unflagged = {kind: [] for kind in _CONTAINMENT_RULES}
 
+    def emit(text):
+        if text:
+            out.append(text)
+            top.has_text = True
 
-def keep_keepables(file_content):
-    # Pattern for (valid sets of) brackets with keepable content
-    patterns = [
-        r'«([^»]+)»',
-        r'¿([^¿]+)¿',
-    ]
+    def push(kind, start):
+        nonlocal top
+        stack.append(top)
+        top = _Group(kind, start, len(out))
+        out.append(' ' if kind == 'chāyā' else '')
+        if kind in unflagged:
+            unflagged[kind].append(top)
 
-    for pattern in patterns:
-        while re.search(pattern, file_content):
-            file_content = re.sub(pattern, r'\1', file_content)
+    def pop():
+        nonlocal top
+        group, top = top, stack.pop()
+        open_groups = unflagged.get(group.kind)
+        if open_groups and open_groups[-1] is group:
+            open_groups.pop()
+        return group
+
+    def check_containment(char):
+        # Each group is flagged at most once, so this stays linear however deep the nesting
+        for kind in _FORBIDDING_KINDS.get(char, ()):
+            for group in unflagged[kind]:
+                group.violation = True
+            unflagged[kind].clear()
+
+    for match in _BRACKET_TOKEN.finditer(content):
+        index = match.start()
+        if index > position:
+            out.append(content[position:index])
+            top.has_text = True
+        position = match.end()
+        token = match.group()
+
+        if len(token) > 1 and token not in ('((', '))'):
+            # a flat group: nothing nested, so only the emptiness rule applies
+            if stack:
+                check_containment(token[0])
+            if index == chaya_at:
+                closed['chāyā'] += 1
+                emit(' ' + token[1:-1])
+            else:
+                closed[token[0]] += 1
+                if token[0] in '[{' and not token[1:-1].strip():
+                    label = 'document' if token[0] == '[' else 'document group'
+                    report(index, f"Empty {label} identifier found: {group_text(index, position)}", True)
+            continue
+
+        if token == '((':
+            # A stage direction runs to the first ")" if that is "))" and no "(" comes first;
+            # otherwise these are two round brackets, e.g. "((a) b)"
+            if next_close < position:
+                next_close = content.find(')', position)
+                if next_close == -1:
+                    next_close = len(content)
+            if content.startswith('))', next_close) and content.find('(', position, next_close) == -1:
+                push('((', index)
+                continue
+            tokens = ['(', '(']
+        elif token == '))':
+            if top.kind == '((':
+                group = pop()
+                top.has_text |= group.has_text
+                continue
+            tokens = [')', ')']
+        else:
+            tokens = [token]
+
+        for offset, char in enumerate(tokens):
+            at = index + offset
+            if char == '¿' and top.kind != '¿':
+                push('¿', at)
+                continue
+            if char in _OPENERS:
+                check_containment(char)
+                push('chāyā' if char == '(' and at == chaya_at else char, at)
+                continue
+
+            if top.kind is None or _CLOSING[top.kind] != char:
+                check_containment(char)
+                report(at, f"Unmatched '{char}'", char in ']}>')
+                emit(char)
+                continue
+
+            # char closes the innermost group
+            group = pop()
+            check_containment(char)
+            closed[group.kind] += 1
+            if group.violation:
+                _, message, is_error = _CONTAINMENT_RULES[group.kind]
+                report(group.start, f"{message}: {group_text(group.start, at + 1)}", is_error)
+
+            if group.kind in _REMOVABLE:
+                del out[group.mark:]
+            elif group.has_text:
+                top.has_text = True
+            elif group.kind in ('«', '¿'):
+                # an empty «» or ¿¿ is not a group
+                out[group.mark] = group.kind + char
+                top.has_text = True
+            if group.kind == '˹' and content.startswith('(', at + 1):
+                chaya_at = at + 1
+
+    emit(content[position:])
+
+    # Unclosed groups stay as literal text
+    while stack:
+        group = pop()
+        opener = '(' if group.kind == 'chāyā' else group.kind
+        report(group.start, f"Unclosed '{opener}'", group.kind in _STRUCTURAL_GROUPS)
+        out[group.mark] = opener
+
+    return ''.join(out), errors, warnings, closed
 
-    return file_content
-    
 
 def clean_up_whitespace(content):
     # Define the regex replacements for cleaning up whitespace
@@ -94,38 +259,69 @@ def clean_up_whitespace(content):
     return content
 
 
-def get_ngrams(content, n):
-    return [content[i:i+n] for i in range(len(content)-n+1)]
+# N-gram keys pack each codepoint (at most 0x10FFFF) into CODEPOINT_BITS bits of a
+# uint64, so n-grams up to MAX_PACKED_NGRAM_SIZE characters have exact integer keys
+CODEPOINT_BITS = 21
+MAX_PACKED_NGRAM_SIZE = 64 // CODEPOINT_BITS
 
 
-def calculate_new_ngram_counts(content, n):
-    ngrams = get_ngrams(content, n)
-    return Counter(ngrams)
+def encode_text(content):
+    """content as a NumPy array of its codepoints."""
+    import numpy as np
+    return np.frombuffer(content.encode('utf-32-le'), dtype=np.uint32)
 
 
-def load_ngram_counts(json_file, max_n):
-    try:
-        with open(json_file, 'r') as file:
-            ngram_counts = json.load(file)
-    except FileNotFoundError:
-        ngram_counts = {str(i): {} for i in range(1, max_n+1)}
-    return ngram_counts
+def pack_ngrams(codes, n):
+    """
+    returns the uint64 key of the n-gram starting at each position of codes,
+    a codepoint array (or a 2-D array with one n-gram per row)
+    """
+    import numpy as np
+    if n > MAX_PACKED_NGRAM_SIZE:
+        raise ValueError(f"n-grams longer than {MAX_PACKED_NGRAM_SIZE} characters cannot be packed into 64 bits")
+    shift = np.uint64(CODEPOINT_BITS)
+    if codes.ndim == 2:
+        columns = [codes[:, k] for k in range(n)]
+    else:
+        count = max(len(codes) - n + 1, 0)
+        columns = [codes[k:k + count] for k in range(n)]
+    keys = columns[0].astype(np.uint64)
+    for column in columns[1:]:
+        keys = (keys << shift) | column.astype(np.uint64)
+    return keys
 
 
-def upsert_ngram_counts(ngram_counts, new_counts, n):
+def unpack_ngram(key, n):
+    mask = (1 << CODEPOINT_BITS) - 1
+    key = int(key)
+    return ''.join(chr((key >> (CODEPOINT_BITS * (n - 1 - k))) & mask) for k in range(n))
 
-    # dict for n will be mutated in-place
-    ngram_dict = ngram_counts.get(str(n), {})
 
-    for ngram, count in new_counts.items():
-        if ngram in ngram_dict:
-            ngram_dict[ngram] += count
-        else:
-            ngram_dict[ngram] = count
+def count_ngrams(codes, n):
+    """
+    returns, for the distinct n-grams of codepoint array codes,
+        1) their keys, sorted
+        2) their counts
+    """
+    import numpy as np
+    return np.unique(pack_ngrams(codes, n), return_counts=True)
+
+
+def first_occurrences(codes, n, keys):
+    """Position in codes of the first occurrence of each of keys (sorted, distinct, all present)."""
+    import numpy as np
+    packed = pack_ngrams(codes, n)
+    positions = np.flatnonzero(np.isin(packed, keys))
+    _, first = np.unique(packed[positions], return_index=True)
+    return positions[first]
 
-    # replace with sorted dict
-    ngram_counts[str(n)] = dict(sorted(ngram_dict.items(), key=lambda x: x[1], reverse=True))
 
+def load_ngram_counts(json_file, max_n):
+    try:
+        with open(json_file, 'r') as file:
+            ngram_counts = json.load(file)
+    except FileNotFoundError:
+        ngram_counts = {str(i): {} for i in range(1, max_n+1)}
     return ngram_counts
 
 
@@ -135,22 +331,32 @@ def save_ngram_counts(ngram_counts, json_file):
         json.dump(ngram_counts, file, indent=4, ensure_ascii=False)
 
 
-def calculate_standardized_residuals(ref_counts, new_ngram_counts, n):
+def align_counts(ref_keys, keys, counts):
+    """counts (of sorted keys) looked up for each of ref_keys, 0 where absent."""
+    import numpy as np
+    if not len(keys):
+        return np.zeros(len(ref_keys), dtype=np.int64)
+    positions = np.minimum(np.searchsorted(keys, ref_keys), len(keys) - 1)
+    return np.where(keys[positions] == ref_keys, counts[positions], 0)
 
-    # Prepare reference data
-    total_ref_ngrams = sum(ref_counts[str(n)].values())
-    ref_prob = {ngram: count / total_ref_ngrams for ngram, count in ref_counts[str(n)].items()}
 
-    # Prepare new data
-    total_new_ngrams = sum(new_ngram_counts.values())    
-    
-    # Calculate standardized residuals
-    residuals = {}
-    for ngram in ref_prob:
-        expected_count = ref_prob[ngram] * total_new_ngrams
-        observed_count = new_ngram_counts.get(ngram, 0)
-        if expected_count > 0:
-            residual = (observed_count - expected_count) / math.sqrt(expected_count)
-            residuals[ngram] = residual
+def calculate_standardized_residuals(ref_counts, observed_counts, total_new_ngrams, total_ref_ngrams=None):
+    """
+    Standardized residual (observed - expected) / sqrt(expected) of each
+    reference n-gram, expecting the reference distribution scaled to
+    total_new_ngrams. ref_counts and observed_counts are aligned arrays;
+    total_ref_ngrams defaults to the sum of ref_counts.
 
+    returns the residuals, NaN where nothing is expected
+    """
+    import numpy as np
+    residuals = np.full(len(ref_counts), np.nan)
+    if total_ref_ngrams is None:
+        total_ref_ngrams = ref_counts.sum()
+    if not total_ref_ngrams:
+        return residuals
+    ref_prob = ref_counts / total_ref_ngrams
+    expected_counts = ref_prob * total_new_ngrams
+    expected = expected_counts > 0
+    residuals[expected] = (observed_counts[expected] - expected_counts[expected]) / np.sqrt(expected_counts[expected])
     return residuals
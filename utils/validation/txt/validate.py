@@ -1,31 +1,40 @@
 import argparse
+import glob
+import hashlib
+import json
 import os
-import re
 
 from utils import (
-    remove_bracket_groups,
-    remove_removables,
-    keep_keepables,
+    scan_brackets,
     clean_up_whitespace,
-    load_ngram_counts,
-    save_ngram_counts,
-    calculate_new_ngram_counts,
+    encode_text,
+    count_ngrams,
+    first_occurrences,
+    unpack_ngram,
+    align_counts,
     calculate_standardized_residuals,
-    upsert_ngram_counts,
     CONFIG,
 )
+from ngram_store import (
+    ensure_reference_store,
+    export_reference_store,
+    load_reference_store,
+    reference_store_digest,
+    merge_ngram_counts,
+)
+from ngram_sketch import (
+    NgramSketches,
+    fingerprint_ngrams,
+)
 
 
 def validate_structure(structured_content):
     """
     Validates the bracket structure of the input content against a set of rules.
 
-    This function performs two main types of checks:
-    1. Non-Destructive Structural Checks: It first validates the nesting of different
-       bracket types on the iast, unmodified content. This ensures that the
-       hierarchical structure is correct.
-    2. Content and Existence Checks: It then checks for the existence of mandatory
-       identifiers and ensures they are not empty.
+    The content is walked once by scan_brackets (see utils.py), which tracks the
+    open bracket groups on a stack, so each problem is reported with its line
+    and column and nothing is removed from the string before it is checked.
 
     Rules enforced:
     - ERRORS (will cause validation to fail):
@@ -35,11 +44,11 @@ def validate_structure(structured_content):
       - `[...]` must not contain `{...}` or `<...>`. 
       - `{...}` must not contain `[...]` or `<...>`. 
       - `<...>` must not contain `[...]` or `{...}`.
+      - `[`, `{` and `<` must be closed, and `]`, `}` and `>` must close an open group.
     - WARNINGS (will be flagged but will not cause failure):
-      - `(...)` should not contain any other bracket characters.
-
-    The function is designed to be non-destructive for structural checks, avoiding
-    the issues of prematurely removing parts of the string before validation is complete.
+      - `(...)` should not contain any other bracket characters
+        (stage directions `((...))` excepted).
+      - Other brackets (`()`, `≤≥`, `˹˼`, `«»`, `¿¿`) should be balanced.
 
     Args:
         structured_content (str): The string content to validate.
@@ -50,75 +59,30 @@ def validate_structure(structured_content):
             - errors (list[str]): A list of error messages.
             - warnings (list[str]): A list of warning messages.
     """
-    valid = True
-    errors = []
-    warnings = []
-    
-    # Part A: Non-Destructive Structural Checks
-    
-    # 1. Find all instances of each bracket type
-    all_squares = re.findall(r'\[.*?\]', structured_content, re.DOTALL)
-    all_curlies = re.findall(r'\{.*?\}', structured_content, re.DOTALL)
-    all_angles = re.findall(r'<.*?>', structured_content, re.DOTALL)
-    # Strip stage directions ((...)) before round-bracket validation
-    content_for_round_check = re.sub(r'\(\([^)]+\)\)', '', structured_content)
-    all_rounds = re.findall(r'\(.*?\)', content_for_round_check, re.DOTALL)
-    
-    # 2. Perform Nesting Validation
-    
-    # Check [...]
-    for s in all_squares:
-        inner = s[1:-1]
-        if any(c in inner for c in '{}<>'):
-            valid = False
-            errors.append(f"Invalid brackets {{}}, <> found within document identifier: {s}")
+    _, errors, warnings, closed_groups = scan_brackets(structured_content)
 
-    # Check {...}
-    for c in all_curlies:
-        inner = c[1:-1]
-        if any(c in inner for c in '[]<>'):
-            valid = False
-            errors.append(f"Invalid brackets [], <> found within group identifier: {c}")
+    # Existence Check
+    if not closed_groups['[']:
+        errors.append("No document identifier ([...]) found.")
 
-    # Check <...>
-    for a in all_angles:
-        inner = a[1:-1]
-        if any(c in inner for c in '[]{}'):
-            valid = False
-            errors.append(f"Invalid brackets [], {{}} found within note: {a}")
+    if not closed_groups['{']:
+        errors.append("No group identifier ({...}) found.")
 
-    # Check (...)
-    for r in all_rounds:
-        inner = r[1:-1]
-        if any(c in inner for c in '()[]{}<>'):
-            warnings.append(f"Round brackets contain brackets: {r}")
+    return not errors, errors, warnings
 
-    # Part B: Content and Existence Checks
-    
-    # 1. Existence Check
-    if not all_squares:
-        valid = False
-        errors.append("No document identifier ([...]) found.")
-    
-    if not all_curlies:
-        valid = False
-        errors.append("No group identifier ({...}) found.")
-        
-    # 2. Emptiness Check
-    for s in all_squares:
-        if not s[1:-1].strip():
-            valid = False
-            errors.append(f"Empty document identifier found: {s}")
-            
-    for c in all_curlies:
-        if not c[1:-1].strip():
-            valid = False
-            errors.append(f"Empty document group identifier found: {c}")
 
-    return valid, errors, warnings
+def validate_content(structured_content, options, reference=None, sketches=None, log=print):
+    """
+    Checks the n-grams of the bracketless content against the reference counts.
 
+    reference (n -> reference arrays, see ngram_store.load_reference_store) and
+    sketches (ngram_sketch.NgramSketches) are loaded here unless given. Notes
+    that do not fail validation (residuals, sketch findings) are passed to log.
 
-def validate_content(structured_content, options):
+    Returns:
+        tuple[bool, list[str]]: whether no unfamiliar n-grams were found, and the errors.
+    """
+    import numpy as np
 
     valid = True
     errors = []
@@ -126,8 +90,7 @@ def validate_content(structured_content, options):
 
     # Step 1: Remove all structural elements
 
-    unstructured_content = remove_removables(structured_content)
-    unstructured_content = keep_keepables(unstructured_content)
+    unstructured_content, _, _, _ = scan_brackets(structured_content)
     unstructured_content = clean_up_whitespace(unstructured_content)
 
     # Optionally: Output the bracketless content undergoing n-gram validation
@@ -136,29 +99,35 @@ def validate_content(structured_content, options):
         with open(CONFIG['bracketless_content_default_filepath'], 'w') as f_out:
             f_out.write(unstructured_content)
     
-    # Step 2: Load reference n-gram counts from JSON file
+    # Step 2: Reference n-gram counts are memory-mapped per n from the binary store,
+    # built from reference_ngrams.json (see ngram_store.py)
 
-    ref_ngram_counts = load_ngram_counts(
-        CONFIG['reference_ngrams_filepath'],
-        CONFIG['max_ngram_size'],
-    )
+    store_dir = CONFIG['reference_ngrams_store_dirpath']
+    if reference is None:
+        reference = load_reference_store(ensure_reference_store(), CONFIG['max_ngram_size'])
 
     # Step 3: Check new n-grams against reference set
 
+    codes = encode_text(unstructured_content)
+
     for n in range(1, CONFIG['max_ngram_size']+1):
         
         # Calculate new n-gram counts
-        new_ngram_counts = calculate_new_ngram_counts(unstructured_content, n)
-        sorted_ngram_counts = dict(sorted(new_ngram_counts.items(), key=lambda x: x[1], reverse=True))
+        keys, counts = count_ngrams(codes, n)
+        ref_keys, ref_counts, ref_ranks = reference[n]
 
-        # Check for unfamiliar n-grams never recorded before
+        # Check for unfamiliar n-grams never recorded before, most frequent first
+        # (ties in order of first occurrence)
         # (These DO count as validation errors)
 
-        for ngram in sorted_ngram_counts:
-            if ngram not in ref_ngram_counts[str(n)]:
-                valid = False
-                errors.append(f"N-gram {repr(ngram)} ({','.join([str(hex(ord(c))) for c in ngram])}) (count {new_ngram_counts[ngram]}) is unfamiliar")
-                unfamiliar_ngrams.append(f"{new_ngram_counts[ngram]}\t{repr(ngram)}")
+        unfamiliar = np.flatnonzero(~np.isin(keys, ref_keys, assume_unique=True))
+        first = first_occurrences(codes, n, keys[unfamiliar])
+        unfamiliar = unfamiliar[np.lexsort((first, -counts[unfamiliar]))]
+        for key, count in zip(keys[unfamiliar], counts[unfamiliar]):
+            ngram = unpack_ngram(key, n)
+            valid = False
+            errors.append(f"N-gram {repr(ngram)} ({','.join([str(hex(ord(c))) for c in ngram])}) (count {count}) is unfamiliar")
+            unfamiliar_ngrams.append(f"{count}\t{repr(ngram)}")
 
         # Optionally: Output unfamiliar n-gram data for inspection
 
@@ -175,34 +144,235 @@ def validate_content(structured_content, options):
         # Use standardized residuals to highlight out-of-distribution n-grams
         # (These do NOT count as validation errors)
 
-        standardized_residuals = calculate_standardized_residuals(ref_ngram_counts, new_ngram_counts, n)
-        ranked_ngrams = dict(sorted(standardized_residuals.items(), key=lambda item: abs(item[1]), reverse=True))
-        for ngram, residual in list(ranked_ngrams.items())[:CONFIG['residuals_ranking_k']]:
+        standardized_residuals = calculate_standardized_residuals(
+            ref_counts, align_counts(ref_keys, keys, counts), counts.sum())
+        # largest first, ties in reference order
+        scored = np.flatnonzero(~np.isnan(standardized_residuals))
+        ranked = scored[np.lexsort((ref_ranks[scored], -np.abs(standardized_residuals[scored])))]
+        for i in ranked[:CONFIG['residuals_ranking_k']]:
+            residual = standardized_residuals[i]
             if residual > CONFIG['residual_threshold']:
-                print(f"N-gram {repr(ngram)} residual {residual:0.1f} exceeds threshold ({CONFIG['residual_threshold']})")
+                log(f"N-gram {repr(unpack_ngram(ref_keys[i], n))} residual {residual:0.1f} exceeds threshold ({CONFIG['residual_threshold']})")
 
         # Optionally: Add all new n-gram counts to reference set
         # (Do this ONLY AFTER addressing unfamiliar and out-of-distribution n-grams!)
 
         if options['update_ngrams']:
-            updated_ref_ngram_counts = upsert_ngram_counts(ref_ngram_counts, new_ngram_counts, n)
-            save_ngram_counts(
-                updated_ref_ngram_counts,
-                CONFIG['reference_ngrams_filepath'],
-                # CONFIG['max_ngram_size'], # TODO: use later
-            )
+            merge_ngram_counts(store_dir, n, keys, counts, first_occurrences(codes, n, keys))
+
+    if options['update_ngrams']:
+        export_reference_store(store_dir, CONFIG['reference_ngrams_filepath'], CONFIG['max_ngram_size'])
+
+    # Step 4: Optionally, check longer n-grams against count-min sketches of the corpus
+    # (see ngram_sketch.py; a text from the corpus is checked against the rest of it)
+
+    if options['sketch_ngrams']:
+        if sketches is None:
+            sketches = NgramSketches()
+        leave_out = sketches.includes(unstructured_content)
+
+        for n in CONFIG['sketch_ngram_sizes']:
+
+            fingerprints, first, counts = np.unique(
+                fingerprint_ngrams(codes, n), return_index=True, return_counts=True)
+            ref_counts, ref_total = sketches.estimate(n, fingerprints, counts if leave_out else None)
+
+            # Unfamiliar n-grams, most frequent first (ties in order of first occurrence)
+            # (These do NOT count as validation errors: any new text has n-grams this long
+            # that the corpus lacks, so only the most frequent are listed)
+
+            unfamiliar = np.flatnonzero(ref_counts == 0)
+            unfamiliar = unfamiliar[np.lexsort((first[unfamiliar], -counts[unfamiliar]))]
+            if len(unfamiliar):
+                log(f"{len(unfamiliar)} of {len(fingerprints)} distinct {n}-grams are unfamiliar to the corpus, most frequent:")
+            for rank, i in enumerate(unfamiliar):
+                ngram = unstructured_content[first[i]:first[i]+n]
+                unfamiliar_ngrams.append(f"{counts[i]}\t{repr(ngram)}")
+                if rank < CONFIG['residuals_ranking_k']:
+                    log(f"\tN-gram {repr(ngram)} ({','.join([str(hex(ord(c))) for c in ngram])}) (count {counts[i]})")
+
+            if options['output_unfamiliar_ngrams']:
+                unfamiliar_ngrams_filepath = (
+                    options['unfamiliar_ngrams_filepath']
+                    or CONFIG['unfamiliar_ngrams_default_filepath']
+                )
+                with open(unfamiliar_ngrams_filepath, 'w') as f:
+                    f.write(
+                        '\n'.join(unfamiliar_ngrams)
+                    )
+
+            # Over-represented n-grams (These do NOT count as validation errors)
+            # (only the text's own n-grams can be scored, as the sketch cannot list the corpus's)
+
+            standardized_residuals = calculate_standardized_residuals(ref_counts, counts, counts.sum(), ref_total)
+            scored = np.flatnonzero(standardized_residuals > CONFIG['residual_threshold'])
+            ranked = scored[np.lexsort((first[scored], -standardized_residuals[scored]))]
+            for i in ranked[:CONFIG['residuals_ranking_k']]:
+                log(f"N-gram {repr(unstructured_content[first[i]:first[i]+n])} residual {standardized_residuals[i]:0.1f} exceeds threshold ({CONFIG['residual_threshold']})")
 
     return valid, errors
 
 
+# Bump when a change to validation changes its results, so that cached --corpus results are discarded
+VALIDATOR_VERSION = 1
+
+# Loaded once per worker process by _init_worker
+_worker_reference = None
+_worker_sketches = None
+
+
+def _init_worker(options):
+    global _worker_reference, _worker_sketches
+    _worker_reference = load_reference_store(CONFIG['reference_ngrams_store_dirpath'], CONFIG['max_ngram_size'])
+    _worker_sketches = NgramSketches() if options['sketch_ngrams'] else None
+
+
+def validate_file(filepath, parts, options):
+    """
+    Validates one file for each of parts ('structure', 'content') against the
+    reference loaded by _init_worker. As in single-file mode, content is not
+    validated when the structure is not valid.
+
+    returns part -> result: {"valid", "errors", "warnings"} for structure,
+    {"valid", "errors", "notes"} for content
+    """
+    with open(filepath, 'r') as f_in:
+        raw_input_text = f_in.read()
+    results = {}
+    if 'structure' in parts:
+        valid, errors, warnings = validate_structure(raw_input_text)
+        results['structure'] = {'valid': valid, 'errors': errors, 'warnings': warnings}
+        if not valid:
+            return results
+    if 'content' in parts:
+        notes = []
+        valid, errors = validate_content(raw_input_text, options, _worker_reference, _worker_sketches, notes.append)
+        results['content'] = {'valid': valid, 'errors': errors, 'notes': notes}
+    return results
+
+
+def _cached_result_path(filename, part):
+    return os.path.join(CONFIG['results_cache_dirpath'], f'{filename}.{part}.json')
+
+
+def load_cached_result(filename, part, key):
+    """The cached result of part for filename, or None if missing or stored under another key."""
+    try:
+        with open(_cached_result_path(filename, part), 'r') as f:
+            record = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return record['result'] if record.get('key') == key else None
+
+
+def save_cached_result(filename, part, key, result):
+    path = _cached_result_path(filename, part)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump({'key': key, 'result': result}, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def report_results(filename, results, allow_content_fail):
+    """Prints the results of one file as single-file mode does. Returns whether it passed."""
+    structure = results.get('structure')
+    if structure:
+        if structure['warnings']:
+            structure_warnings_str = '\n'.join([f"\tWarning: {w}" for w in structure['warnings']])
+            print(f"Structure of file {filename} has warnings:\n{structure_warnings_str}")
+        if not structure['valid']:
+            structure_errors_str = '\n'.join([f"\t{e}" for e in structure['errors']])
+            print(f"Structure of file {filename} not valid:\n{structure_errors_str}")
+            return False
+
+    content = results.get('content')
+    if content:
+        for note in content['notes']:
+            print(note)
+        if not content['valid']:
+            content_errors_str = '\n'.join([f"\t{e}" for e in content['errors']])
+            print(f"Content of file {filename} has the following issues:\n{content_errors_str}")
+            if not allow_content_fail:
+                print(f"File {filename} failed content validation.")
+                return False
+
+    print(f"File {filename} validated successfully.")
+    return True
+
+
+def validate_corpus(corpus_dir, modes, options, jobs=None):
+    """
+    Validates every .txt file in corpus_dir for each of modes ('structure',
+    'content') and prints one report.
+
+    Results are cached per file and mode, keyed by the file's hash, the
+    reference store's hash (and the sketches', with --sketch-ngrams) and
+    VALIDATOR_VERSION, so only new or changed files are validated, across a
+    pool of jobs worker processes (default: one per CPU; 1 validates in this
+    process), each loading the reference once.
+
+    returns whether every file passed
+    """
+    filepaths = sorted(glob.glob(os.path.join(corpus_dir, '*.txt')))
+
+    # The reference store and sketches are brought up to date here, before any worker loads them
+    ensure_reference_store()
+    sketches = NgramSketches() if options['sketch_ngrams'] and 'content' in modes else None
+    content_key = {
+        'reference_sha256': reference_store_digest(CONFIG['reference_ngrams_store_dirpath'], CONFIG['max_ngram_size']),
+        'sketch_sha256': sketches.digest() if sketches else None,
+    }
+
+    results, keys, pending = {}, {}, []
+    for filepath in filepaths:
+        filename = os.path.basename(filepath)
+        with open(filepath, 'rb') as f:
+            file_key = {'validator_version': VALIDATOR_VERSION, 'file_sha256': hashlib.sha256(f.read()).hexdigest()}
+        keys[filename] = {'structure': file_key, 'content': {**file_key, **content_key}}
+        results[filename] = {}
+        for i, part in enumerate(modes):
+            cached = load_cached_result(filename, part, keys[filename][part])
+            if cached is None:
+                pending.append((filepath, modes[i:]))
+                break
+            results[filename][part] = cached
+            if part == 'structure' and not cached['valid']:
+                break
+
+    jobs = min(jobs or os.cpu_count() or 1, len(pending))
+    if jobs > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=(options,)) as pool:
+            validated = list(pool.map(validate_file, *zip(*pending), [options] * len(pending)))
+    else:
+        if pending:
+            _init_worker(options)
+        validated = [validate_file(filepath, parts, options) for filepath, parts in pending]
+
+    for (filepath, _), file_results in zip(pending, validated):
+        filename = os.path.basename(filepath)
+        for part, result in file_results.items():
+            save_cached_result(filename, part, keys[filename][part], result)
+        results[filename].update(file_results)
+
+    passed = sum(report_results(filename, results[filename], options['allow_content_fail']) for filename in results)
+    print(f"Validated {len(results)} files in {corpus_dir} ({len(results) - len(pending)} unchanged, from cache): "
+          f"{passed} passed, {len(results) - passed} failed.")
+    return passed == len(results)
+
+
 if __name__ == '__main__':
 
     # Load CL arguments
 
     parser = argparse.ArgumentParser()
 
-    # input argument
-    parser.add_argument("-i", "--input-filepath", help="path to input file", required=True)
+    # input argument (exactly one out of two required)
+    inputs = parser.add_mutually_exclusive_group(required=True)
+    inputs.add_argument("-i", "--input-filepath", help="path to input file")
+    inputs.add_argument("--corpus", nargs="?", const=CONFIG['corpus_dirpath'], metavar="DIR",
+                        help="validate every .txt file in DIR (default: the project editions), skipping unchanged files, with one report")
 
     # mode arguments (exactly one out of two required)
     parser.add_argument("-s", "--structure-validation", help="validate bracket annotation structure", action="store_true")
@@ -216,7 +386,9 @@ if __name__ == '__main__':
     parser.add_argument("--output-unfamiliar-ngrams", help="optional output to help address unfamiliar n-grams", action="store_true")
     parser.add_argument("--unfamiliar-ngrams-filepath", help="where to save optional unfamiliar n-gram output", required=False)
     # parser.add_argument("--flag-long-sequences", help="flag char sequences longer than threshold", action="store_true")
-    parser.add_argument("-u", "--update-ngrams", help="option to accept all remaining flagged n-grams and add to json", action="store_true")
+    parser.add_argument("-u", "--update-ngrams", help="option to accept all remaining flagged n-grams and add to the reference store", action="store_true")
+    parser.add_argument("--sketch-ngrams", help="also check longer n-grams (CONFIG['sketch_ngram_sizes']) against count-min sketches of the corpus (reported, not failed)", action="store_true")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="worker processes for --corpus (default: one per CPU; 1 validates in this process)")
     parser.add_argument("--allow-content-fail", help="don't propogate failure signal if content check fails", action="store_true")
 
     args = parser.parse_args()
@@ -230,11 +402,21 @@ if __name__ == '__main__':
         'unfamiliar_ngrams_filepath': args.unfamiliar_ngrams_filepath,
 #         'flagged_ngrams_filepath': args.flagged_ngrams_filepath,
         'update_ngrams': args.update_ngrams,
+        'sketch_ngrams': args.sketch_ngrams,
         'allow_content_fail': args.allow_content_fail,
     }
 
     # Validate CL arguments
-    
+
+    if args.corpus:
+        if args.update_ngrams or args.output_bracketless or args.output_unfamiliar_ngrams or args.pause:
+            parser.error("--corpus cannot be combined with -u, --output-bracketless, --output-unfamiliar-ngrams or --pause")
+        if not (args.structure_validation or args.content_validation):
+            print("Mode argument needed: '-s'/'--structure-validation' or '-c'/'--content-validation'")
+            exit(1)
+        modes = [mode for mode, selected in (('structure', args.structure_validation), ('content', args.content_validation)) if selected]
+        exit(0 if validate_corpus(args.corpus, modes, options, args.jobs) else 1)
+
     if not args.input_filepath:
         print("Input argument needed '-i'/'--input-filepath'")
         exit(1)